@@ -0,0 +1,85 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import sys
+
+from simpylic.batch_compiler import BatchCompiler, BatchOptions, read_manifest
+from simpylic.interpreter import PythonCodeCache
+from simpylic.simpylic import Operation
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compiles many files in a single run, see main.py for compiling one.')
+    parser.add_argument('files', metavar='FILE', type=str, nargs='*', help='Files to compile.')
+    parser.add_argument('--manifest', dest='manifest', metavar='FILE', action='append',
+                        default=[], help='File listing files to compile, one per line.')
+    parser.add_argument('-d', dest='output_dir', metavar='DIR', type=str, required=True,
+                        help='Directory to write the outputs into, named after the sources.')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-c', dest='operation', action='store_const', const=Operation.Compile,
+                       help='Compile the code into assembly (default).')
+    group.add_argument('-C', dest='operation', action='store_const', const=Operation.CompileC,
+                       help='Translate the code into C99.')
+    group.add_argument('-e', dest='operation', action='store_const',
+                       const=Operation.CompileExecutable,
+                       help='Compile the code directly into static ELF executables.')
+    parser.add_argument('-j', dest='jobs', metavar='N', type=int, default=os.cpu_count() or 1,
+                        help='Compile N files in parallel (default: %(default)s).')
+    parser.add_argument('--assemble', dest='assemble', action='store_true',
+                        help='Build object files of all the outputs with a single gcc -c.')
+    parser.add_argument('--freestanding', dest='freestanding', action='store_true',
+                        help='Emit _start entry points, see main.py.')
+    parser.add_argument('--no-fold-calls', dest='fold_calls', action='store_false',
+                        help='Do not evaluate calls of pure functions at compile time.')
+    parser.add_argument('--cache-dir', dest='cache_dir', metavar='DIR',
+                        default=PythonCodeCache.default_directory(),
+                        help='Directory caching the assembly of compiled functions '
+                             '(default: %(default)s).')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None,
+                        help='Do not cache any compiled code.')
+    parser.add_argument('--cache-size', dest='cache_size', metavar='BYTES', type=int,
+                        default=64 * 1024 * 1024,
+                        help='Size limit of the cache of compiled functions (default: '
+                             '%(default)s).')
+    args = parser.parse_args()
+
+    operation = args.operation or Operation.Compile
+    if args.assemble and operation == Operation.CompileExecutable:
+        parser.error('--assemble cannot be used with -e')
+    sources = list(args.files)
+    for manifest in args.manifest:
+        sources += read_manifest(manifest)
+    if not sources:
+        parser.error('no files to compile')
+
+    cache_dir = os.path.join(args.cache_dir, 'functions') if args.cache_dir else None
+    compiler = BatchCompiler(args.output_dir, args.jobs,
+                             BatchOptions(operation, args.freestanding, args.fold_calls,
+                                          cache_dir, args.cache_size))
+    outputs, errors = compiler.compile(sources)
+    for source, error in errors.items():
+        print(f'{source}: {error}', file=sys.stderr)
+    if args.assemble:
+        compiler.assemble(outputs)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
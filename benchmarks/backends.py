@@ -0,0 +1,83 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from io import StringIO
+
+from simpylic import simpylic
+
+from interpreters import PROGRAMS
+
+
+def build(source, operation, binary):
+    output = StringIO()
+    simpylic.run(StringIO(source), output, operation)
+    if operation == simpylic.Operation.CompileC:
+        command = ['gcc', '-std=c99', '-O2', '-x', 'c', '-', '-o', binary]
+    else:
+        command = ['gcc', '-x', 'assembler', '-', '-z', 'noexecstack', '-o', binary]
+    subprocess.run(command, input=output.getvalue().encode('utf-8'), check=True)
+
+
+def measure(binary, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([binary], check=False).returncode
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+BACKENDS = {
+    'native': simpylic.Operation.Compile,
+    'c-O2': simpylic.Operation.CompileC,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compares the native back end with the C back end built by gcc -O2.')
+    parser.add_argument('-n', dest='size', type=int, default=100000000,
+                        help='Number of loop iterations of the benchmark programs.')
+    parser.add_argument('-r', dest='repeat', type=int, default=3,
+                        help='Number of repetitions, the best time is reported.')
+    args = parser.parse_args()
+
+    print(f'{"program":<16}' + ''.join(f'{backend:>12}' for backend in BACKENDS) + '     speedup')
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in PROGRAMS.items():
+            timings = {}
+            results = set()
+            for backend, operation in BACKENDS.items():
+                binary = os.path.join(directory, f'{name}-{backend}')
+                build(source.format(n=args.size), operation, binary)
+                result, timings[backend] = measure(binary, args.repeat)
+                results.add(result)
+            if len(results) != 1:
+                raise RuntimeError(f'Back ends disagree on the result of {name}: {results}')
+            print(f'{name:<16}' + ''.join(f'{timings[backend]:>11.3f}s' for backend in BACKENDS)
+                  + f'     c-O2 {timings["native"] / timings["c-O2"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
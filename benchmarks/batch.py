@@ -0,0 +1,86 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import time
+from io import StringIO
+
+import numpy as np
+
+from simpylic import simpylic
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.interpreter import ClosureProgram
+
+
+PROGRAMS = {
+    'polynomial': ("""def f(x):
+    return (((x * x) * 3) - (x * 7)) + 11
+
+return 0
+""", lambda rows: np.arange(rows)),
+    'clamp': ("""def f(x, lo, hi):
+    if x < lo:
+        return lo
+    if x > hi:
+        return hi
+    return x
+
+return 0
+""", lambda rows: np.random.default_rng(0).integers(-1000, 1000, size=(rows, 3))),
+    'collatz': ("""def f(x):
+    steps = 0
+    while x > 1:
+        steps = steps + 1
+        x = (((x / 2) * 2) == x) ? (x / 2) : ((x * 3) + 1)
+    return steps
+
+return 0
+""", lambda rows: np.arange(1, rows + 1)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compares batch_eval with calling the closure engine for each row.')
+    parser.add_argument('-n', dest='rows', type=int, default=100000, help='Number of rows.')
+    args = parser.parse_args()
+
+    print(f'{"program":<16}{"batch":>12}{"per-row":>12}     speedup')
+    for name, (source, make_rows) in PROGRAMS.items():
+        program = Parser().parse(Tokenizer(StringIO(source)).tokenize())
+        AstPreprocessor().process(program)
+        rows = make_rows(args.rows)
+
+        start = time.perf_counter()
+        result = simpylic.batch_eval(program, 'f', rows)
+        batch_time = time.perf_counter() - start
+
+        engine = ClosureProgram(program)
+        start = time.perf_counter()
+        expected = [engine.run('_main_f', [int(value) for value in np.atleast_1d(row)])
+                    for row in rows]
+        row_time = time.perf_counter() - start
+
+        if result.tolist() != expected:
+            raise RuntimeError(f'batch_eval disagrees with the closure engine on {name}')
+        print(f'{name:<16}{batch_time:>11.3f}s{row_time:>11.3f}s     {row_time / batch_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import time
+from io import StringIO
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.interpreter import TreeWalker, BytecodeCompiler, VirtualMachine, ClosureProgram, \
+    PythonProgram
+
+
+PROGRAMS = {
+    'sum-loop': """i = 0
+total = 0
+while i < {n}:
+    total = total + i
+    i = i + 1
+
+return total
+""",
+    'nested-loops': """i = 0
+total = 0
+while i < {n} / 100:
+    j = 0
+    while j < 100:
+        if (((i + j) / 2) * 2) == (i + j):
+            total = total + 1
+        j = j + 1
+    i = i + 1
+
+return total
+""",
+    'collatz': """n = 1
+steps = 0
+while n < {n} / 50:
+    x = n
+    while x > 1:
+        steps = steps + 1
+        x = (((x / 2) * 2) == x) ? (x / 2) : ((x * 3) + 1)
+    n = n + 1
+
+return steps
+""",
+    'calls': """def add(a, b):
+    return a + b
+
+i = 0
+total = 0
+while i < {n}:
+    total = add(total, i)
+    i = i + 1
+
+return total
+""",
+}
+
+
+def parse(source):
+    program = Parser().parse(Tokenizer(StringIO(source)).tokenize())
+    AstPreprocessor().process(program)
+    return program
+
+
+def measure(engine_factory, program, repeat):
+    engine = engine_factory(program)
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = engine.run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+ENGINES = {
+    'ast': TreeWalker,
+    'vm': lambda program: VirtualMachine(BytecodeCompiler().compile(program)),
+    'vm-plain': lambda program: VirtualMachine(BytecodeCompiler(False).compile(program)),
+    'closure': ClosureProgram,
+    'python': lambda program: PythonProgram(PythonProgram.compile(program)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares throughput of interpreter engines.')
+    parser.add_argument('-n', dest='size', type=int, default=100000,
+                        help='Number of loop iterations of the benchmark programs.')
+    parser.add_argument('-r', dest='repeat', type=int, default=3,
+                        help='Number of repetitions, the best time is reported.')
+    parser.add_argument('--baseline', dest='baseline', default='ast', choices=list(ENGINES))
+    args = parser.parse_args()
+
+    print(f'{"program":<16}' + ''.join(f'{engine:>12}' for engine in ENGINES) + '     speedup')
+    for name, source in PROGRAMS.items():
+        program = parse(source.format(n=args.size))
+        timings = {}
+        results = set()
+        for engine, factory in ENGINES.items():
+            result, timings[engine] = measure(factory, program, args.repeat)
+            results.add(result)
+        if len(results) != 1:
+            raise RuntimeError(f'Engines disagree on the result of {name}: {results}')
+
+        speedups = ', '.join(f'{engine} {timings[args.baseline] / timing:.1f}x'
+                             for engine, timing in timings.items() if engine != args.baseline)
+        print(f'{name:<16}' + ''.join(f'{timings[engine]:>11.3f}s' for engine in ENGINES)
+              + f'     {speedups}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import glob
+from collections import Counter
+from io import StringIO
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.interpreter import BytecodeCompiler, Op
+
+from interpreters import PROGRAMS
+
+
+def compile_source(source, superinstructions):
+    program = Parser().parse(Tokenizer(StringIO(source)).tokenize())
+    AstPreprocessor().process(program)
+    return BytecodeCompiler(superinstructions).compile(program)
+
+
+def loop_weights(instructions, weight):
+    """Weight of each instruction, multiplied by the weight for each enclosing loop."""
+    weights = [1] * len(instructions)
+    for position, op, arguments in instructions:
+        if op == Op.Jump and arguments[0] < position:
+            for index, (other, _, _) in enumerate(instructions):
+                if arguments[0] <= other <= position:
+                    weights[index] *= weight
+    return weights
+
+
+def sequence_counts(functions, length, weight):
+    counts = Counter()
+    for function in functions:
+        instructions = function.disassemble()
+        weights = loop_weights(instructions, weight)
+        for index in range(len(instructions) - length + 1):
+            sequence = tuple(op.name for _, op, _ in instructions[index:index + length])
+            counts[sequence] += weights[index]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Prints loop-weighted frequencies of opcode sequences in the bytecode '
+                    'of the testdata corpus and of the benchmark programs.')
+    parser.add_argument('-l', dest='length', type=int, default=2,
+                        help='Length of the counted opcode sequences.')
+    parser.add_argument('-w', dest='weight', type=int, default=10,
+                        help='Weight multiplier of an instruction for each enclosing loop.')
+    parser.add_argument('-n', dest='top', type=int, default=20,
+                        help='Number of the most frequent sequences to print.')
+    parser.add_argument('--superinstructions', dest='superinstructions', action='store_true',
+                        help='Count the sequences after fusing of superinstructions.')
+    args = parser.parse_args()
+
+    sources = [open(path, encoding='utf-8').read() for path in sorted(glob.glob('testdata/*.spy'))]
+    sources += [source.format(n=100) for source in PROGRAMS.values()]
+
+    counts = Counter()
+    dispatches = Counter()
+    for source in sources:
+        for superinstructions in (False, True):
+            functions = compile_source(source, superinstructions)
+            dispatches[superinstructions] += \
+                sum(sequence_counts(functions, 1, args.weight).values())
+            if superinstructions == args.superinstructions:
+                counts += sequence_counts(functions, args.length, args.weight)
+
+    for sequence, count in counts.most_common(args.top):
+        print(f'{count:>8}  {" ".join(sequence)}')
+    print(f'\nweighted dispatches: {dispatches[False]} plain, {dispatches[True]} fused '
+          f'({100 * (1 - dispatches[True] / dispatches[False]):.0f}% fewer)')
+
+
+if __name__ == '__main__':
+    main()
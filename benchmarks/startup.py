@@ -0,0 +1,80 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from simpylic import simpylic
+
+
+SOURCE = "return 42\n"
+
+
+def build_with_gcc(binary, freestanding):
+    output = StringIO()
+    simpylic.run(StringIO(SOURCE), output, simpylic.Operation.Compile, freestanding=freestanding)
+    flags = ['-nostdlib', '-static'] if freestanding else []
+    subprocess.run(['gcc', *flags, '-x', 'assembler', '-', '-z', 'noexecstack', '-o', binary],
+                   input=output.getvalue().encode('utf-8'), check=True)
+
+
+def build_executable(binary):
+    output = BytesIO()
+    simpylic.run(StringIO(SOURCE), output, simpylic.Operation.CompileExecutable)
+    with open(binary, 'wb') as outfile:
+        outfile.write(output.getvalue())
+    os.chmod(binary, 0o755)
+
+
+def measure(binary, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        pid = os.posix_spawn(binary, [binary], {})
+        _, status = os.waitpid(pid, 0)
+        if os.waitstatus_to_exitcode(status) != 42:
+            raise RuntimeError(f'{binary} exited with an unexpected status {status}')
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compares process startup latency of programs linked with libc and '
+                    'of freestanding programs.')
+    parser.add_argument('-n', dest='runs', type=int, default=1000,
+                        help='Number of runs of each program.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        binaries = {
+            'libc': os.path.join(directory, 'libc'),
+            'freestanding': os.path.join(directory, 'freestanding'),
+            'elf': os.path.join(directory, 'elf'),
+        }
+        build_with_gcc(binaries['libc'], freestanding=False)
+        build_with_gcc(binaries['freestanding'], freestanding=True)
+        build_executable(binaries['elf'])
+
+        for name, binary in binaries.items():
+            print(f'{name:<16}{measure(binary, args.runs) * 1e6:>10.0f} us per run')
+
+
+if __name__ == '__main__':
+    main()
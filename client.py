@@ -0,0 +1,66 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import traceback
+
+from simpylic.client import default_socket_path, request
+
+
+def run_locally(argv):
+    """Does the work of main.py in this process, returns its exit status."""
+    # Imported only here, the compiler is slow to import
+    from simpylic import cli  # pylint: disable=import-outside-toplevel
+    try:
+        cli.execute_files(cli.parse_arguments(cli.create_argument_parser(), argv))
+    except SystemExit as error:
+        return error.code if isinstance(error.code, int) else 1
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def main():
+    """Takes the arguments of main.py, and --socket PATH of the server started by serve.py.
+
+    Without a running server, the work is done in this process.
+    """
+    argv = sys.argv[1:]
+    socket_path = default_socket_path()
+    if '--socket' in argv:
+        index = argv.index('--socket')
+        socket_path = argv[index + 1]
+        del argv[index:index + 2]
+
+    try:
+        status, output, error = request(socket_path, argv, os.getcwd())
+    except (ConnectionRefusedError, FileNotFoundError):
+        # No server is running
+        return run_locally(argv)
+    except OSError as error:
+        # The server failed in the middle of the request, which is not run again
+        print(f"client.py: the request failed: {error}", file=sys.stderr)
+        return 1
+
+    sys.stderr.write(error)
+    sys.stdout.buffer.write(output)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
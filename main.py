@@ -15,42 +15,15 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import argparse
-from sys import stdout
-
-from simpylic import simpylic
+from simpylic import cli
 
 
 def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('file', metavar='FILE', type=str, help='File to process.')
-    parser.add_argument('-o', dest='output', metavar='OUTFILE', type=str,
-                        help='File to write assembly into.')
-    group = parser.add_mutually_exclusive_group(required=True)
-    group.add_argument('-c', dest='compile', action='store_true',
-                       help='Compile the code into assembly.')
-    group.add_argument('-i', dest='interpret', action='store_true',
-                       help='Interpret the program.')
-    group.add_argument('-a', dest='dump_ast', action='store_true',
-                       help='Dump the AST and exit.')
-    group.add_argument('-t', dest='dump_tokens', action='store_true',
-                       help='Dump tokenizer output and exit.')
-
-    args = parser.parse_args()
-
-    with open(args.file, 'r', encoding='utf-8') as srcfile:
-        is_stdout = not args.output or args.output == '-'
-        with stdout if is_stdout else open(args.output, 'w', encoding='utf-8') as outfile:
-            if args.dump_ast:
-                operation = simpylic.Operation.DumpAst
-            elif args.dump_tokens:
-                operation = simpylic.Operation.DumpTokens
-            elif args.compile:
-                operation = simpylic.Operation.Compile
-            else:
-                operation = simpylic.Operation.Interpret
-
-            simpylic.run(srcfile, outfile, operation)
+    args = cli.parse_arguments(cli.create_argument_parser())
+    if args.watch:
+        cli.watch(args)
+    else:
+        cli.execute_files(args)
 
 
 if __name__ == "__main__":
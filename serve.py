@@ -0,0 +1,55 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+
+from simpylic.client import default_socket_path
+from simpylic.server import CompileServer
+
+
+async def serve(server: CompileServer):
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                  asyncio.current_task().cancel)
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Keeps the compiler running and serves the requests of client.py.')
+    parser.add_argument('--socket', dest='socket', metavar='PATH',
+                        default=default_socket_path(),
+                        help='Unix domain socket to listen on (default: %(default)s).')
+    parser.add_argument('-w', dest='workers', metavar='N', type=int,
+                        default=os.cpu_count() or 1,
+                        help='Number of requests processed concurrently (default: %(default)s).')
+    parser.add_argument('--max-steps', dest='max_steps', metavar='N', type=int,
+                        default=10 ** 7,
+                        help='Stop the interpreted programs after N steps (default: '
+                             '%(default)s).')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(CompileServer(args.socket, args.workers, args.max_steps)))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
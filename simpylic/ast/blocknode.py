@@ -27,6 +27,9 @@ class BlockNode(Node):
     def add_statement(self, stmt: StmtNode):
         self._add_child(stmt)
 
+    def insert_statement(self, index: int, stmt: StmtNode):
+        self._insert_child(index, stmt)
+
     @property
     def statements(self) -> List[StmtNode]:
         # FIXME
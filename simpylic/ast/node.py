@@ -47,11 +47,29 @@ class Node:
         self.__children.append(node)
         node._set_parent(self)
 
+    def _insert_child(self, index: int, node: 'Node'):
+        self.__children.insert(index, node)
+        node._set_parent(self)
+
     def remove_child(self, node: 'Node'):
         if node in self.__children:
             self.__children.remove(node)
         node._set_parent(None)
 
+    def replace_child(self, old: 'Node', new: 'Node'):
+        """Puts the new node in place of the old child, keeping the order of children.
+
+        Parents tell some of their children apart by marker attributes set on
+        them (e.g. _lhs), those are carried over to the new node.
+        """
+        index = self.__children.index(old)
+        for name, value in vars(old).items():
+            if '__' not in name:
+                setattr(new, name, value)
+        self.__children[index] = new
+        new._set_parent(self)
+        old._set_parent(None)
+
     def _replace_child(self, old_fun: Callable[[Any], 'Node'], new: Optional['Node']):
         try:
             old: Optional[Node] = old_fun(self)
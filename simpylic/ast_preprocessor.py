@@ -15,9 +15,9 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from typing import List, cast
+from typing import Dict, List, Optional, cast
 
-from .ast import Node, ProgramNode, FunDefNode
+from .ast import Node, ProgramNode, FunDefNode, FunCallNode, ScopeNode, StmtNode
 from .ast import asthelper as AstHelper
 
 
@@ -60,3 +60,70 @@ class AstPreprocessor:
         function_stack: List[FunDefNode] = []
         find_functions(program, function_stack)
         move_functions_to_program_scope(program, function_stack)
+
+
+class StreamingPreprocessor:
+    """Preprocesses a program one top-level statement at a time.
+
+    The functions defined by each statement are hoisted and renamed just
+    like AstPreprocessor does, and are final as soon as the statement is
+    processed, so they can be compiled (and dropped) right away. Calls of
+    functions defined by earlier statements are renamed as the statements
+    come. The remaining statements are collected in the main function,
+    which is final only after all the statements.
+
+    The renames of the functions defined by earlier statements can be given,
+    to continue the preprocessing of a program from the middle.
+    """
+
+    def __init__(self, renames: Optional[Dict[str, str]] = None):
+        self.__main = FunDefNode("main", arguments=[])
+        self.__main.body = ScopeNode()
+        self.__renames: Dict[str, str] = dict(renames) if renames else {}
+
+    @property
+    def main(self) -> FunDefNode:
+        return self.__main
+
+    @property
+    def renames(self) -> Dict[str, str]:
+        """New names of the top-level functions, keyed by their names in the source."""
+        return self.__renames
+
+    def process(self, statement: StmtNode) -> List[FunDefNode]:
+        """Returns the functions hoisted out of the statement."""
+        self.__rename_calls(statement)
+
+        # The statement alone in a program, as if it was the first statement of main
+        program = ProgramNode()
+        main = FunDefNode("main", arguments=[])
+        main.body = ScopeNode()
+        program.add_function(main)
+        main.body.add_statement(statement)
+        top_level_functions: List[FunDefNode] = []
+        StreamingPreprocessor.__find_functions(statement, top_level_functions)
+        old_names = [function.name for function in top_level_functions]
+
+        AstPreprocessor().process(program)
+
+        for old_name, function in zip(old_names, top_level_functions):
+            self.__renames[old_name] = function.name
+        if statement.parent is main.body:
+            main.body.remove_child(statement)
+            self.__main.body.add_statement(statement)
+        return program.functions[1:]
+
+    @staticmethod
+    def __find_functions(node: Node, functions: List[FunDefNode]):
+        """Finds the functions defined directly in the scope of main."""
+        if isinstance(node, FunDefNode):
+            functions.append(node)
+            return
+        for child in node.children:
+            StreamingPreprocessor.__find_functions(child, functions)
+
+    def __rename_calls(self, node: Node):
+        if isinstance(node, FunCallNode) and node.name in self.__renames:
+            node.name = self.__renames[node.name]
+        for child in node.children:
+            self.__rename_calls(child)
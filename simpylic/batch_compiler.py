@@ -0,0 +1,144 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .function_cache import FunctionCache
+from .simpylic import run, Operation
+
+
+class BatchOptions(NamedTuple):
+    operation: Operation = Operation.Compile
+    freestanding: bool = False
+    fold_calls: bool = True
+    cache_dir: Optional[str] = None
+    cache_size: int = 64 * 1024 * 1024
+
+
+EXTENSIONS = {
+    Operation.Compile: '.s',
+    Operation.CompileC: '.c',
+    Operation.CompileExecutable: '',
+}
+
+
+def read_manifest(path: str) -> List[str]:
+    """Returns the source files listed in the manifest, one per line.
+
+    Empty lines and lines starting with # are skipped, relative paths are
+    relative to the directory of the manifest.
+    """
+    directory = os.path.dirname(path)
+    with open(path, encoding='utf-8') as infile:
+        lines = [line.strip() for line in infile]
+    return [os.path.join(directory, line) for line in lines if line and not line.startswith('#')]
+
+
+def compile_file(options: BatchOptions, source: str, output: str):
+    """Compiles a single file, in the batch process or in a worker process.
+
+    The output is written into a temporary file first, so that a failed
+    compilation leaves no partial output behind.
+    """
+    function_cache = FunctionCache(options.cache_dir, options.cache_size) \
+        if options.cache_dir else None
+    temporary = f'{output}.{os.getpid()}.tmp'
+    try:
+        with open(source, encoding='utf-8') as srcfile:
+            if options.operation == Operation.CompileExecutable:
+                with open(temporary, 'wb') as outfile:
+                    run(srcfile, outfile, options.operation, freestanding=options.freestanding,
+                        fold_calls=options.fold_calls)
+                os.chmod(temporary, 0o755)
+            else:
+                with open(temporary, 'w', encoding='utf-8') as outfile:
+                    run(srcfile, outfile, options.operation, freestanding=options.freestanding,
+                        fold_calls=options.fold_calls, function_cache=function_cache)
+        os.replace(temporary, output)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class BatchCompiler:
+    """Compiles many source files into an output directory in a single run.
+
+    The files are compiled in this process, or on a pool of processes, each
+    of which pays the start-up and the imports once for all of its files.
+    The output of each file is named after the source file. The generated
+    assembly or C code can then be turned into object files by a single
+    invocation of gcc.
+    """
+
+    def __init__(self, output_dir: str, jobs: int = 1, options: BatchOptions = BatchOptions()):
+        self.__output_dir = output_dir
+        self.__jobs = jobs
+        self.__options = options
+
+    def output_path(self, source: str) -> str:
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.__output_dir, name + EXTENSIONS[self.__options.operation])
+
+    def compile(self, sources: Sequence[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Returns the outputs of the files compiled successfully, and the errors of the
+        other files."""
+        outputs = [self.output_path(source) for source in sources]
+        if len(set(outputs)) != len(outputs):
+            raise ValueError("The source files must have distinct names")
+        os.makedirs(self.__output_dir, exist_ok=True)
+
+        compile_one = partial(compile_file, self.__options)
+        if self.__jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.__jobs) as executor:
+                futures = [executor.submit(compile_one, source, output)
+                           for source, output in zip(sources, outputs)]
+                results = [future.exception() for future in futures]
+        else:
+            results = []
+            for source, output in zip(sources, outputs):
+                try:
+                    compile_one(source, output)
+                    results.append(None)
+                except Exception as error:  # pylint: disable=broad-except
+                    results.append(error)
+
+        errors = {source: f'{type(error).__name__}: {error}'
+                  for source, error in zip(sources, results) if error is not None}
+        return [output for output, error in zip(outputs, results) if error is None], errors
+
+    def assemble(self, outputs: Sequence[str]) -> List[str]:
+        """Builds object files of the generated code with a single gcc -c."""
+        if self.__options.operation == Operation.Compile:
+            flags = []
+        elif self.__options.operation == Operation.CompileC:
+            flags = ['-std=c99', '-O2']
+        else:
+            raise ValueError("Only assembly and C code can be assembled")
+        if not outputs:
+            return []
+
+        # gcc -c writes the object files into the working directory
+        compiler = subprocess.run(['gcc', *flags, '-c', *(os.path.abspath(output)
+                                                          for output in outputs)],
+                                  cwd=self.__output_dir, stderr=subprocess.PIPE, check=False)
+        if compiler.returncode != 0:
+            raise RuntimeError(f'gcc error {compiler.returncode}: {compiler.stderr}')
+        return [os.path.splitext(output)[0] + '.o' for output in outputs]
@@ -0,0 +1,181 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import List, TextIO
+
+from . import ast
+
+
+class CGeneratorError(Exception):
+    pass
+
+
+class CGenerator:
+    """Translates the preprocessed AST into portable C99 source.
+
+    Every function becomes a C function returning int32_t, with all its
+    variables declared as int32_t locals. Signed overflow is undefined in C,
+    so addition, subtraction, multiplication and negation go through inline
+    helpers computing in uint32_t, which gives the same wraparound as the
+    native code. The division of C99 truncates towards zero like idiv does.
+    Expressions are fully parenthesized, since the Simpylic AST does not
+    follow C operator precedence.
+    """
+
+    __prelude = """#include <stdint.h>
+
+static inline int32_t spy_add(int32_t a, int32_t b) { return (int32_t)((uint32_t)a + (uint32_t)b); }
+static inline int32_t spy_sub(int32_t a, int32_t b) { return (int32_t)((uint32_t)a - (uint32_t)b); }
+static inline int32_t spy_mul(int32_t a, int32_t b) { return (int32_t)((uint32_t)a * (uint32_t)b); }
+static inline int32_t spy_neg(int32_t a) { return (int32_t)(0u - (uint32_t)a); }
+"""
+
+    __arithmetic_helpers = {
+        ast.BinaryOperatorNode.Type.Addition: "spy_add",
+        ast.BinaryOperatorNode.Type.Subtraction: "spy_sub",
+        ast.BinaryOperatorNode.Type.Multiplication: "spy_mul",
+    }
+    __operators = {
+        ast.BinaryOperatorNode.Type.Division: "/",
+        ast.LogicOperatorNode.Type.LessThan: "<",
+        ast.LogicOperatorNode.Type.LessThanOrEqual: "<=",
+        ast.LogicOperatorNode.Type.Equals: "==",
+        ast.LogicOperatorNode.Type.NotEquals: "!=",
+        ast.LogicOperatorNode.Type.GreaterThanOrEqual: ">=",
+        ast.LogicOperatorNode.Type.GreaterThan: ">",
+        ast.LogicOperatorNode.Type.And: "&&",
+        ast.LogicOperatorNode.Type.Or: "||",
+    }
+    __unary_operators = {
+        ast.UnaryOperatorNode.Type.BitwiseComplement: "~",
+        ast.UnaryOperatorNode.Type.LogicalNegation: "!",
+    }
+
+    def __init__(self, output: TextIO):
+        self.__output = output
+        self.__lines: List[str] = []
+
+    def generate(self, program_node: ast.ProgramNode):
+        self.__output.write(CGenerator.__prelude)
+        functions = list(program_node.functions)
+        # Declare all functions upfront, so that they can call each other in any order
+        self.__output.write("\n")
+        for func in functions:
+            self.__output.write(f"{CGenerator.__signature(func)};\n")
+        for func in functions:
+            self.__output.write("\n")
+            self.__output.write(self.__generate_function(func))
+
+    @staticmethod
+    def __signature(function_node: ast.FunDefNode) -> str:
+        if function_node.name == "main":
+            return "int main(void)"
+        arguments = ", ".join(f"int32_t {CGenerator.__variable(arg)}"
+                              for arg in function_node.arguments)
+        return f"static int32_t {function_node.name}({arguments or 'void'})"
+
+    @staticmethod
+    def __variable(name: str) -> str:
+        return f"v_{name}"
+
+    @staticmethod
+    def __variables(node: ast.Node):
+        if isinstance(node, (ast.VarNode, ast.VarDeclNode)):
+            yield node.name
+        for child in node.children:
+            yield from CGenerator.__variables(child)
+
+    def __generate_function(self, function_node: ast.FunDefNode) -> str:
+        self.__lines = [f"{CGenerator.__signature(function_node)}", "{"]
+        variables = sorted(set(CGenerator.__variables(function_node.body))
+                           - set(function_node.arguments))
+        if variables:
+            declarations = ", ".join(f"{CGenerator.__variable(name)} = 0" for name in variables)
+            self.__line(1, f"int32_t {declarations};")
+        self.__generate_block(function_node.body, 1)
+        self.__line(1, "return 0;")
+        self.__lines.append("}")
+        return "\n".join(self.__lines) + "\n"
+
+    def __line(self, depth: int, text: str):
+        self.__lines.append(" " * (depth * 4) + text)
+
+    def __generate_block(self, block_node: ast.BlockNode, depth: int):
+        for stmt in block_node.statements:
+            self.__generate_statement(stmt, depth)
+
+    def __generate_statement(self, stmt_node: ast.StmtNode, depth: int):
+        if isinstance(stmt_node, ast.ReturnStmtNode):
+            self.__line(depth, f"return {self.__generate_expression(stmt_node.expr)};")
+        elif isinstance(stmt_node, ast.ConditionNode):
+            keyword = "if"
+            for node in [stmt_node.if_statement] + stmt_node.elif_statements:
+                condition = self.__generate_condition(node.condition_expr)
+                self.__line(depth, f"{keyword} ({condition}) {{")
+                self.__generate_block(node.true_block, depth + 1)
+                keyword = "} else if"
+            if stmt_node.else_statement:
+                self.__line(depth, "} else {")
+                self.__generate_block(stmt_node.else_statement.false_block, depth + 1)
+            self.__line(depth, "}")
+        elif isinstance(stmt_node, ast.WhileStmtNode):
+            self.__line(depth, f"while ({self.__generate_condition(stmt_node.condition_expr)}) {{")
+            self.__generate_block(stmt_node.body, depth + 1)
+            self.__line(depth, "}")
+        else:
+            self.__line(depth, f"{self.__generate_expression(stmt_node)};")
+
+    def __generate_condition(self, expr_node: ast.Node) -> str:
+        """Generates the expression without the parentheses of its operator."""
+        if isinstance(expr_node, ast.LogicOperatorNode):
+            return f"{self.__generate_expression(expr_node.lhs_expr)} " \
+                   f"{CGenerator.__operators[expr_node.type]} " \
+                   f"{self.__generate_expression(expr_node.rhs_expr)}"
+        return self.__generate_expression(expr_node)
+
+    def __generate_expression(self, expr_node: ast.Node) -> str:
+        if isinstance(expr_node, ast.ConstantNode):
+            return str(expr_node.value)
+        if isinstance(expr_node, ast.VarNode):
+            return CGenerator.__variable(expr_node.name)
+        if isinstance(expr_node, ast.VarDeclNode):
+            return f"({CGenerator.__variable(expr_node.name)} = " \
+                   f"{self.__generate_expression(expr_node.init_expr)})"
+        if isinstance(expr_node, ast.UnaryOperatorNode):
+            operand = self.__generate_expression(expr_node.expr)
+            if expr_node.type == ast.UnaryOperatorNode.Type.Negation:
+                return f"spy_neg({operand})"
+            return f"({CGenerator.__unary_operators[expr_node.type]}{operand})"
+        if isinstance(expr_node, ast.BinaryOperatorNode) \
+                and expr_node.type == ast.BinaryOperatorNode.Type.Assignment:
+            return f"({CGenerator.__variable(expr_node.lhs_expr.name)} = " \
+                   f"{self.__generate_expression(expr_node.rhs_expr)})"
+        if isinstance(expr_node, (ast.BinaryOperatorNode, ast.LogicOperatorNode)):
+            lhs = self.__generate_expression(expr_node.lhs_expr)
+            rhs = self.__generate_expression(expr_node.rhs_expr)
+            if expr_node.type in CGenerator.__arithmetic_helpers:
+                return f"{CGenerator.__arithmetic_helpers[expr_node.type]}({lhs}, {rhs})"
+            return f"({lhs} {CGenerator.__operators[expr_node.type]} {rhs})"
+        if isinstance(expr_node, ast.TernaryOperatorNode):
+            return f"({self.__generate_expression(expr_node.condition_expr)} ? " \
+                   f"{self.__generate_expression(expr_node.true_expr)} : " \
+                   f"{self.__generate_expression(expr_node.false_expr)})"
+        if isinstance(expr_node, ast.FunCallNode):
+            arguments = ", ".join(self.__generate_expression(arg) for arg in expr_node.arguments)
+            return f"{expr_node.name}({arguments})"
+
+        raise CGeneratorError(f"Invalid expression {expr_node}")
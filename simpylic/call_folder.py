@@ -0,0 +1,74 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import ast
+from .interpreter import TreeWalker, Memoizer, InterpreterError
+from .purity import PurityAnalyzer
+
+
+class CallFolder:
+    """Evaluates calls of pure functions with constant arguments at compile time.
+
+    Every such call is replaced by a ConstantNode with its result. Calls are
+    evaluated by the tree walker with a budget of statements, so that calls
+    which do not terminate (or take too long) are left to run time, as are
+    calls that fail, e.g. on division by zero. Results are shared by all
+    call sites, and the tree walker memoizes the pure functions as well.
+    """
+
+    memo_size = 4096
+
+    def __init__(self, max_steps: int = 100000):
+        self.__max_steps = max_steps
+
+    def fold(self, program_node: ast.ProgramNode) -> int:
+        """Folds the calls in place and returns the number of folded calls."""
+        pure = PurityAnalyzer().analyze(program_node)
+        evaluator = TreeWalker(program_node, Memoizer(CallFolder.memo_size), self.__max_steps)
+        # Results by function and arguments, None for calls that cannot be folded
+        results: Dict[Tuple[str, Tuple[int, ...]], Optional[int]] = {}
+        calls: List[ast.FunCallNode] = []
+        CallFolder.__find_calls(program_node, pure, calls)
+
+        folded = 0
+        # Calls are found in post-order, so arguments are folded before their callers
+        for call_node in calls:
+            arguments = call_node.arguments
+            if not all(isinstance(argument, ast.ConstantNode) for argument in arguments):
+                continue
+            key = (call_node.name, tuple(argument.value for argument in arguments))
+            if key not in results:
+                try:
+                    value = evaluator.run(call_node.name, list(key[1]))
+                except (InterpreterError, RecursionError):
+                    results[key] = None
+                else:
+                    results[key] = value
+            if results[key] is not None:
+                call_node.parent.replace_child(call_node,
+                                               ast.ConstantNode('int', results[key]))
+                folded += 1
+        return folded
+
+    @staticmethod
+    def __find_calls(node: ast.Node, pure: Set[str], calls: List[ast.FunCallNode]):
+        for child in node.children:
+            CallFolder.__find_calls(child, pure, calls)
+        if isinstance(node, ast.FunCallNode) and node.name in pure:
+            calls.append(node)
@@ -0,0 +1,181 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+from sys import stderr, stdout
+from typing import TextIO, BinaryIO, Optional, Sequence, Union
+
+from . import simpylic
+from .function_cache import FunctionCache
+from .interpreter import PythonCodeCache, Memoizer
+from .watcher import Watcher
+
+
+def create_argument_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument('file', metavar='FILE', type=str, nargs='?', help='File to process.')
+    parser.add_argument('-o', dest='output', metavar='OUTFILE', type=str,
+                        help='File to write assembly into (directory with --watch).')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-c', dest='compile', action='store_true',
+                       help='Compile the code into assembly.')
+    group.add_argument('-C', dest='compile_c', action='store_true',
+                       help='Translate the code into C99, to be built with e.g. gcc -O2.')
+    group.add_argument('-e', dest='compile_executable', action='store_true',
+                       help='Compile the code directly into a static ELF executable.')
+    group.add_argument('-i', dest='interpret', action='store_true',
+                       help='Interpret the program.')
+    group.add_argument('-a', dest='dump_ast', action='store_true',
+                       help='Dump the AST and exit.')
+    group.add_argument('-t', dest='dump_tokens', action='store_true',
+                       help='Dump tokenizer output and exit.')
+    parser.add_argument('-j', dest='jobs', metavar='N', type=int, default=1,
+                        help='Tokenize large files and generate the code of the functions in N '
+                             'parallel processes.')
+    parser.add_argument('--stream', dest='streaming', action='store_true',
+                        help='Compile each function as soon as it is read, to keep the memory '
+                             'use flat on large sources (only with -c, disables folding).')
+    parser.add_argument('--freestanding', dest='freestanding', action='store_true',
+                        help='Emit a _start entry point exiting via a direct syscall, so that '
+                             'the assembly can be linked with gcc -nostdlib -static.')
+    parser.add_argument('--no-fold-calls', dest='fold_calls', action='store_false',
+                        help='Do not evaluate calls of pure functions with constant arguments '
+                             'at compile time.')
+    parser.add_argument('--engine', dest='engine', choices=[e.value for e in simpylic.Engine],
+                        help='Execution engine for the interpreter mode (default: vm; the '
+                             'jit is faster, but dies on a division by zero).')
+    parser.add_argument('--no-superinstructions', dest='superinstructions',
+                        action='store_false',
+                        help='Do not fuse superinstructions in the bytecode of the vm engine.')
+    parser.add_argument('--memoize', dest='memoize', metavar='SIZE', type=int,
+                        help='Cache up to SIZE results of each pure function in the interpreter '
+                             'mode (not supported by the jit engine).')
+    parser.add_argument('--max-steps', dest='max_steps', metavar='N', type=int,
+                        help='Stop the program after N steps in the interpreter mode (only with '
+                             'the vm and ast engines).')
+    parser.add_argument('--memo-stats', dest='memo_stats', action='store_true',
+                        help='Print hit and miss statistics of the memoization caches.')
+    parser.add_argument('--cache-dir', dest='cache_dir', metavar='DIR',
+                        default=PythonCodeCache.default_directory(),
+                        help='Directory caching the assembly of compiled functions and the '
+                             'compiled code of the python engine (default: %(default)s).')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None,
+                        help='Do not cache any compiled code.')
+    parser.add_argument('--cache-size', dest='cache_size', metavar='BYTES', type=int,
+                        default=64 * 1024 * 1024,
+                        help='Size limit of the cache of compiled functions (default: '
+                             '%(default)s).')
+    parser.add_argument('--cache-stats', dest='cache_stats', action='store_true',
+                        help='Print hit and miss statistics of the cache of compiled functions.')
+    parser.add_argument('--watch', dest='watch', metavar='DIR', type=str,
+                        help='Compile the .spy files in DIR whenever they change, keeping '
+                             'the compiled functions in memory (only with -c).')
+    parser.add_argument('--debounce', dest='debounce', metavar='SECONDS', type=float,
+                        default=0.1,
+                        help='With --watch, compile once no change came for SECONDS '
+                             '(default: %(default)s).')
+    parser.add_argument('--max-delay', dest='max_delay', metavar='SECONDS', type=float,
+                        default=1.0,
+                        help='With --watch, collect changes for at most SECONDS before '
+                             'compiling them (default: %(default)s).')
+    parser.add_argument('--poll-interval', dest='poll_interval', metavar='SECONDS', type=float,
+                        default=0.5,
+                        help='With --watch, scan for changes every SECONDS (default: '
+                             '%(default)s).')
+    parser.add_argument('--no-inotify', dest='inotify', action='store_false',
+                        help='With --watch, only poll for changes, even where inotify is '
+                             'available.')
+    return parser
+
+
+def parse_arguments(parser: argparse.ArgumentParser,
+                    argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    args = parser.parse_args(argv)
+    if args.watch:
+        if args.file:
+            parser.error('FILE cannot be used with --watch')
+        if not args.compile or args.streaming:
+            parser.error('--watch can only be used with -c')
+    elif not args.file:
+        parser.error('the following arguments are required: FILE')
+    return args
+
+
+def operation(args: argparse.Namespace) -> simpylic.Operation:
+    if args.dump_ast:
+        return simpylic.Operation.DumpAst
+    if args.dump_tokens:
+        return simpylic.Operation.DumpTokens
+    if args.compile:
+        return simpylic.Operation.Compile
+    if args.compile_c:
+        return simpylic.Operation.CompileC
+    if args.compile_executable:
+        return simpylic.Operation.CompileExecutable
+    return simpylic.Operation.Interpret
+
+
+def create_function_cache(args: argparse.Namespace) -> Optional[FunctionCache]:
+    if not args.cache_dir:
+        return None
+    return FunctionCache(os.path.join(args.cache_dir, 'functions'), args.cache_size)
+
+
+def execute(args: argparse.Namespace, srcfile: TextIO, outfile: Union[TextIO, BinaryIO],
+            errfile: TextIO, function_cache: Optional[FunctionCache] = None):
+    """Runs the operation selected by the command line arguments on the source.
+
+    The statistics requested by the arguments are printed into errfile.
+    """
+    engine = simpylic.Engine(args.engine) if args.engine else None
+    memoizer = Memoizer(args.memoize) if args.memoize else None
+    simpylic.run(srcfile, outfile, operation(args), engine, args.superinstructions,
+                 args.cache_dir, args.freestanding, memoizer, args.fold_calls,
+                 function_cache, args.jobs, args.streaming, args.max_steps)
+    if memoizer and args.memo_stats:
+        print(memoizer.report(), file=errfile)
+    if function_cache and args.cache_stats:
+        print(function_cache.report(), file=errfile)
+
+
+def execute_files(args: argparse.Namespace):
+    """Runs the operation on the FILE argument, writing into the -o file or to stdout."""
+    with open(args.file, 'r', encoding='utf-8') as srcfile:
+        is_stdout = not args.output or args.output == '-'
+        if args.compile_executable:
+            outfile = stdout.buffer if is_stdout else open(args.output, 'wb')
+        else:
+            outfile = stdout if is_stdout else open(args.output, 'w', encoding='utf-8')
+        with outfile:
+            execute(args, srcfile, outfile, stderr, create_function_cache(args))
+
+        if args.compile_executable and not is_stdout:
+            os.chmod(args.output, 0o755)
+
+
+def watch(args: argparse.Namespace):
+    """Compiles the sources in the --watch directory on every change, until interrupted."""
+    output_dir = args.output if args.output and args.output != '-' else None
+    watcher = Watcher(args.watch, output_dir, args.freestanding, create_function_cache(args),
+                      args.debounce, args.max_delay, args.poll_interval, args.inotify, stderr)
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -0,0 +1,76 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import base64
+import json
+import os
+import socket
+import struct
+import tempfile
+from typing import List, Tuple
+
+# Imports of the compiler are deliberately avoided here: the client must start fast
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'simpylic.sock')
+    # Anyone can create files in the temporary directory, the server creates this
+    # directory accessible to its user only
+    return os.path.join(tempfile.gettempdir(), f'simpylic-{os.getuid()}', 'simpylic.sock')
+
+
+def check_server_owner(connection: socket.socket, socket_path: str):
+    """Raises PermissionError unless the server runs as the current user, so that the
+    requests are never sent to a server another user started on the path."""
+    if hasattr(socket, 'SO_PEERCRED'):
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                            struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', credentials)
+    else:
+        uid = os.stat(socket_path).st_uid
+    if uid != os.getuid():
+        raise PermissionError(f"The server on {socket_path} runs as another user ({uid})")
+
+
+def encode_message(message: dict) -> bytes:
+    """Messages are single lines of JSON."""
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+
+def decode_message(line: bytes) -> dict:
+    return json.loads(line.decode('utf-8'))
+
+
+def request(socket_path: str, argv: List[str], cwd: str) -> Tuple[int, bytes, str]:
+    """Runs main.py with the arguments in the server and returns its exit status, the
+    standard output and the standard error.
+
+    Raises OSError if there is no server listening on the socket, and PermissionError
+    if the server runs as another user.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        check_server_owner(connection, socket_path)
+        connection.sendall(encode_message({'argv': argv, 'cwd': cwd}))
+        with connection.makefile('rb') as response_file:
+            line = response_file.readline()
+    if not line:
+        raise ConnectionError("The server closed the connection")
+    response = decode_message(line)
+    return response['status'], base64.b64decode(response['output']), response['error']
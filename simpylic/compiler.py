@@ -15,9 +15,12 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from typing import TextIO, Dict, Union, cast
+from typing import TextIO, Dict, List, Optional, Tuple, Union, cast
 
 from . import ast
+from .expression_labeller import ExpressionLabeller
+from .frame_layout import FrameAllocator, FrameLayout
+from .instruction import Instruction, Opcode
 
 
 class AsmGeneratorError(Exception):
@@ -25,53 +28,145 @@ class AsmGeneratorError(Exception):
 
 
 class AsmEmitter:
+    """Collects instructions and serializes them into the output in bulk.
+
+    The instructions are kept as Instruction records until flush() is called,
+    so that they can still be inspected and rewritten before being written.
+    """
+
     def __init__(self, output):
         self._output = output
         self._depth = 1
         self._step = 4
+        self._instructions: List[Instruction] = []
+        indentation = " " * self._depth * self._step
+        self._prefixes = {opcode: f"{indentation}{opcode.value}" for opcode in Opcode}
 
-    def instruction(self, instruction: str, *args):
-        self._write(f"{instruction} {', '.join([str(s) for s in args])}")
+    @property
+    def instructions(self) -> List[Instruction]:
+        return self._instructions
+
+    def instruction(self, opcode: Opcode, *args: str):
+        self._instructions.append(Instruction(opcode, *args))
 
     def label(self, label: str):
-        self._write(f"{label}:", ident=False)
+        self._instructions.append(Instruction(Opcode.Label, label))
 
     def push_stack(self, reg: str):
-        self.instruction("push", reg)
+        self.instruction(Opcode.Push, reg)
 
     def pop_stack(self, reg: str):
-        self.instruction("pop", reg)
+        self.instruction(Opcode.Pop, reg)
+
+    def render(self) -> str:
+        """Serializes all pending instructions and removes them from the emitter."""
+        prefixes = self._prefixes
+        lines = []
+        for instruction in self._instructions:
+            operands = instruction.operands
+            if instruction.opcode == Opcode.Label:
+                lines.append(f"{operands[0]}:\n")
+            elif operands:
+                lines.append(f"{prefixes[instruction.opcode]} {', '.join(operands)}\n")
+            else:
+                lines.append(f"{prefixes[instruction.opcode]}\n")
+        self._instructions = []
+        return "".join(lines)
 
-    def _write(self, data: str, ident=True):
-        if ident:
-            self._output.write(" " * self._depth * self._step)
-        self._output.write(data)
-        self._output.write("\n")
+    def flush(self):
+        # Without an output the instructions are kept for the caller to consume
+        if self._output is not None:
+            self._output.write(self.render())
 
 
 class AsmGenerator:
-    def __init__(self, output: TextIO):
+    # Integer argument registers (64-bit and 32-bit names) of the System V AMD64 ABI
+    __argument_registers = [("%rdi", "%edi"), ("%rsi", "%esi"), ("%rdx", "%edx"),
+                            ("%rcx", "%ecx"), ("%r8", "%r8d"), ("%r9", "%r9d")]
+
+    __mirrored_comparisons = {
+        ast.LogicOperatorNode.Type.Equals: ast.LogicOperatorNode.Type.Equals,
+        ast.LogicOperatorNode.Type.NotEquals: ast.LogicOperatorNode.Type.NotEquals,
+        ast.LogicOperatorNode.Type.LessThan: ast.LogicOperatorNode.Type.GreaterThan,
+        ast.LogicOperatorNode.Type.LessThanOrEqual: ast.LogicOperatorNode.Type.GreaterThanOrEqual,
+        ast.LogicOperatorNode.Type.GreaterThan: ast.LogicOperatorNode.Type.LessThan,
+        ast.LogicOperatorNode.Type.GreaterThanOrEqual: ast.LogicOperatorNode.Type.LessThanOrEqual,
+    }
+
+    def __init__(self, output: Optional[TextIO], freestanding: bool = False):
         self.emitter = AsmEmitter(output)
+        self.__freestanding = freestanding
         self.__last_label_id = 0
-        self.__stack_index = 0
-        self.__variable_map: Dict[str, int] = {}
+        self.__frame = FrameLayout({})
+        self.__function: Optional[ast.FunDefNode] = None
+        self.__return_label = ''
+        self.__stack_depth = 0
+        self.__omit_frame_pointer = False
+        self.__labels: Dict[ast.Node, int] = {}
 
     def generate(self, program_node: ast.ProgramNode):
         self.emit_program_asm(program_node)
 
     def emit_program_asm(self, program_node: ast.ProgramNode):
-        self.emitter.instruction(".global", "main")
+        self.emit_header_asm()
         for func in program_node.functions:
             self.emit_function_asm(func)
+            # Stream the output in one chunk per function
+            self.emitter.flush()
+
+    def emit_header_asm(self):
+        """Emits everything that precedes the functions of the program."""
+        if self.__freestanding:
+            self.emit_start_asm()
+        self.emitter.instruction(Opcode.Global, "main")
+
+    def emit_start_asm(self):
+        """Emits the entry point of a program that is not linked with the C runtime.
+
+        It calls main and exits the process with its return value right away,
+        skipping all of the libc startup and shutdown.
+        """
+        self.emitter.instruction(Opcode.Global, "_start")
+        self.emitter.label("_start")
+        self.emitter.instruction(Opcode.Call, "main")
+        self.emitter.instruction(Opcode.Mov, "%eax", "%edi")
+        self.emitter.instruction(Opcode.Mov, "$231", "%eax")  # exit_group
+        self.emitter.instruction(Opcode.Syscall)
 
     def emit_function_asm(self, function_node: ast.FunDefNode):
+        """Emits the function. The code depends on nothing but the function's AST."""
+        self.__function = function_node
+        # Labels are numbered per function, so that each function can be
+        # generated (and cached) independently of the others
+        self.__last_label_id = 0
+        self.__frame = FrameAllocator().allocate(function_node)
+        self.__labels = ExpressionLabeller().label(function_node)
+        self.__return_label = self.__generate_label("return")
+        self.__stack_depth = 0
+        # Leaf functions never need to realign the stack for a call, so they
+        # can address their frame relative to %rsp and skip setting up %rbp.
+        self.__omit_frame_pointer = self.__frame.is_leaf
+
         self.emitter.label(function_node.name)
-        self.emitter.push_stack("%rbp")
-        self.emitter.instruction("mov", "%rsp", "%rbp")
+        if not self.__omit_frame_pointer:
+            self.emitter.push_stack("%rbp")
+            self.emitter.instruction(Opcode.Mov, "%rsp", "%rbp")
+        if self.__frame.size:
+            self.emitter.instruction(Opcode.Sub, f"${self.__frame.size}", "%rsp")
+        self.__emit_arguments_spill(function_node)
         self.__process_block(function_node.body)
-        self.emitter.instruction("mov", "%rbp", "%rsp")
-        self.emitter.pop_stack("%rbp")
-        self.emitter.instruction("ret")
+        statements = function_node.body.statements
+        if not statements or not isinstance(statements[-1], ast.ReturnStmtNode):
+            # Falling off the end returns 0, as in the interpreters
+            self.emitter.instruction(Opcode.Mov, "$0", "%eax")
+        self.emitter.label(self.__return_label)
+        if self.__omit_frame_pointer:
+            if self.__frame.size:
+                self.emitter.instruction(Opcode.Add, f"${self.__frame.size}", "%rsp")
+        else:
+            self.emitter.instruction(Opcode.Mov, "%rbp", "%rsp")
+            self.emitter.pop_stack("%rbp")
+        self.emitter.instruction(Opcode.Ret)
 
     def emit_statement_asm(self, stmt_node: ast.StmtNode):
         if isinstance(stmt_node, ast.ReturnStmtNode):
@@ -86,7 +181,9 @@ class AsmGenerator:
             self.__emit_expression_stmt(cast(ast.ExprNode, stmt_node))
 
     def __generate_label(self, label: str):
-        label = f'{label}_{self.__last_label_id}'
+        # The .L prefix keeps the labels local and apart from function names, the dot
+        # (never part of an identifier) keeps the labels of different functions apart
+        label = f'.L{self.__function.name}.{label}{self.__last_label_id}'
         self.__last_label_id += 1
         return label
 
@@ -94,14 +191,50 @@ class AsmGenerator:
         for stmt in block_node.statements:
             self.emit_statement_asm(stmt)
 
+    def __push(self, reg: str):
+        self.emitter.push_stack(reg)
+        self.__stack_depth += 8
+
+    def __pop(self, reg: str):
+        self.emitter.pop_stack(reg)
+        self.__stack_depth -= 8
+
+    def __frame_operand(self, offset: int) -> str:
+        """Returns operand for the given offset relative to the frame base (%rbp)."""
+        if self.__omit_frame_pointer:
+            # Without the saved %rbp the return address sits right above the frame
+            if offset > 0:
+                offset -= 8
+            return f"{offset + self.__frame.size + self.__stack_depth}(%rsp)"
+        return f"{offset}(%rbp)"
+
+    def __variable_operand(self, name: str) -> str:
+        if not self.__frame.has_variable(name):
+            raise AsmGeneratorError(f"Unknown variable {name} in function {self.__function.name}")
+        return self.__frame_operand(self.__frame.offset(name))
+
+    def __emit_arguments_spill(self, function_node: ast.FunDefNode):
+        for index, name in enumerate(function_node.arguments):
+            if index < len(AsmGenerator.__argument_registers):
+                register = AsmGenerator.__argument_registers[index][1]
+            else:
+                # Stack arguments are above the saved %rbp and the return address
+                stack_index = index - len(AsmGenerator.__argument_registers)
+                self.emitter.instruction(Opcode.Mov, self.__frame_operand(16 + stack_index * 8),
+                                         "%eax")
+                register = "%eax"
+            self.emitter.instruction(Opcode.Mov, register, self.__variable_operand(name))
+
     def __emit_return_stmt_asm(self, ret_node: ast.ReturnStmtNode):
         self.__emit_expression_stmt(ret_node.expr)
+        # The epilogue follows right after the last statement of the function
+        statements = self.__function.body.statements
+        if ret_node is not statements[-1]:
+            self.emitter.instruction(Opcode.Jmp, self.__return_label)
 
     def __emit_variable_declaration_asm(self, decl_node: ast.VarDeclNode):
         self.__emit_expression_stmt(decl_node.init_expr)
-        self.emitter.instruction("pushq %rax")
-        self.__stack_index -= 8
-        self.__variable_map[decl_node.name] = self.__stack_index
+        self.emitter.instruction(Opcode.Mov, "%eax", self.__variable_operand(decl_node.name))
 
     def __emit_condition_asm(self, cond_node: ast.ConditionNode):
         post_conditional_lbl = self.__generate_label("post_cond")
@@ -112,14 +245,14 @@ class AsmGenerator:
                 self.emitter.label(cond_label)
 
             self.__emit_expression_stmt(node.condition_expr)
-            self.emitter.instruction("cmpl", "$0", "%eax")
+            self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
             if is_last:
-                self.emitter.instruction("je", post_conditional_lbl)
+                self.emitter.instruction(Opcode.Je, post_conditional_lbl)
             else:
                 cond_label = self.__generate_label("cond")
-                self.emitter.instruction("je", cond_label)
+                self.emitter.instruction(Opcode.Je, cond_label)
             self.__process_block(node.true_block)
-            self.emitter.instruction("jmp", post_conditional_lbl)
+            self.emitter.instruction(Opcode.Jmp, post_conditional_lbl)
             return cond_label
 
         cond_label = self.__generate_label("cond")
@@ -144,107 +277,140 @@ class AsmGenerator:
 
         self.emitter.label(start_label)
         self.__emit_expression_stmt(stmt_node.condition_expr)
-        self.emitter.instruction("cmpl", "$0", "%eax")
-        self.emitter.instruction("je", end_label)
+        self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+        self.emitter.instruction(Opcode.Je, end_label)
 
         self.__process_block(stmt_node.body)
-        self.emitter.instruction("jmp", start_label)
+        self.emitter.instruction(Opcode.Jmp, start_label)
 
         self.emitter.label(end_label)
 
     def __emit_constant_value(self, stmt_node: ast.ConstantNode):
-        self.emitter.instruction("mov", f"${stmt_node.value}", "%eax")
+        self.emitter.instruction(Opcode.Mov, f"${stmt_node.value}", "%eax")
 
     def __emit_variable_access(self, stmt_node: ast.VarNode):
-        offset = self.__variable_map[stmt_node.name]
-        self.emitter.instruction("mov", f"{offset}(%rbp)", "%eax")
+        self.emitter.instruction(Opcode.Mov, self.__variable_operand(stmt_node.name), "%eax")
 
     def __emit_unary_operation(self, stmt_node: ast.UnaryOperatorNode):
         # First prepare the content
         self.__emit_expression_stmt(stmt_node.expr)
         if stmt_node.type == ast.UnaryOperatorNode.Type.Negation:
-            self.emitter.instruction("neg", "%eax")
+            self.emitter.instruction(Opcode.Neg, "%eax")
         elif stmt_node.type == ast.UnaryOperatorNode.Type.LogicalNegation:
-            self.emitter.instruction("cmp", "$0", "%eax")
-            self.emitter.instruction("sete", "%al")
-            self.emitter.instruction("movzb", "%al", "%eax")
+            self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+            self.emitter.instruction(Opcode.Sete, "%al")
+            self.emitter.instruction(Opcode.Movzb, "%al", "%eax")
         elif stmt_node.type == ast.UnaryOperatorNode.Type.BitwiseComplement:
-            self.emitter.instruction("not", "%eax")
+            self.emitter.instruction(Opcode.Not, "%eax")
 
     def __emit_binary_operation(self, stmt_node: ast.BinaryOperatorNode):
         if stmt_node.type == ast.BinaryOperatorNode.Type.Assignment:
             # First prepare the content
             self.__emit_expression_stmt(stmt_node.rhs_expr)
             assert isinstance(stmt_node.lhs_expr, (ast.VarDeclNode, ast.VarNode))
-            offset = self.__variable_map[stmt_node.lhs_expr.name]
-            self.emitter.instruction("mov", "%eax", f"{offset}(%rbp)")
+            self.emitter.instruction(Opcode.Mov, "%eax",
+                                     self.__variable_operand(stmt_node.lhs_expr.name))
         elif stmt_node.type in (ast.BinaryOperatorNode.Type.Addition,
                                 ast.BinaryOperatorNode.Type.Multiplication):
-            self.__emit_expression_stmt(stmt_node.lhs_expr)
-            self.emitter.push_stack("%rax")
-            self.__emit_expression_stmt(stmt_node.rhs_expr)
-            self.emitter.pop_stack("%rcx")
+            operand, _ = self.__emit_operands(stmt_node, commutative=True)
             if stmt_node.type == ast.BinaryOperatorNode.Type.Addition:
-                self.emitter.instruction("add", "%ecx", "%eax")
+                self.emitter.instruction(Opcode.Add, operand, "%eax")
             elif stmt_node.type == ast.BinaryOperatorNode.Type.Multiplication:
-                self.emitter.instruction("imul", "%ecx", "%eax")
+                self.emitter.instruction(Opcode.Imul, operand, "%eax")
         else:
-            self.__emit_expression_stmt(stmt_node.rhs_expr)
-            self.emitter.push_stack("%rax")
-            self.__emit_expression_stmt(stmt_node.lhs_expr)
-            self.emitter.pop_stack("%rcx")
+            operand, _ = self.__emit_operands(stmt_node, commutative=False)
             if stmt_node.type == ast.BinaryOperatorNode.Type.Subtraction:
-                self.emitter.instruction("sub", "%ecx", "%eax")
+                self.emitter.instruction(Opcode.Sub, operand, "%eax")
             elif stmt_node.type == ast.BinaryOperatorNode.Type.Division:
+                if operand != "%ecx":
+                    self.emitter.instruction(Opcode.Mov, operand, "%ecx")
                 # Sign-extend eax to edx:eax (idiv requires signed value)
-                self.emitter.instruction("cdq")
-                self.emitter.instruction("idiv", "%ecx")
+                self.emitter.instruction(Opcode.Cdq)
+                self.emitter.instruction(Opcode.Idiv, "%ecx")
+
+    def __emit_operands(self, stmt_node: Union[ast.BinaryOperatorNode, ast.LogicOperatorNode],
+                        commutative: bool) -> Tuple[str, bool]:
+        """Evaluates both operands of a binary operator, in the Sethi-Ullman order.
+
+        One of the operands ends up in %eax, the returned operand holds the other
+        one. When the returned flag is set the operands are swapped, i.e. %eax
+        holds the right-hand side, which may only happen for commutative operators.
+        """
+        lhs, rhs = stmt_node.lhs_expr, stmt_node.rhs_expr
+        if ExpressionLabeller.is_leaf(rhs):
+            self.__emit_expression_stmt(lhs)
+            return self.__simple_operand(rhs), False
+        if ExpressionLabeller.is_leaf(lhs):
+            self.__emit_expression_stmt(rhs)
+            if commutative:
+                return self.__simple_operand(lhs), True
+            self.emitter.instruction(Opcode.Mov, "%eax", "%ecx")
+            self.emitter.instruction(Opcode.Mov, self.__simple_operand(lhs), "%eax")
+            return "%ecx", False
+
+        if self.__labels[rhs] > self.__labels[lhs]:
+            self.__emit_expression_stmt(rhs)
+            self.__push("%rax")
+            self.__emit_expression_stmt(lhs)
+            self.__pop("%rcx")
+            return "%ecx", False
+
+        self.__emit_expression_stmt(lhs)
+        self.__push("%rax")
+        self.__emit_expression_stmt(rhs)
+        if commutative:
+            self.__pop("%rcx")
+            return "%ecx", True
+        self.emitter.instruction(Opcode.Mov, "%eax", "%ecx")
+        self.__pop("%rax")
+        return "%ecx", False
 
     def __emit_logic_operation(self, stmt_node: ast.LogicOperatorNode):
         if stmt_node.type == ast.LogicOperatorNode.Type.Or:
             self.__emit_expression_stmt(stmt_node.lhs_expr)
             label = self.__generate_label("_clause")
-            self.emitter.instruction("cmp", "$0", "%eax")
-            self.emitter.instruction("je", label)
-            self.emitter.instruction("mov", "$1", "%eax")
-            self.emitter.instruction("jmp", f"{label}_end")
+            self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+            self.emitter.instruction(Opcode.Je, label)
+            self.emitter.instruction(Opcode.Mov, "$1", "%eax")
+            self.emitter.instruction(Opcode.Jmp, f"{label}_end")
             self.emitter.label(label)
             self.__emit_expression_stmt(stmt_node.rhs_expr)
-            self.emitter.instruction("cmp", "$0", "%eax")
-            self.emitter.instruction("mov", "$0", "%eax")
-            self.emitter.instruction("setne", "%al")
+            self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+            self.emitter.instruction(Opcode.Mov, "$0", "%eax")
+            self.emitter.instruction(Opcode.Setne, "%al")
             self.emitter.label(f"{label}_end")
         elif stmt_node.type == ast.LogicOperatorNode.Type.And:
             self.__emit_expression_stmt(stmt_node.lhs_expr)
             label = self.__generate_label("_clause")
-            self.emitter.instruction("cmp", "$0", "%eax")
-            self.emitter.instruction("jne", label)
-            self.emitter.instruction("jmp", f"{label}_end")
+            self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+            self.emitter.instruction(Opcode.Jne, label)
+            self.emitter.instruction(Opcode.Jmp, f"{label}_end")
             self.emitter.label(label)
             self.__emit_expression_stmt(stmt_node.rhs_expr)
-            self.emitter.instruction("cmp", "$0", "%eax")
-            self.emitter.instruction("mov", "$0", "%eax")
-            self.emitter.instruction("setne", "%al")
+            self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+            self.emitter.instruction(Opcode.Mov, "$0", "%eax")
+            self.emitter.instruction(Opcode.Setne, "%al")
             self.emitter.label(f"{label}_end")
         else:
-            self.__emit_expression_stmt(stmt_node.lhs_expr)
-            self.emitter.push_stack("%rax")
-            self.__emit_expression_stmt(stmt_node.rhs_expr)
-            self.emitter.pop_stack("%rcx")
-            self.emitter.instruction("cmp", "%eax", "%ecx")
-            self.emitter.instruction("mov", "$0", "%eax")   # zero-out eax, keep flags
-            if stmt_node.type == ast.LogicOperatorNode.Type.Equals:
-                self.emitter.instruction("sete", "%al")
-            elif stmt_node.type == ast.LogicOperatorNode.Type.NotEquals:
-                self.emitter.instruction("setne", "%al")
-            elif stmt_node.type == ast.LogicOperatorNode.Type.LessThanOrEqual:
-                self.emitter.instruction("setle", "%al")
-            elif stmt_node.type == ast.LogicOperatorNode.Type.GreaterThanOrEqual:
-                self.emitter.instruction("setge", "%al")
-            elif stmt_node.type == ast.LogicOperatorNode.Type.LessThan:
-                self.emitter.instruction("setl", "%al")
-            elif stmt_node.type == ast.LogicOperatorNode.Type.GreaterThan:
-                self.emitter.instruction("setg", "%al")
+            # Comparisons can swap their operands by mirroring the condition
+            operand, swapped = self.__emit_operands(stmt_node, commutative=True)
+            self.emitter.instruction(Opcode.Cmp, operand, "%eax")
+            self.emitter.instruction(Opcode.Mov, "$0", "%eax")   # zero-out eax, keep flags
+            operator_type = stmt_node.type
+            if swapped:
+                operator_type = AsmGenerator.__mirrored_comparisons[operator_type]
+            if operator_type == ast.LogicOperatorNode.Type.Equals:
+                self.emitter.instruction(Opcode.Sete, "%al")
+            elif operator_type == ast.LogicOperatorNode.Type.NotEquals:
+                self.emitter.instruction(Opcode.Setne, "%al")
+            elif operator_type == ast.LogicOperatorNode.Type.LessThanOrEqual:
+                self.emitter.instruction(Opcode.Setle, "%al")
+            elif operator_type == ast.LogicOperatorNode.Type.GreaterThanOrEqual:
+                self.emitter.instruction(Opcode.Setge, "%al")
+            elif operator_type == ast.LogicOperatorNode.Type.LessThan:
+                self.emitter.instruction(Opcode.Setl, "%al")
+            elif operator_type == ast.LogicOperatorNode.Type.GreaterThan:
+                self.emitter.instruction(Opcode.Setg, "%al")
             else:
                 raise AsmGeneratorError(f"Invalid logic operator type {stmt_node.type}")
 
@@ -253,16 +419,54 @@ class AsmGenerator:
         post_conditional_lbl = self.__generate_label("post_conditional")
 
         self.__emit_expression_stmt(stmt_node.condition_expr)
-        self.emitter.instruction("cmp", "$0", "%eax")
-        self.emitter.instruction("je", else_label)
+        self.emitter.instruction(Opcode.Cmp, "$0", "%eax")
+        self.emitter.instruction(Opcode.Je, else_label)
         self.__emit_expression_stmt(stmt_node.true_expr)
-        self.emitter.instruction("jmp", post_conditional_lbl)
+        self.emitter.instruction(Opcode.Jmp, post_conditional_lbl)
         self.emitter.label(else_label)
         self.__emit_expression_stmt(stmt_node.false_expr)
         self.emitter.label(post_conditional_lbl)
 
     def __emit_function_call(self, stmt_node: ast.FunCallNode):
-        self.emitter.instruction("call", stmt_node.name)
+        arguments = stmt_node.arguments
+        register_count = min(len(arguments), len(AsmGenerator.__argument_registers))
+        stack_size = (len(arguments) - register_count) * 8
+
+        # Temporaries pushed while evaluating an expression may leave the stack
+        # misaligned, the ABI requires it to be 16-byte aligned at the call.
+        padding = (16 - (self.__stack_depth + stack_size) % 16) % 16
+        if padding:
+            self.emitter.instruction(Opcode.Sub, f"${padding}", "%rsp")
+            self.__stack_depth += padding
+
+        # Arguments passed on the stack are pushed from right to left
+        for argument in reversed(arguments[register_count:]):
+            self.__emit_expression_stmt(argument)
+            self.__push("%rax")
+
+        # Complex register arguments are evaluated before any of the registers
+        # gets loaded (they may contain calls), simple ones are loaded directly.
+        complex_arguments = [index for index in range(register_count)
+                             if not ExpressionLabeller.is_leaf(arguments[index])]
+        for index in reversed(complex_arguments):
+            self.__emit_expression_stmt(arguments[index])
+            self.__push("%rax")
+        for index in complex_arguments:
+            self.__pop(AsmGenerator.__argument_registers[index][0])
+        for index in range(register_count):
+            if index not in complex_arguments:
+                self.emitter.instruction(Opcode.Mov, self.__simple_operand(arguments[index]),
+                                         AsmGenerator.__argument_registers[index][1])
+
+        self.emitter.instruction(Opcode.Call, stmt_node.name)
+        if stack_size + padding:
+            self.emitter.instruction(Opcode.Add, f"${stack_size + padding}", "%rsp")
+            self.__stack_depth -= stack_size + padding
+
+    def __simple_operand(self, expr_node: ast.ExprNode) -> str:
+        if isinstance(expr_node, ast.ConstantNode):
+            return f"${expr_node.value}"
+        return self.__variable_operand(cast(ast.VarNode, expr_node).name)
 
     def __emit_expression_stmt(self, stmt_node: ast.ExprNode):
         if isinstance(stmt_node, ast.ConstantNode):
@@ -0,0 +1,113 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import struct
+from typing import BinaryIO
+
+from . import ast
+from .compiler import AsmGenerator
+from .x86_encoder import X86Encoder
+
+
+class ElfWriter:
+    """Writes a static x86-64 ELF executable consisting of a single code segment."""
+
+    base_address = 0x400000
+
+    __header_size = 64
+    __program_header_size = 56
+    __program_header_count = 2
+    __code_alignment = 16
+
+    __PT_LOAD = 1
+    __PT_GNU_STACK = 0x6474e551
+    __PF_X = 1
+    __PF_W = 2
+    __PF_R = 4
+
+    def __init__(self, output: BinaryIO):
+        self.__output = output
+
+    @staticmethod
+    def code_offset() -> int:
+        """Offset of the code from the beginning of the file (and of the segment)."""
+        headers = ElfWriter.__header_size \
+            + ElfWriter.__program_header_size * ElfWriter.__program_header_count
+        alignment = ElfWriter.__code_alignment
+        return (headers + alignment - 1) // alignment * alignment
+
+    def write(self, code: bytes, entry_offset: int):
+        code_offset = ElfWriter.code_offset()
+        file_size = code_offset + len(code)
+
+        header = struct.pack('<4sBBBBB7xHHIQQQIHHHHHH',
+                             b'\x7fELF',
+                             2,  # ELFCLASS64
+                             1,  # ELFDATA2LSB
+                             1,  # EV_CURRENT
+                             0,  # ELFOSABI_SYSV
+                             0,  # ABI version
+                             2,  # ET_EXEC
+                             0x3E,  # EM_X86_64
+                             1,  # EV_CURRENT
+                             ElfWriter.base_address + code_offset + entry_offset,
+                             ElfWriter.__header_size,  # program headers offset
+                             0,  # no section headers
+                             0,  # flags
+                             ElfWriter.__header_size,
+                             ElfWriter.__program_header_size,
+                             ElfWriter.__program_header_count,
+                             64,  # section header entry size
+                             0,  # section header count
+                             0)  # section names index
+        text_segment = struct.pack('<IIQQQQQQ',
+                                   ElfWriter.__PT_LOAD,
+                                   ElfWriter.__PF_R | ElfWriter.__PF_X,
+                                   0,  # offset
+                                   ElfWriter.base_address,
+                                   ElfWriter.base_address,
+                                   file_size,
+                                   file_size,
+                                   0x1000)
+        # Explicitly ask for a non-executable stack
+        stack_segment = struct.pack('<IIQQQQQQ',
+                                    ElfWriter.__PT_GNU_STACK,
+                                    ElfWriter.__PF_R | ElfWriter.__PF_W,
+                                    0, 0, 0, 0, 0, 16)
+
+        headers = header + text_segment + stack_segment
+        self.__output.write(headers)
+        self.__output.write(b'\x00' * (code_offset - len(headers)))
+        self.__output.write(code)
+
+
+class ElfGenerator:
+    """Generates a static executable directly, without an external assembler or linker.
+
+    Since the executable is not linked with the C runtime, the code is
+    generated in the freestanding mode, with its own _start entry point.
+    """
+
+    def __init__(self, output: BinaryIO):
+        self.__output = output
+
+    def generate(self, program_node: ast.ProgramNode):
+        generator = AsmGenerator(None, freestanding=True)
+        generator.generate(program_node)
+
+        code, labels = X86Encoder().encode(generator.emitter.instructions)
+        ElfWriter(self.__output).write(code, labels["_start"])
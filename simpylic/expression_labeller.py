@@ -0,0 +1,67 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Dict
+
+from . import ast
+
+
+class ExpressionLabeller:
+    """Computes Sethi-Ullman labels of expression trees.
+
+    The label of a node is the number of values that need to be held at once
+    (in %eax or saved on the stack) to evaluate the node, provided that the
+    operand with the higher label is always evaluated first. Constants and
+    variables can be used directly as an instruction operand, so they do not
+    add to the label of their parent.
+    """
+
+    def __init__(self):
+        self.__labels: Dict[ast.Node, int] = {}
+
+    def label(self, node: ast.Node) -> Dict[ast.Node, int]:
+        self.__labels = {}
+        self.__visit(node)
+        return self.__labels
+
+    @staticmethod
+    def is_leaf(node: ast.Node) -> bool:
+        return isinstance(node, (ast.ConstantNode, ast.VarNode))
+
+    def __visit(self, node: ast.Node) -> int:
+        children = [self.__visit(child) for child in node.children]
+
+        if isinstance(node, (ast.BinaryOperatorNode, ast.LogicOperatorNode)) \
+                and node.type not in (ast.BinaryOperatorNode.Type.Assignment,
+                                      ast.LogicOperatorNode.Type.And,
+                                      ast.LogicOperatorNode.Type.Or):
+            lhs, rhs = node.lhs_expr, node.rhs_expr
+            lhs_label, rhs_label = self.__labels[lhs], self.__labels[rhs]
+            if ExpressionLabeller.is_leaf(lhs) or ExpressionLabeller.is_leaf(rhs):
+                label = max(lhs_label, rhs_label)
+            elif lhs_label == rhs_label:
+                label = lhs_label + 1
+            else:
+                label = max(lhs_label, rhs_label)
+        elif isinstance(node, ast.FunCallNode):
+            # Every evaluated argument is kept on the stack until the call
+            label = max([1] + [child + index for index, child in enumerate(children)])
+        else:
+            label = max([1] + children)
+
+        self.__labels[node] = label
+        return label
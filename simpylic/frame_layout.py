@@ -0,0 +1,183 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import heapq
+from typing import Dict, List, Tuple
+
+from . import ast
+
+
+class FrameLayout:
+    """Assignment of function-local variables to fixed stack frame slots.
+
+    Slots are 4 bytes wide (all Simpylic values are 32-bit integers) and are
+    addressed relative to the frame base, slot 0 being right below it.
+    """
+
+    slot_size = 4
+    alignment = 16
+
+    def __init__(self, slots: Dict[str, int], is_leaf: bool = True):
+        self.__slots = slots
+        self.__slot_count = max(slots.values()) + 1 if slots else 0
+        self.__is_leaf = is_leaf
+
+    def __repr__(self):
+        return f"FrameLayout(slots={self.__slots}, size={self.size}, is_leaf={self.__is_leaf})"
+
+    @property
+    def variables(self) -> List[str]:
+        return list(self.__slots)
+
+    @property
+    def is_leaf(self) -> bool:
+        """Whether the function does not call any other function."""
+        return self.__is_leaf
+
+    @property
+    def slot_count(self) -> int:
+        return self.__slot_count
+
+    @property
+    def size(self) -> int:
+        size = self.__slot_count * FrameLayout.slot_size
+        return (size + FrameLayout.alignment - 1) // FrameLayout.alignment * FrameLayout.alignment
+
+    def has_variable(self, name: str) -> bool:
+        return name in self.__slots
+
+    def slot(self, name: str) -> int:
+        return self.__slots[name]
+
+    def offset(self, name: str) -> int:
+        return -(self.__slots[name] + 1) * FrameLayout.slot_size
+
+
+class FrameAllocator:
+    """Computes a FrameLayout for a single function.
+
+    Every statement is assigned two program points: reads happen on the first
+    one and the statement's own store happens on the second one, so that a
+    variable read for the last time can hand its slot over to the variable
+    being assigned by the same statement. Variables referenced inside a loop
+    are kept alive for the whole loop, because their value may travel around
+    the back edge. Variables whose live ranges do not overlap share a slot.
+    """
+
+    def __init__(self):
+        self.__point = 0
+        self.__intervals: Dict[str, List[int]] = {}
+        self.__loops: List[Tuple[int, int]] = []
+        self.__is_leaf = True
+
+    def allocate(self, function_node: ast.FunDefNode) -> FrameLayout:
+        self.__point = 0
+        self.__intervals = {}
+        self.__loops = []
+        self.__is_leaf = True
+
+        for argument in function_node.arguments:
+            self.__reference(argument, self.__point)
+        self.__point += 1
+
+        self.__visit_block(function_node.body)
+        self.__extend_over_loops()
+        return FrameLayout(self.__assign_slots(), self.__is_leaf)
+
+    def __reference(self, name: str, point: int):
+        interval = self.__intervals.get(name)
+        if interval is None:
+            self.__intervals[name] = [point, point]
+        else:
+            interval[0] = min(interval[0], point)
+            interval[1] = max(interval[1], point)
+
+    def __extend_over_loops(self):
+        for loop_start, loop_end in self.__loops:
+            for interval in self.__intervals.values():
+                if interval[0] <= loop_end and interval[1] >= loop_start:
+                    interval[0] = min(interval[0], loop_start)
+                    interval[1] = max(interval[1], loop_end)
+
+    def __assign_slots(self) -> Dict[str, int]:
+        slots: Dict[str, int] = {}
+        free_slots: List[int] = []
+        active: List[Tuple[int, int]] = []  # heap of (end, slot)
+        slot_count = 0
+
+        intervals = sorted(self.__intervals.items(), key=lambda item: item[1][0])
+        for name, (start, end) in intervals:
+            while active and active[0][0] < start:
+                heapq.heappush(free_slots, heapq.heappop(active)[1])
+            if free_slots:
+                slot = heapq.heappop(free_slots)
+            else:
+                slot = slot_count
+                slot_count += 1
+            slots[name] = slot
+            heapq.heappush(active, (end, slot))
+
+        return slots
+
+    def __visit_block(self, block_node: ast.BlockNode):
+        for stmt in block_node.statements:
+            self.__visit_statement(stmt)
+
+    def __visit_statement(self, stmt_node: ast.StmtNode):
+        if isinstance(stmt_node, ast.VarDeclNode):
+            self.__visit_expression(stmt_node.init_expr)
+            self.__reference(stmt_node.name, self.__point + 1)
+        elif isinstance(stmt_node, ast.BinaryOperatorNode) \
+                and stmt_node.type == ast.BinaryOperatorNode.Type.Assignment:
+            self.__visit_expression(stmt_node.rhs_expr)
+            self.__reference(stmt_node.lhs_expr.name, self.__point + 1)
+        elif isinstance(stmt_node, ast.ReturnStmtNode):
+            self.__visit_expression(stmt_node.expr)
+        elif isinstance(stmt_node, ast.ConditionNode):
+            for node in [stmt_node.if_statement] + stmt_node.elif_statements:
+                self.__visit_expression(node.condition_expr)
+                self.__point += 2
+                self.__visit_block(node.true_block)
+            if stmt_node.else_statement:
+                self.__visit_block(stmt_node.else_statement.false_block)
+            return
+        elif isinstance(stmt_node, ast.WhileStmtNode):
+            loop_start = self.__point
+            self.__visit_expression(stmt_node.condition_expr)
+            self.__point += 2
+            self.__visit_block(stmt_node.body)
+            self.__loops.append((loop_start, self.__point))
+            self.__point += 1
+            return
+        else:
+            self.__visit_expression(stmt_node)
+
+        self.__point += 2
+
+    def __visit_expression(self, expr_node: ast.Node):
+        # Stores nested inside of an expression happen on the same point as
+        # the reads, so that they never share a slot with anything read there.
+        if isinstance(expr_node, ast.VarNode):
+            self.__reference(expr_node.name, self.__point)
+        elif isinstance(expr_node, ast.VarDeclNode):
+            self.__visit_expression(expr_node.init_expr)
+            self.__reference(expr_node.name, self.__point)
+        else:
+            if isinstance(expr_node, ast.FunCallNode):
+                self.__is_leaf = False
+            for child in expr_node.children:
+                self.__visit_expression(child)
@@ -0,0 +1,214 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import contextlib
+import hashlib
+import os
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None  # type: ignore
+from typing import IO, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from . import ast
+from .compiler import AsmGenerator
+
+
+class FunctionCache:
+    """Persistent cache of generated code of single functions.
+
+    The entries are keyed by a hash of the function's canonical AST, the
+    version of the code generator and its options, so any change of the
+    function (or the compiler) misses the cache. The cache directory is kept
+    under a size limit by evicting the least recently used entries; the
+    modification time of an entry is bumped on every hit. The total size of
+    the entries is recorded in a file, so the directory is only walked once
+    it is over the limit. As processes may share the cache, an entry is
+    stored and its size recorded while the file is locked, so the recorded
+    size always matches the entries in the directory.
+    """
+
+    # Bump whenever the generated code changes
+    version = 3
+
+    def __init__(self, directory: str, max_size: int = 64 * 1024 * 1024):
+        self.__directory = directory
+        self.__max_size = max_size
+        # Whether entries were stored since the last trim
+        self.__stored = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def report(self) -> str:
+        return f"function cache: {self.hits} hits, {self.misses} misses, " \
+               f"{self.evictions} evictions"
+
+    @staticmethod
+    def key(function_node: ast.FunDefNode, options: Iterable[str] = ()) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{FunctionCache.version}:{','.join(options)}\n".encode('utf-8'))
+        for line in FunctionCache.__canonical(function_node, 0):
+            digest.update(line.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def __canonical(node: ast.Node, depth: int):
+        """Lines describing the node and its subtree, including the markers telling
+        the children of a node apart."""
+        markers = sorted(name for name in vars(node) if '__' not in name)
+        yield f"{depth} {node!r} {markers}\n"
+        for child in node.children:
+            yield from FunctionCache.__canonical(child, depth + 1)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__directory, key[:2], key)
+
+    def __size_path(self) -> str:
+        # Entries are in subdirectories, so the name never clashes with them
+        return os.path.join(self.__directory, 'size')
+
+    def load(self, key: str) -> Optional[str]:
+        path = self.__path(key)
+        try:
+            with open(path, encoding='utf-8') as infile:
+                code = infile.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return code
+
+    def store(self, key: str, code: str):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.__size_file() as size_file:
+            size = FunctionCache.__read_size(size_file)
+            is_new = not os.path.exists(path)
+            FunctionCache.__write(path, code)
+            if size is None:
+                size = sum(entry[1] for entry in self.__entries())
+            elif is_new:
+                size += len(code.encode('utf-8'))
+            FunctionCache.__write_size(size_file, size)
+        self.__stored = True
+
+    @staticmethod
+    def __write(path: str, text: str):
+        # Write to a temporary file first, so concurrent runs never see partial data
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as outfile:
+            outfile.write(text)
+        os.replace(temporary, path)
+
+    def trim(self):
+        """Evicts the least recently used entries if the cache exceeds its size limit."""
+        if not self.__stored:
+            return
+        self.__stored = False
+        with self.__size_file() as size_file:
+            size = FunctionCache.__read_size(size_file)
+            if size is None or size > self.__max_size:
+                FunctionCache.__write_size(size_file, self.__evict())
+
+    @contextlib.contextmanager
+    def __size_file(self) -> Iterator[IO[str]]:
+        """Opens the file recording the size, locked for this process."""
+        os.makedirs(self.__directory, exist_ok=True)
+        with open(self.__size_path(), 'a+', encoding='utf-8') as size_file:
+            if fcntl:
+                fcntl.flock(size_file, fcntl.LOCK_EX)
+            yield size_file
+
+    @staticmethod
+    def __read_size(size_file: IO[str]) -> Optional[int]:
+        size_file.seek(0)
+        try:
+            return int(size_file.read())
+        except ValueError:
+            return None
+
+    @staticmethod
+    def __write_size(size_file: IO[str], size: int):
+        size_file.seek(0)
+        size_file.truncate()
+        size_file.write(str(size))
+
+    def __entries(self) -> List[Tuple[float, int, str]]:
+        """The modification times, sizes and paths of the entries."""
+        entries: List[Tuple[float, int, str]] = []
+        for directory, _, files in os.walk(self.__directory):
+            if directory == self.__directory:
+                continue
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def __evict(self) -> int:
+        """Evicts the least recently used entries until the cache fits its size limit,
+        returns the size of the remaining entries."""
+        entries = self.__entries()
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.__max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        return size
+
+
+class CachingAsmGenerator:
+    """Generates assembly like AsmGenerator, reusing cached code of unchanged functions.
+
+    Labels are unique per function, so the code of each function is
+    independent of the others and the cached and the freshly generated
+    pieces are stitched together in the order of the program's functions.
+    """
+
+    def __init__(self, output: TextIO, cache: FunctionCache, freestanding: bool = False):
+        self.__output = output
+        self.__cache = cache
+        self.__freestanding = freestanding
+
+    def generate(self, program_node: ast.ProgramNode):
+        header = AsmGenerator(None, self.__freestanding)
+        header.emit_header_asm()
+        self.__output.write(header.emitter.render())
+
+        for function_node in program_node.functions:
+            self.generate_function(function_node)
+        self.__cache.trim()
+
+    def generate_function(self, function_node: ast.FunDefNode):
+        key = FunctionCache.key(function_node, ["asm"])
+        code = self.__cache.load(key)
+        if code is None:
+            generator = AsmGenerator(None)
+            generator.emit_function_asm(function_node)
+            code = generator.emitter.render()
+            self.__cache.store(key, code)
+        self.__output.write(code)
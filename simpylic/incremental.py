@@ -0,0 +1,364 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import copy
+import re
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+
+from . import ast
+from .ast_preprocessor import StreamingPreprocessor
+from .compiler import AsmGenerator
+from .function_cache import FunctionCache
+from .parser import Parser, ParserError
+from .tokenizer import Tokenizer, TokenizerError, Token, TokenType
+
+
+class Chunk:
+    """Lines of one top-level statement (rarely more), and what was parsed from them."""
+
+    __slots__ = ('line_count', 'statements', 'names', 'variables', 'functions', 'error')
+
+    def __init__(self, line_count: int):
+        self.line_count = line_count
+        self.statements: List[ast.StmtNode] = []
+        # Identifiers in the lines, the chunk depends on the definitions of these only
+        self.names: Set[str] = set()
+        # Names defined by the statements, which are known to the following chunks
+        self.variables: Set[str] = set()
+        self.functions: Set[str] = set()
+        self.error: Optional[Exception] = None
+
+    def defined_names(self) -> Set[str]:
+        return self.variables | self.functions
+
+
+class IncrementalFrontEnd:
+    """Keeps the tokens and the AST of a source up to date as the source is edited.
+
+    The tokens are cached per line, and only the edited lines are tokenized
+    again. The lines are grouped into chunks, each starting with a line at
+    the top level (other than elif or else), and holding the indented lines
+    that follow. Only the chunks touching the edited lines are parsed again,
+    their statements are spliced into the body of main in the program.
+    The parser tells declarations of variables from assignments by the names
+    defined before, so if the edit changed the names the chunks define, the
+    following chunks using these names are parsed again as well.
+
+    The program is the parser's output, AstPreprocessor changes it in place,
+    so it must be run on a copy of the program.
+    """
+
+    __continuation = re.compile(r"[ \t\n]|(elif|else)\b|$")
+
+    def __init__(self, source: str = ''):
+        self.__lines: List[str] = []
+        self.__line_tokens: List[List[Token]] = []
+        self.__line_errors: List[Optional[TokenizerError]] = []
+        self.__chunks: List[Chunk] = []
+        self.__chunk_starts: List[int] = []
+
+        self.__program = ast.ProgramNode()
+        self.__main = ast.FunDefNode("main", arguments=[])
+        self.__main.body = ast.ScopeNode()
+        self.__program.add_function(self.__main)
+
+        self.edit(0, 0, source)
+
+    @property
+    def program(self) -> ast.ProgramNode:
+        return self.__program
+
+    @property
+    def errors(self) -> List[Exception]:
+        """Errors of tokenizing or parsing the chunks, the statements of these chunks are
+        missing in the program."""
+        return [chunk.error for chunk in self.__chunks if chunk.error]
+
+    @property
+    def line_count(self) -> int:
+        return len(self.__lines)
+
+    def source(self) -> str:
+        return ''.join(self.__lines)
+
+    def tokens(self) -> List[Token]:
+        """All the tokens, as the tokenizer returns them for the whole source."""
+        return self.__chunk_tokens(0, len(self.__lines))
+
+    def update(self, source: str):
+        """Replaces the source, only the lines which differ are processed again."""
+        lines = source.splitlines(keepends=True)
+        old_lines = self.__lines
+        start = 0
+        limit = min(len(lines), len(old_lines))
+        while start < limit and lines[start] == old_lines[start]:
+            start += 1
+        end = 0
+        while end < limit - start and lines[-1 - end] == old_lines[-1 - end]:
+            end += 1
+        self.edit(start, len(old_lines) - end, ''.join(lines[start:len(lines) - end]))
+
+    def edit(self, start: int, end: int, text: str):
+        """Replaces the lines from start up to end (exclusive, numbered from 0) with the
+        lines of the text."""
+        lines = text.splitlines(keepends=True)
+        # A source not ending with a newline, followed by another line
+        if lines and not lines[-1].endswith('\n') and end < len(self.__lines):
+            raise ValueError("Only whole lines can be replaced")
+        if start > 0 and not self.__lines[start - 1].endswith('\n'):
+            raise ValueError("Only whole lines can be replaced")
+
+        # First chunk affected: the chunk of the line before the edit, as the edit can
+        # turn the first edited line into a continuation of it
+        first = max(bisect.bisect_right(self.__chunk_starts, max(start - 1, 0)) - 1, 0)
+        # First chunk not affected: the chunk starting at or after the end of the edit
+        last = bisect.bisect_left(self.__chunk_starts, end)
+        if self.__chunks:
+            last = max(last, first + 1)
+
+        self.__lines[start:end] = lines
+        tokens: List[List[Token]] = []
+        errors: List[Optional[TokenizerError]] = []
+        for line in lines:
+            try:
+                tokens.append(Tokenizer(line.encode('utf-8')).tokenize())
+                errors.append(None)
+            except TokenizerError as error:
+                tokens.append([])
+                errors.append(error)
+        self.__line_tokens[start:end] = tokens
+        self.__line_errors[start:end] = errors
+
+        shift = len(lines) - (end - start)
+        first_line = self.__chunk_starts[first] if first < len(self.__chunks) else 0
+        end_line = self.__chunk_starts[last] + shift if last < len(self.__chunks) \
+            else len(self.__lines)
+        self.__reparse(first, last, first_line, end_line, shift)
+
+    def __reparse(self, first: int, last: int, first_line: int, end_line: int, shift: int):
+        """Replaces the chunks from first up to last with chunks of the lines from
+        first_line up to end_line."""
+        variables: Set[str] = set()
+        functions: Set[str] = set()
+        for chunk in self.__chunks[:first]:
+            variables |= chunk.variables
+            functions |= chunk.functions
+        old_names: Set[str] = set()
+        for chunk in self.__chunks[first:last]:
+            old_names |= chunk.defined_names()
+        new_names: Set[str] = set()
+
+        starts = [line for line in range(first_line, end_line) if self.__is_chunk_start(line)]
+        if not starts or starts[0] != first_line:
+            starts.insert(0, first_line)
+        chunks = []
+        for index, chunk_start in enumerate(starts):
+            chunk_end = starts[index + 1] if index + 1 < len(starts) else end_line
+            if chunk_end > chunk_start:
+                chunks.append(self.__parse_chunk(chunk_start, chunk_end, variables, functions))
+                new_names |= chunks[-1].defined_names()
+
+        self.__splice(first, last, chunks)
+        self.__chunk_starts[first:last] = starts[:len(chunks)]
+        for index in range(first + len(chunks), len(self.__chunk_starts)):
+            self.__chunk_starts[index] += shift
+
+        # Names defined by the old chunks and not the new ones, or the other way round
+        changed = old_names ^ new_names
+        for index in range(first + len(chunks), len(self.__chunks) if changed else 0):
+            chunk = self.__chunks[index]
+            if changed.isdisjoint(chunk.names):
+                variables |= chunk.variables
+                functions |= chunk.functions
+                continue
+            start = self.__chunk_starts[index]
+            new_chunk = self.__parse_chunk(start, start + chunk.line_count, variables, functions)
+            changed |= chunk.defined_names() ^ new_chunk.defined_names()
+            self.__splice(index, index + 1, [new_chunk])
+
+    def __is_chunk_start(self, line: int) -> bool:
+        return line == 0 or not IncrementalFrontEnd.__continuation.match(self.__lines[line])
+
+    def __chunk_tokens(self, start: int, end: int) -> List[Token]:
+        return [Token(token.text, token.type, line + 1, token.pos)
+                for line in range(start, end) for token in self.__line_tokens[line]]
+
+    def __parse_chunk(self, start: int, end: int, variables: Set[str],
+                      functions: Set[str]) -> Chunk:
+        chunk = Chunk(end - start)
+        tokens = self.__chunk_tokens(start, end)
+        chunk.names = {token.text for token in tokens if token.type == TokenType.Identifier}
+        for error in self.__line_errors[start:end]:
+            if error:
+                chunk.error = TokenizerError(error.what, error.line + start, error.pos)
+                return chunk
+        parser = Parser(variables, functions)
+        try:
+            chunk.statements = list(parser.parse_statements(tokens))
+        except (ParserError, AssertionError, IndexError) as error:
+            chunk.error = error if isinstance(error, ParserError) else \
+                ParserError(f"Invalid syntax on lines {start + 1} to {end}")
+            chunk.statements = []
+            return chunk
+        chunk.variables = parser.variables
+        chunk.functions = parser.functions
+        variables |= chunk.variables
+        functions |= chunk.functions
+        return chunk
+
+    def __splice(self, first: int, last: int, chunks: List[Chunk]):
+        """Puts the statements of the chunks in place of those of the chunks from first up
+        to last in the body of main."""
+        body = self.__main.body
+        index = sum(len(chunk.statements) for chunk in self.__chunks[:first])
+        for chunk in self.__chunks[first:last]:
+            for statement in chunk.statements:
+                body.remove_child(statement)
+        for chunk in chunks:
+            for statement in chunk.statements:
+                body.insert_statement(index, statement)
+                index += 1
+        self.__chunks[first:last] = chunks
+
+
+class CompiledStatement:
+    """What a top-level statement compiles into."""
+
+    __slots__ = ('statement', 'used', 'renames', 'functions', 'main_statements')
+
+    def __init__(self, statement: ast.StmtNode):
+        # The statement of the front end's program, kept to tell reused ids apart
+        self.statement = statement
+        # New names of the functions called by the statement, when it was compiled
+        self.used: Dict[str, Optional[str]] = {}
+        # New names of the top-level functions defined by the statement
+        self.renames: Dict[str, str] = {}
+        # Keys and code of the functions hoisted out of the statement
+        self.functions: List[Tuple[str, str]] = []
+        # Preprocessed statements of main
+        self.main_statements: List[ast.StmtNode] = []
+
+
+class IncrementalCompiler:
+    """Compiles versions of a source into assembly, keeping the results in memory.
+
+    The source goes through an IncrementalFrontEnd, and the top-level
+    statements it did not parse again are neither preprocessed nor compiled
+    again: the code of the functions hoisted out of each statement and its
+    preprocessed statements of main are kept per statement. The code of the
+    functions is also kept by its FunctionCache key, so that the functions
+    parsed again but unchanged (and main, when only definitions changed)
+    are not generated again. As in compile_streaming, calls are not folded.
+    """
+
+    def __init__(self, freestanding: bool = False,
+                 function_cache: Optional[FunctionCache] = None):
+        self.__front_end = IncrementalFrontEnd()
+        self.__function_cache = function_cache
+        header = AsmGenerator(None, freestanding)
+        header.emit_header_asm()
+        self.__header = header.emitter.render()
+        self.__statements: Dict[int, CompiledStatement] = {}
+        self.__codes: Dict[str, str] = {}
+        # Statistics of the last compilation
+        self.functions = 0
+        self.generated = 0
+
+    @property
+    def front_end(self) -> IncrementalFrontEnd:
+        return self.__front_end
+
+    @property
+    def errors(self) -> List[Exception]:
+        return self.__front_end.errors
+
+    def compile(self, source: str, outfile: TextIO) -> bool:
+        """Compiles the new version of the source into the file.
+
+        Returns False without writing anything if the source has errors.
+        """
+        self.__front_end.update(source)
+        if self.__front_end.errors:
+            return False
+
+        self.functions = 0
+        self.generated = 0
+        renames: Dict[str, str] = {}
+        codes: Dict[str, str] = {}
+        statements: Dict[int, CompiledStatement] = {}
+        main = ast.FunDefNode("main", arguments=[])
+        main.body = ast.ScopeNode()
+
+        outfile.write(self.__header)
+        program_main = next(iter(self.__front_end.program.functions))
+        for statement in program_main.body.statements:
+            compiled = self.__statements.get(id(statement))
+            if not compiled or compiled.statement is not statement or \
+                    any(renames.get(name) != new_name for name, new_name in compiled.used.items()):
+                compiled = self.__compile_statement(statement, renames, codes)
+            statements[id(statement)] = compiled
+            renames.update(compiled.renames)
+            for key, code in compiled.functions:
+                codes[key] = code
+                outfile.write(code)
+            self.functions += len(compiled.functions)
+            for main_statement in compiled.main_statements:
+                main.body.add_statement(main_statement)
+        outfile.write(self.__function_code(main, codes)[1])
+        self.functions += 1
+
+        self.__statements = statements
+        self.__codes = codes
+        if self.__function_cache:
+            self.__function_cache.trim()
+        return True
+
+    def __compile_statement(self, statement: ast.StmtNode, renames: Dict[str, str],
+                            codes: Dict[str, str]) -> CompiledStatement:
+        compiled = CompiledStatement(statement)
+
+        def find_calls(node: ast.Node):
+            if isinstance(node, ast.FunCallNode):
+                compiled.used[node.name] = renames.get(node.name)
+        statement.visit(find_calls)
+
+        # The preprocessor changes the statement, the front end's one must stay intact
+        statement_copy = copy.deepcopy(statement, {id(statement.parent): None})
+        preprocessor = StreamingPreprocessor(renames)
+        for function_node in preprocessor.process(statement_copy):
+            compiled.functions.append(self.__function_code(function_node, codes))
+        compiled.renames = {name: new_name for name, new_name in preprocessor.renames.items()
+                            if renames.get(name) != new_name}
+        compiled.main_statements = list(preprocessor.main.body.statements)
+        return compiled
+
+    def __function_code(self, function_node: ast.FunDefNode,
+                        codes: Dict[str, str]) -> Tuple[str, str]:
+        key = FunctionCache.key(function_node, ["asm"])
+        code = codes.get(key) or self.__codes.get(key)
+        if code is None and self.__function_cache:
+            code = self.__function_cache.load(key)
+        if code is None:
+            generator = AsmGenerator(None)
+            generator.emit_function_asm(function_node)
+            code = generator.emitter.render()
+            self.generated += 1
+            if self.__function_cache:
+                self.__function_cache.store(key, code)
+        codes[key] = code
+        return key, code
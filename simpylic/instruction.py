@@ -0,0 +1,75 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from enum import Enum
+from typing import Tuple
+
+
+class Opcode(Enum):
+    # Pseudo-instructions
+    Label = ':'
+    Global = '.global'
+
+    Push = 'push'
+    Pop = 'pop'
+    Mov = 'mov'
+    Movzb = 'movzb'
+    Add = 'add'
+    Sub = 'sub'
+    Imul = 'imul'
+    Idiv = 'idiv'
+    Cdq = 'cdq'
+    Neg = 'neg'
+    Not = 'not'
+    Cmp = 'cmp'
+    Sete = 'sete'
+    Setne = 'setne'
+    Setl = 'setl'
+    Setle = 'setle'
+    Setg = 'setg'
+    Setge = 'setge'
+    Jmp = 'jmp'
+    Je = 'je'
+    Jne = 'jne'
+    Call = 'call'
+    Ret = 'ret'
+    Syscall = 'syscall'
+
+
+class Instruction:
+    """A single instruction with its operands in the AT&T syntax.
+
+    Operands are kept as the strings which end up in the assembly, e.g.
+    "%eax", "$42", "-4(%rbp)" or a label name.
+    """
+
+    __slots__ = ('opcode', 'operands')
+
+    def __init__(self, opcode: Opcode, *operands: str):
+        self.opcode = opcode
+        self.operands: Tuple[str, ...] = operands
+
+    def __repr__(self):
+        return f"Instruction(opcode={self.opcode}, operands={self.operands})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Instruction):
+            return NotImplemented
+        return self.opcode == other.opcode and self.operands == other.operands
+
+    def __hash__(self):
+        return hash((self.opcode, self.operands))
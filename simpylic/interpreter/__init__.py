@@ -0,0 +1,28 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# flake8: noqa
+from .common import InterpreterError, StepLimitError, wrap_int32, divide_int32
+from .treewalker import TreeWalker
+from .code import Op, CodeObject
+from .bytecode import BytecodeCompiler
+from .optimizer import BytecodeOptimizer
+from .memo import LruCache, Memoizer
+from .vm import VirtualMachine
+from .closures import ClosureProgram
+from .batch import BatchEvaluator
+from .transpiler import PythonTranspiler, PythonProgram, PythonCodeCache
@@ -0,0 +1,207 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Dict
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .. import ast
+from .common import InterpreterError, wrap_int32
+
+
+class _Frame:
+    """State of a function invocation over a batch of lanes."""
+
+    __slots__ = ('variables', 'result', 'returned')
+
+    def __init__(self, lanes: int):
+        self.variables: Dict[str, 'np.ndarray'] = {}
+        self.result = np.zeros(lanes, dtype=np.int32)
+        self.returned = np.zeros(lanes, dtype=bool)
+
+
+class BatchEvaluator:
+    """Evaluates a function for a whole batch of argument tuples at once.
+
+    Every variable holds a NumPy int32 array with one lane per argument
+    tuple, so each AST node is evaluated once for the whole batch. Control
+    flow is executed under a mask of active lanes: both branches of
+    conditions run with the lanes that take them, and loops run until no
+    lane is active anymore. Lanes leave the mask when they return. Calls
+    are made with the active lanes only, which keeps recursion finite.
+    """
+
+    __comparisons = {
+        ast.LogicOperatorNode.Type.LessThan: lambda lhs, rhs: lhs < rhs,
+        ast.LogicOperatorNode.Type.LessThanOrEqual: lambda lhs, rhs: lhs <= rhs,
+        ast.LogicOperatorNode.Type.Equals: lambda lhs, rhs: lhs == rhs,
+        ast.LogicOperatorNode.Type.NotEquals: lambda lhs, rhs: lhs != rhs,
+        ast.LogicOperatorNode.Type.GreaterThanOrEqual: lambda lhs, rhs: lhs >= rhs,
+        ast.LogicOperatorNode.Type.GreaterThan: lambda lhs, rhs: lhs > rhs,
+    }
+
+    def __init__(self, program_node: ast.ProgramNode):
+        if np is None:
+            raise InterpreterError("Batch evaluation requires NumPy")
+        self.__functions: Dict[str, ast.FunDefNode] = {func.name: func
+                                                       for func in program_node.functions}
+
+    def evaluate(self, name: str, arguments: 'np.ndarray') -> 'np.ndarray':
+        """Calls the function for every row of the two-dimensional arguments array.
+
+        Functions defined at the top level of the program can also be referred
+        to by their name in the source code. Returns an int32 array with the
+        result for each row.
+        """
+        if name not in self.__functions and f"_main_{name}" in self.__functions:
+            name = f"_main_{name}"
+        if name not in self.__functions:
+            raise InterpreterError(f"Unknown function {name}")
+
+        function_node = self.__functions[name]
+        arguments = np.asarray(arguments)
+        if arguments.ndim == 1 and len(function_node.arguments) == 1:
+            arguments = arguments.reshape(-1, 1)
+        if arguments.ndim != 2 or arguments.shape[1] != len(function_node.arguments):
+            raise InterpreterError(f"Function {name} takes {len(function_node.arguments)} "
+                                   f"arguments, got an array of shape {arguments.shape}")
+
+        columns = [arguments[:, index].astype(np.int32) for index in range(arguments.shape[1])]
+        # int32 overflow wraps around, like in the compiled code
+        with np.errstate(over='ignore'):
+            return self.__call(function_node, columns, len(arguments))
+
+    def __call(self, function_node: ast.FunDefNode, arguments, lanes: int) -> 'np.ndarray':
+        frame = _Frame(lanes)
+        frame.variables.update(zip(function_node.arguments, arguments))
+        self.__execute_block(function_node.body, frame, np.ones(lanes, dtype=bool))
+        return frame.result
+
+    def __execute_block(self, block_node: ast.BlockNode, frame: _Frame, mask: 'np.ndarray'):
+        for stmt in block_node.statements:
+            mask = mask & ~frame.returned
+            if not mask.any():
+                return
+            self.__execute_statement(stmt, frame, mask)
+
+    def __execute_statement(self, stmt_node: ast.StmtNode, frame: _Frame, mask: 'np.ndarray'):
+        if isinstance(stmt_node, ast.ReturnStmtNode):
+            value = self.__evaluate(stmt_node.expr, frame, mask)
+            frame.result = np.where(mask, value, frame.result).astype(np.int32)
+            frame.returned = frame.returned | mask
+        elif isinstance(stmt_node, ast.ConditionNode):
+            remaining = mask
+            for node in [stmt_node.if_statement] + stmt_node.elif_statements:
+                condition = self.__evaluate(node.condition_expr, frame, remaining) != 0
+                self.__execute_block(node.true_block, frame, remaining & condition)
+                remaining = remaining & ~condition
+                if not remaining.any():
+                    return
+            if stmt_node.else_statement:
+                self.__execute_block(stmt_node.else_statement.false_block, frame, remaining)
+        elif isinstance(stmt_node, ast.WhileStmtNode):
+            active = mask & (self.__evaluate(stmt_node.condition_expr, frame, mask) != 0)
+            while active.any():
+                self.__execute_block(stmt_node.body, frame, active)
+                active = active & ~frame.returned
+                active = active & (self.__evaluate(stmt_node.condition_expr, frame, active) != 0)
+        else:
+            self.__evaluate(stmt_node, frame, mask)
+
+    def __store(self, name: str, value, frame: _Frame, mask: 'np.ndarray') -> 'np.ndarray':
+        old = frame.variables.get(name, np.int32(0))
+        frame.variables[name] = np.where(mask, value, old).astype(np.int32)
+        return frame.variables[name]
+
+    def __evaluate(self, expr_node: ast.Node, frame: _Frame, mask: 'np.ndarray'):
+        """Evaluates the expression in the lanes of the mask.
+
+        The values of the other lanes are unspecified.
+        """
+        if isinstance(expr_node, ast.ConstantNode):
+            return np.int32(wrap_int32(expr_node.value))
+        if isinstance(expr_node, ast.VarNode):
+            return frame.variables.get(expr_node.name, np.int32(0))
+        if isinstance(expr_node, ast.VarDeclNode):
+            value = self.__evaluate(expr_node.init_expr, frame, mask)
+            return self.__store(expr_node.name, value, frame, mask)
+        if isinstance(expr_node, ast.UnaryOperatorNode):
+            value = self.__evaluate(expr_node.expr, frame, mask)
+            if expr_node.type == ast.UnaryOperatorNode.Type.Negation:
+                return -value
+            if expr_node.type == ast.UnaryOperatorNode.Type.BitwiseComplement:
+                return ~value
+            return (value == 0).astype(np.int32)
+        if isinstance(expr_node, ast.BinaryOperatorNode):
+            if expr_node.type == ast.BinaryOperatorNode.Type.Assignment:
+                value = self.__evaluate(expr_node.rhs_expr, frame, mask)
+                return self.__store(expr_node.lhs_expr.name, value, frame, mask)
+            lhs = self.__evaluate(expr_node.lhs_expr, frame, mask)
+            rhs = self.__evaluate(expr_node.rhs_expr, frame, mask)
+            if expr_node.type == ast.BinaryOperatorNode.Type.Addition:
+                return lhs + rhs
+            if expr_node.type == ast.BinaryOperatorNode.Type.Subtraction:
+                return lhs - rhs
+            if expr_node.type == ast.BinaryOperatorNode.Type.Multiplication:
+                return lhs * rhs
+            return BatchEvaluator.__divide(lhs, rhs, mask)
+        if isinstance(expr_node, ast.LogicOperatorNode):
+            lhs = self.__evaluate(expr_node.lhs_expr, frame, mask)
+            if expr_node.type == ast.LogicOperatorNode.Type.And:
+                # The right hand side is only evaluated in lanes that do not short-circuit
+                rhs = self.__evaluate(expr_node.rhs_expr, frame, mask & (lhs != 0))
+                return ((lhs != 0) & (rhs != 0)).astype(np.int32)
+            if expr_node.type == ast.LogicOperatorNode.Type.Or:
+                rhs = self.__evaluate(expr_node.rhs_expr, frame, mask & (lhs == 0))
+                return ((lhs != 0) | (rhs != 0)).astype(np.int32)
+            rhs = self.__evaluate(expr_node.rhs_expr, frame, mask)
+            return BatchEvaluator.__comparisons[expr_node.type](lhs, rhs).astype(np.int32)
+        if isinstance(expr_node, ast.TernaryOperatorNode):
+            condition = self.__evaluate(expr_node.condition_expr, frame, mask) != 0
+            true_value = self.__evaluate(expr_node.true_expr, frame, mask & condition)
+            false_value = self.__evaluate(expr_node.false_expr, frame, mask & ~condition)
+            return np.where(condition, true_value, false_value).astype(np.int32)
+        if isinstance(expr_node, ast.FunCallNode):
+            return self.__evaluate_call(expr_node, frame, mask)
+
+        raise InterpreterError(f"Invalid expression {expr_node}")
+
+    def __evaluate_call(self, call_node: ast.FunCallNode, frame: _Frame,
+                        mask: 'np.ndarray') -> 'np.ndarray':
+        if call_node.name not in self.__functions:
+            raise InterpreterError(f"Call to an unknown function {call_node.name}")
+        lanes = np.count_nonzero(mask)
+        arguments = [np.broadcast_to(self.__evaluate(argument, frame, mask), mask.shape)[mask]
+                     for argument in call_node.arguments]
+        result = np.zeros(mask.shape, dtype=np.int32)
+        if lanes:
+            result[mask] = self.__call(self.__functions[call_node.name], arguments, lanes)
+        return result
+
+    @staticmethod
+    def __divide(lhs, rhs, mask: 'np.ndarray') -> 'np.ndarray':
+        """Signed division truncating towards zero, like the idiv instruction."""
+        lhs, rhs = np.broadcast_arrays(np.asarray(lhs, dtype=np.int64),
+                                       np.asarray(rhs, dtype=np.int64), mask)[:2]
+        if np.any((rhs == 0) & mask):
+            raise InterpreterError("Division by zero")
+        rhs = np.where(rhs == 0, 1, rhs)
+        quotient = np.abs(lhs) // np.abs(rhs)
+        return np.where((lhs < 0) != (rhs < 0), -quotient, quotient).astype(np.int32)
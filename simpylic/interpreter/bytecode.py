@@ -0,0 +1,200 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from array import array
+from typing import Dict, List, Set
+
+from .. import ast
+from ..frame_layout import FrameAllocator, FrameLayout
+from ..purity import PurityAnalyzer
+from .code import Op, CodeObject
+from .common import InterpreterError, wrap_int32
+from .optimizer import BytecodeOptimizer
+
+
+class BytecodeCompiler:
+    """Compiles the preprocessed AST into a CodeObject per function.
+
+    Variables are resolved to frame slots at compile time, using the same
+    frame layout as the native code generator. Functions are referred to by
+    their index in the returned list. Unless disabled, the code is then
+    passed through the BytecodeOptimizer to fuse superinstructions.
+    """
+
+    __binary_operators = {
+        ast.BinaryOperatorNode.Type.Addition: Op.Add,
+        ast.BinaryOperatorNode.Type.Subtraction: Op.Sub,
+        ast.BinaryOperatorNode.Type.Multiplication: Op.Mul,
+        ast.BinaryOperatorNode.Type.Division: Op.Div,
+        ast.LogicOperatorNode.Type.LessThan: Op.LessThan,
+        ast.LogicOperatorNode.Type.LessThanOrEqual: Op.LessThanOrEqual,
+        ast.LogicOperatorNode.Type.Equals: Op.Equals,
+        ast.LogicOperatorNode.Type.NotEquals: Op.NotEquals,
+        ast.LogicOperatorNode.Type.GreaterThanOrEqual: Op.GreaterThanOrEqual,
+        ast.LogicOperatorNode.Type.GreaterThan: Op.GreaterThan,
+    }
+    __unary_operators = {
+        ast.UnaryOperatorNode.Type.Negation: Op.Neg,
+        ast.UnaryOperatorNode.Type.BitwiseComplement: Op.Not,
+        ast.UnaryOperatorNode.Type.LogicalNegation: Op.LogicalNot,
+    }
+
+    def __init__(self, superinstructions: bool = True):
+        self.__superinstructions = superinstructions
+        self.__function_indexes: Dict[str, int] = {}
+        self.__code = array('i')
+        self.__constants: List[int] = []
+        self.__constant_indexes: Dict[int, int] = {}
+        self.__frame = FrameLayout({})
+        self.__pure_functions: Set[str] = set()
+
+    def compile(self, program_node: ast.ProgramNode) -> List[CodeObject]:
+        functions = list(program_node.functions)
+        self.__function_indexes = {func.name: index for index, func in enumerate(functions)}
+        self.__pure_functions = PurityAnalyzer().analyze(program_node)
+        return [self.__compile_function(func) for func in functions]
+
+    def function_index(self, name: str) -> int:
+        return self.__function_indexes[name]
+
+    def __compile_function(self, function_node: ast.FunDefNode) -> CodeObject:
+        self.__code = array('i')
+        self.__constants = []
+        self.__constant_indexes = {}
+        self.__frame = FrameAllocator().allocate(function_node)
+
+        self.__compile_block(function_node.body)
+        # Falling off the end of a function returns 0
+        self.__emit(Op.LoadConst, self.__constant(0))
+        self.__emit(Op.Return)
+
+        function = CodeObject(function_node.name, self.__code, self.__constants,
+                              self.__frame.slot_count,
+                              tuple(self.__frame.slot(arg) for arg in function_node.arguments),
+                              function_node.name in self.__pure_functions)
+        if self.__superinstructions:
+            function = BytecodeOptimizer().optimize(function)
+        return function
+
+    def __emit(self, op: Op, *arguments: int) -> int:
+        """Emits the instruction and returns position of its last argument."""
+        self.__code.append(op)
+        self.__code.extend(arguments)
+        return len(self.__code) - 1
+
+    def __constant(self, value: int) -> int:
+        if value not in self.__constant_indexes:
+            self.__constant_indexes[value] = len(self.__constants)
+            self.__constants.append(value)
+        return self.__constant_indexes[value]
+
+    def __slot(self, name: str) -> int:
+        if not self.__frame.has_variable(name):
+            raise InterpreterError(f"Unknown variable {name}")
+        return self.__frame.slot(name)
+
+    def __patch(self, position: int):
+        """Points the jump with target at the position to the current end of code."""
+        self.__code[position] = len(self.__code)
+
+    def __compile_block(self, block_node: ast.BlockNode):
+        for stmt in block_node.statements:
+            self.__compile_statement(stmt)
+
+    def __compile_statement(self, stmt_node: ast.StmtNode):
+        if isinstance(stmt_node, ast.ReturnStmtNode):
+            self.__compile_expression(stmt_node.expr)
+            self.__emit(Op.Return)
+        elif isinstance(stmt_node, ast.ConditionNode):
+            end_jumps = []
+            for node in [stmt_node.if_statement] + stmt_node.elif_statements:
+                self.__compile_expression(node.condition_expr)
+                next_jump = self.__emit(Op.JumpIfFalse, 0)
+                self.__compile_block(node.true_block)
+                end_jumps.append(self.__emit(Op.Jump, 0))
+                self.__patch(next_jump)
+            if stmt_node.else_statement:
+                self.__compile_block(stmt_node.else_statement.false_block)
+            for jump in end_jumps:
+                self.__patch(jump)
+        elif isinstance(stmt_node, ast.WhileStmtNode):
+            loop_start = len(self.__code)
+            self.__compile_expression(stmt_node.condition_expr)
+            end_jump = self.__emit(Op.JumpIfFalse, 0)
+            self.__compile_block(stmt_node.body)
+            self.__emit(Op.Jump, loop_start)
+            self.__patch(end_jump)
+        else:
+            self.__compile_expression(stmt_node, keep_value=False)
+
+    def __compile_expression(self, expr_node: ast.Node, keep_value: bool = True):
+        if isinstance(expr_node, ast.VarDeclNode):
+            self.__compile_store(expr_node.name, expr_node.init_expr, keep_value)
+            return
+        if isinstance(expr_node, ast.BinaryOperatorNode) \
+                and expr_node.type == ast.BinaryOperatorNode.Type.Assignment:
+            self.__compile_store(expr_node.lhs_expr.name, expr_node.rhs_expr, keep_value)
+            return
+
+        if isinstance(expr_node, ast.ConstantNode):
+            self.__emit(Op.LoadConst, self.__constant(wrap_int32(expr_node.value)))
+        elif isinstance(expr_node, ast.VarNode):
+            self.__emit(Op.LoadLocal, self.__slot(expr_node.name))
+        elif isinstance(expr_node, ast.UnaryOperatorNode):
+            self.__compile_expression(expr_node.expr)
+            self.__emit(BytecodeCompiler.__unary_operators[expr_node.type])
+        elif isinstance(expr_node, ast.LogicOperatorNode) \
+                and expr_node.type in (ast.LogicOperatorNode.Type.And,
+                                       ast.LogicOperatorNode.Type.Or):
+            is_and = expr_node.type == ast.LogicOperatorNode.Type.And
+            self.__compile_expression(expr_node.lhs_expr)
+            short_jump = self.__emit(Op.JumpIfFalse if is_and else Op.JumpIfTrue, 0)
+            self.__compile_expression(expr_node.rhs_expr)
+            self.__emit(Op.ToBool)
+            end_jump = self.__emit(Op.Jump, 0)
+            self.__patch(short_jump)
+            self.__emit(Op.LoadConst, self.__constant(0 if is_and else 1))
+            self.__patch(end_jump)
+        elif isinstance(expr_node, (ast.BinaryOperatorNode, ast.LogicOperatorNode)):
+            self.__compile_expression(expr_node.lhs_expr)
+            self.__compile_expression(expr_node.rhs_expr)
+            self.__emit(BytecodeCompiler.__binary_operators[expr_node.type])
+        elif isinstance(expr_node, ast.TernaryOperatorNode):
+            self.__compile_expression(expr_node.condition_expr)
+            else_jump = self.__emit(Op.JumpIfFalse, 0)
+            self.__compile_expression(expr_node.true_expr)
+            end_jump = self.__emit(Op.Jump, 0)
+            self.__patch(else_jump)
+            self.__compile_expression(expr_node.false_expr)
+            self.__patch(end_jump)
+        elif isinstance(expr_node, ast.FunCallNode):
+            if expr_node.name not in self.__function_indexes:
+                raise InterpreterError(f"Call to an unknown function {expr_node.name}")
+            for argument in expr_node.arguments:
+                self.__compile_expression(argument)
+            self.__emit(Op.Call, self.__function_indexes[expr_node.name])
+        else:
+            raise InterpreterError(f"Invalid expression {expr_node}")
+
+        if not keep_value:
+            self.__emit(Op.Pop)
+
+    def __compile_store(self, name: str, value_node: ast.ExprNode, keep_value: bool):
+        self.__compile_expression(value_node)
+        if keep_value:
+            self.__emit(Op.Dup)
+        self.__emit(Op.StoreLocal, self.__slot(name))
@@ -0,0 +1,306 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .. import ast
+from ..frame_layout import FrameAllocator, FrameLayout
+from ..purity import PurityAnalyzer
+from .common import InterpreterError, INT32_MIN, INT32_MAX, wrap_int32, divide_int32
+from .memo import Memoizer
+
+
+Frame = List[int]
+Expression = Callable[[Frame], int]
+# Statements return None, or the return value of the function when they return
+Statement = Callable[[Frame], Optional[int]]
+Function = Callable[[Sequence[int]], int]
+
+
+class ClosureProgram:
+    """Executes the AST compiled into a tree of nested Python closures.
+
+    Every node is turned into a closure specialised for its type and operands
+    once, before the program runs. Constants and frame slots of variables are
+    captured at that time, so executing the closures involves no dispatch on
+    the node type and no attribute lookups.
+    """
+
+    def __init__(self, program_node: ast.ProgramNode, memoizer: Optional[Memoizer] = None):
+        self.__memoizer = memoizer
+        if memoizer:
+            memoizer.memoize(PurityAnalyzer().analyze(program_node))
+        # Calls refer to the functions through these cells, which allows
+        # recursion and calls to functions defined later in the program.
+        self.__cells: Dict[str, List[Function]] = {func.name: [] for func in program_node.functions}
+        self.__frame = FrameLayout({})
+        for function_node in program_node.functions:
+            self.__cells[function_node.name].append(self.__compile_function(function_node))
+
+    def run(self, name: str = "main", arguments: Sequence[int] = ()) -> int:
+        return self.__cells[name][0](arguments)
+
+    def __compile_function(self, function_node: ast.FunDefNode) -> Function:
+        self.__frame = FrameAllocator().allocate(function_node)
+        slot_count = self.__frame.slot_count
+        argument_slots = [self.__frame.slot(arg) for arg in function_node.arguments]
+        body = self.__compile_block(function_node.body)
+
+        def function(arguments: Sequence[int]) -> int:
+            frame = [0] * slot_count
+            for slot, value in zip(argument_slots, arguments):
+                frame[slot] = value
+            result = body(frame)
+            return 0 if result is None else result
+
+        cache = self.__memoizer.cache(function_node.name) if self.__memoizer else None
+        if cache is None:
+            return function
+
+        def memoized_function(arguments: Sequence[int]) -> int:
+            key = tuple(arguments)
+            result = cache.get(key)
+            if result is None:
+                result = function(arguments)
+                cache.put(key, result)
+            return result
+        return memoized_function
+
+    def __slot(self, name: str) -> int:
+        if not self.__frame.has_variable(name):
+            raise InterpreterError(f"Unknown variable {name}")
+        return self.__frame.slot(name)
+
+    def __compile_block(self, block_node: ast.BlockNode) -> Statement:
+        statements = [self.__compile_statement(stmt) for stmt in block_node.statements]
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(frame: Frame) -> Optional[int]:
+            for statement in statements:
+                result = statement(frame)
+                if result is not None:
+                    return result
+            return None
+        return block
+
+    def __compile_statement(self, stmt_node: ast.StmtNode) -> Statement:
+        if isinstance(stmt_node, ast.ReturnStmtNode):
+            return self.__compile_expression(stmt_node.expr)
+        if isinstance(stmt_node, ast.ConditionNode):
+            return self.__compile_condition(stmt_node)
+        if isinstance(stmt_node, ast.WhileStmtNode):
+            return self.__compile_while(stmt_node)
+
+        store = ClosureProgram.__store_target(stmt_node)
+        if store is not None:
+            slot, value = self.__slot(store[0]), self.__compile_expression(store[1])
+
+            def assign(frame: Frame) -> None:
+                frame[slot] = value(frame)
+            return assign
+
+        expression = self.__compile_expression(stmt_node)
+
+        def evaluate(frame: Frame) -> None:
+            expression(frame)
+        return evaluate
+
+    def __compile_condition(self, condition_node: ast.ConditionNode) -> Statement:
+        branches = [(self.__compile_test(node.condition_expr),
+                     self.__compile_block(node.true_block))
+                    for node in [condition_node.if_statement] + condition_node.elif_statements]
+        if condition_node.else_statement:
+            false_block = self.__compile_block(condition_node.else_statement.false_block)
+        else:
+            false_block = None
+
+        if len(branches) == 1:
+            test, true_block = branches[0]
+            if false_block is None:
+                def if_statement(frame: Frame) -> Optional[int]:
+                    if test(frame):
+                        return true_block(frame)
+                    return None
+            else:
+                def if_statement(frame: Frame) -> Optional[int]:
+                    if test(frame):
+                        return true_block(frame)
+                    return false_block(frame)
+            return if_statement
+
+        def if_chain(frame: Frame) -> Optional[int]:
+            for test, true_block in branches:
+                if test(frame):
+                    return true_block(frame)
+            if false_block is not None:
+                return false_block(frame)
+            return None
+        return if_chain
+
+    def __compile_while(self, while_node: ast.WhileStmtNode) -> Statement:
+        test = self.__compile_test(while_node.condition_expr)
+        body = self.__compile_block(while_node.body)
+        if not ClosureProgram.__contains_return(while_node.body):
+            def simple_loop(frame: Frame) -> None:
+                while test(frame):
+                    body(frame)
+            return simple_loop
+
+        def loop(frame: Frame) -> Optional[int]:
+            while test(frame):
+                result = body(frame)
+                if result is not None:
+                    return result
+            return None
+        return loop
+
+    @staticmethod
+    def __contains_return(node: ast.Node) -> bool:
+        return isinstance(node, ast.ReturnStmtNode) \
+            or any(ClosureProgram.__contains_return(child) for child in node.children)
+
+    @staticmethod
+    def __store_target(node: ast.Node):
+        """Returns the assigned variable and the value node, if the node is an assignment."""
+        if isinstance(node, ast.VarDeclNode):
+            return node.name, node.init_expr
+        if isinstance(node, ast.BinaryOperatorNode) \
+                and node.type == ast.BinaryOperatorNode.Type.Assignment:
+            return node.lhs_expr.name, node.rhs_expr
+        return None
+
+    def __compile_test(self, expr_node: ast.Node) -> Callable[[Frame], object]:
+        """Compiles an expression whose value is only tested for truth.
+
+        Comparisons in conditions do not need to be converted to 0 or 1, so
+        they are compiled directly into Python comparisons.
+        """
+        if isinstance(expr_node, ast.LogicOperatorNode) \
+                and expr_node.type not in (ast.LogicOperatorNode.Type.And,
+                                           ast.LogicOperatorNode.Type.Or):
+            return self.__compile_comparison(expr_node)
+        return self.__compile_expression(expr_node)
+
+    def __compile_comparison(self, expr_node: ast.LogicOperatorNode) -> Callable[[Frame], bool]:
+        comparison_type = expr_node.type
+        lhs_node, rhs_node = expr_node.lhs_expr, expr_node.rhs_expr
+        # The common loop condition comparing a variable with a constant
+        if comparison_type == ast.LogicOperatorNode.Type.LessThan \
+                and isinstance(lhs_node, ast.VarNode) and isinstance(rhs_node, ast.ConstantNode):
+            slot, value = self.__slot(lhs_node.name), wrap_int32(rhs_node.value)
+            return lambda frame: frame[slot] < value
+
+        lhs, rhs = self.__compile_expression(lhs_node), self.__compile_expression(rhs_node)
+        if comparison_type == ast.LogicOperatorNode.Type.LessThan:
+            return lambda frame: lhs(frame) < rhs(frame)
+        if comparison_type == ast.LogicOperatorNode.Type.LessThanOrEqual:
+            return lambda frame: lhs(frame) <= rhs(frame)
+        if comparison_type == ast.LogicOperatorNode.Type.Equals:
+            return lambda frame: lhs(frame) == rhs(frame)
+        if comparison_type == ast.LogicOperatorNode.Type.NotEquals:
+            return lambda frame: lhs(frame) != rhs(frame)
+        if comparison_type == ast.LogicOperatorNode.Type.GreaterThanOrEqual:
+            return lambda frame: lhs(frame) >= rhs(frame)
+        return lambda frame: lhs(frame) > rhs(frame)
+
+    def __compile_expression(self, expr_node: ast.Node) -> Expression:
+        if isinstance(expr_node, ast.ConstantNode):
+            value = wrap_int32(expr_node.value)
+            return lambda frame: value
+        if isinstance(expr_node, ast.VarNode):
+            slot = self.__slot(expr_node.name)
+            return lambda frame: frame[slot]
+
+        store = ClosureProgram.__store_target(expr_node)
+        if store is not None:
+            slot, value = self.__slot(store[0]), self.__compile_expression(store[1])
+
+            def assign(frame: Frame) -> int:
+                frame[slot] = result = value(frame)
+                return result
+            return assign
+
+        if isinstance(expr_node, ast.UnaryOperatorNode):
+            operand = self.__compile_expression(expr_node.expr)
+            if expr_node.type == ast.UnaryOperatorNode.Type.Negation:
+                return lambda frame: wrap_int32(-operand(frame))
+            if expr_node.type == ast.UnaryOperatorNode.Type.BitwiseComplement:
+                return lambda frame: ~operand(frame)
+            return lambda frame: 0 if operand(frame) else 1
+        if isinstance(expr_node, ast.BinaryOperatorNode):
+            return self.__compile_arithmetic(expr_node)
+        if isinstance(expr_node, ast.LogicOperatorNode):
+            lhs, rhs = self.__compile_expression(expr_node.lhs_expr), \
+                self.__compile_expression(expr_node.rhs_expr)
+            if expr_node.type == ast.LogicOperatorNode.Type.And:
+                return lambda frame: 1 if lhs(frame) and rhs(frame) else 0
+            if expr_node.type == ast.LogicOperatorNode.Type.Or:
+                return lambda frame: 1 if lhs(frame) or rhs(frame) else 0
+            comparison = self.__compile_comparison(expr_node)
+            return lambda frame: 1 if comparison(frame) else 0
+        if isinstance(expr_node, ast.TernaryOperatorNode):
+            test = self.__compile_test(expr_node.condition_expr)
+            true_expr, false_expr = self.__compile_expression(expr_node.true_expr), \
+                self.__compile_expression(expr_node.false_expr)
+            return lambda frame: true_expr(frame) if test(frame) else false_expr(frame)
+        if isinstance(expr_node, ast.FunCallNode):
+            return self.__compile_call(expr_node)
+
+        raise InterpreterError(f"Invalid expression {expr_node}")
+
+    def __compile_arithmetic(self, expr_node: ast.BinaryOperatorNode) -> Expression:
+        lhs_node, rhs_node = expr_node.lhs_expr, expr_node.rhs_expr
+        if expr_node.type == ast.BinaryOperatorNode.Type.Division:
+            lhs, rhs = self.__compile_expression(lhs_node), self.__compile_expression(rhs_node)
+            return lambda frame: divide_int32(lhs(frame), rhs(frame))
+
+        int_min, int_max = INT32_MIN, INT32_MAX
+        # Incrementing a variable by a constant is by far the most common case
+        if expr_node.type == ast.BinaryOperatorNode.Type.Addition \
+                and isinstance(lhs_node, ast.VarNode) and isinstance(rhs_node, ast.ConstantNode):
+            slot, constant = self.__slot(lhs_node.name), wrap_int32(rhs_node.value)
+
+            def add_constant(frame: Frame) -> int:
+                value = frame[slot] + constant
+                return value if int_min <= value <= int_max else wrap_int32(value)
+            return add_constant
+
+        lhs, rhs = self.__compile_expression(lhs_node), self.__compile_expression(rhs_node)
+        if expr_node.type == ast.BinaryOperatorNode.Type.Addition:
+            def add(frame: Frame) -> int:
+                value = lhs(frame) + rhs(frame)
+                return value if int_min <= value <= int_max else wrap_int32(value)
+            return add
+
+        if expr_node.type == ast.BinaryOperatorNode.Type.Subtraction:
+            def subtract(frame: Frame) -> int:
+                value = lhs(frame) - rhs(frame)
+                return value if int_min <= value <= int_max else wrap_int32(value)
+            return subtract
+
+        def multiply(frame: Frame) -> int:
+            value = lhs(frame) * rhs(frame)
+            return value if int_min <= value <= int_max else wrap_int32(value)
+        return multiply
+
+    def __compile_call(self, call_node: ast.FunCallNode) -> Expression:
+        if call_node.name not in self.__cells:
+            raise InterpreterError(f"Call to an unknown function {call_node.name}")
+        cell = self.__cells[call_node.name]
+        arguments = [self.__compile_expression(argument) for argument in call_node.arguments]
+        return lambda frame: cell[0]([argument(frame) for argument in arguments])
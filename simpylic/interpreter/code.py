@@ -0,0 +1,103 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from array import array
+from enum import IntEnum
+from typing import List, Tuple
+
+
+class Op(IntEnum):
+    LoadConst = 0       # index into the constant pool
+    LoadLocal = 1       # slot
+    StoreLocal = 2      # slot; pops the value
+    Pop = 3
+    Dup = 4
+    Add = 5
+    Sub = 6
+    Mul = 7
+    Div = 8
+    Neg = 9
+    Not = 10
+    LogicalNot = 11
+    ToBool = 12
+    LessThan = 13
+    LessThanOrEqual = 14
+    Equals = 15
+    NotEquals = 16
+    GreaterThanOrEqual = 17
+    GreaterThan = 18
+    Jump = 19           # target
+    JumpIfFalse = 20    # target; pops the condition
+    JumpIfTrue = 21     # target; pops the condition
+    Call = 22           # function index
+    Return = 23
+    # Superinstructions produced by the BytecodeOptimizer
+    LoadLocalConst = 24             # slot, constant
+    AddConst = 25                   # constant
+    IncrementLocal = 26             # slot, constant
+    JumpIfNotEqual = 27             # target; pops both operands
+    JumpIfNotLessLocalConst = 28    # slot, constant, target
+    JumpIfNotLessLocalLocal = 29    # slot, slot, target
+    ReturnLocal = 30                # slot
+
+    @property
+    def argument_count(self) -> int:
+        return OP_ARGUMENT_COUNTS.get(self, 0)
+
+    @property
+    def is_jump(self) -> bool:
+        """Whether the last argument of the instruction is a jump target."""
+        return self in JUMP_OPS
+
+
+OP_ARGUMENT_COUNTS = {
+    Op.LoadConst: 1, Op.LoadLocal: 1, Op.StoreLocal: 1, Op.Jump: 1, Op.JumpIfFalse: 1,
+    Op.JumpIfTrue: 1, Op.Call: 1, Op.LoadLocalConst: 2, Op.AddConst: 1, Op.IncrementLocal: 2,
+    Op.JumpIfNotEqual: 1, Op.JumpIfNotLessLocalConst: 3, Op.JumpIfNotLessLocalLocal: 3,
+    Op.ReturnLocal: 1,
+}
+
+JUMP_OPS = frozenset([Op.Jump, Op.JumpIfFalse, Op.JumpIfTrue, Op.JumpIfNotEqual,
+                      Op.JumpIfNotLessLocalConst, Op.JumpIfNotLessLocalLocal])
+
+
+class CodeObject:
+    """Compiled function: the bytecode, its constant pool and the frame shape."""
+
+    __slots__ = ('name', 'code', 'constants', 'slot_count', 'argument_slots', 'is_pure')
+
+    def __init__(self, name: str, code: array, constants: List[int], slot_count: int,
+                 argument_slots: Tuple[int, ...], is_pure: bool = False):
+        self.name = name
+        self.code = code
+        self.constants = constants
+        self.slot_count = slot_count
+        self.argument_slots = argument_slots
+        self.is_pure = is_pure
+
+    def __repr__(self):
+        return f"CodeObject(name={self.name}, size={len(self.code)}, " \
+               f"constants={self.constants}, slots={self.slot_count})"
+
+    def disassemble(self) -> List[Tuple[int, Op, List[int]]]:
+        instructions = []
+        pc = 0
+        while pc < len(self.code):
+            op = Op(self.code[pc])
+            instructions.append((pc, op, list(self.code[pc + 1:pc + 1 + op.argument_count])))
+            pc += 1 + op.argument_count
+        return instructions
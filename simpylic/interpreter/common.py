@@ -0,0 +1,45 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class InterpreterError(RuntimeError):
+    pass
+
+
+class StepLimitError(InterpreterError):
+    pass
+
+
+INT32_MIN = -0x80000000
+INT32_MAX = 0x7FFFFFFF
+
+
+def wrap_int32(value: int) -> int:
+    """Wraps the value around to a signed 32-bit integer, like the compiled code does."""
+    if INT32_MIN <= value <= INT32_MAX:
+        return value
+    return ((value - INT32_MIN) & 0xFFFFFFFF) + INT32_MIN
+
+
+def divide_int32(lhs: int, rhs: int) -> int:
+    """Signed division truncating towards zero, like the idiv instruction."""
+    if rhs == 0:
+        raise InterpreterError("Division by zero")
+    quotient = abs(lhs) // abs(rhs)
+    if (lhs < 0) != (rhs < 0):
+        quotient = -quotient
+    return wrap_int32(quotient)
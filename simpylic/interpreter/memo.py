@@ -0,0 +1,96 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class LruCache:
+    """Bounded mapping of argument tuples to results, evicting the least recently used."""
+
+    __slots__ = ('maxsize', 'hits', 'misses', 'evictions', '__data')
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__data: 'OrderedDict[Tuple[int, ...], int]' = OrderedDict()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __repr__(self):
+        return f"LruCache(size={len(self.__data)}/{self.maxsize}, hits={self.hits}, " \
+               f"misses={self.misses}, evictions={self.evictions})"
+
+    def get(self, key: Tuple[int, ...]) -> Optional[int]:
+        value = self.__data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__data.move_to_end(key)
+        return value
+
+    def put(self, key: Tuple[int, ...], value: int):
+        self.__data[key] = value
+        if len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+            self.evictions += 1
+
+
+class Memoizer:
+    """Result caches of the pure functions of a program, one per function.
+
+    The execution engines register the functions found pure by the
+    PurityAnalyzer and consult the caches on every call of them.
+    """
+
+    def __init__(self, maxsize: int):
+        self.__maxsize = maxsize
+        self.__caches: Dict[str, LruCache] = {}
+
+    def memoize(self, names: Iterable[str]):
+        for name in names:
+            self.__caches.setdefault(name, LruCache(self.__maxsize))
+
+    def cache(self, name: str) -> Optional[LruCache]:
+        """Returns the cache of the function, or None if it must not be memoized."""
+        return self.__caches.get(name)
+
+    def wrap(self, name: str, function: Callable[..., int]) -> Callable[..., int]:
+        """Memoizes the function, which takes the arguments as positional arguments."""
+        cache = self.__caches.get(name)
+        if cache is None:
+            return function
+
+        def memoized(*arguments: int) -> int:
+            result = cache.get(arguments)
+            if result is None:
+                result = function(*arguments)
+                cache.put(arguments, result)
+            return result
+        return memoized
+
+    def statistics(self) -> Dict[str, LruCache]:
+        return dict(self.__caches)
+
+    def report(self) -> str:
+        return "\n".join(f"{name}: {cache.hits} hits, {cache.misses} misses, "
+                         f"{cache.evictions} evictions, {len(cache)} cached"
+                         for name, cache in sorted(self.__caches.items()))
@@ -0,0 +1,99 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from array import array
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from .code import Op, CodeObject
+
+
+Instruction = Tuple[int, Op, List[int]]
+
+
+class BytecodeOptimizer:
+    """Fuses frequent instruction sequences into superinstructions.
+
+    Each superinstruction saves the dispatch of the instructions it replaces.
+    The sequences are the most frequent ones in the loop-weighted opcode
+    statistics of the testdata corpus and of the benchmark programs (see
+    benchmarks/opcode_pairs.py): loop counters, loop conditions, constant
+    operands and returns of a variable. A sequence is only fused when no jump
+    lands inside of it.
+    """
+
+    # Tried in order at each instruction, so longer sequences go first. The
+    # builder returns arguments of the superinstruction or None when the
+    # sequence cannot be fused.
+    __patterns: List[Tuple[Tuple[Op, ...], Op, Callable[..., Optional[List[int]]]]] = [
+        ((Op.LoadLocal, Op.LoadConst, Op.Add, Op.StoreLocal), Op.IncrementLocal,
+         lambda load, const, add, store: load + const if load == store else None),
+        ((Op.LoadLocal, Op.LoadConst, Op.LessThan, Op.JumpIfFalse), Op.JumpIfNotLessLocalConst,
+         lambda load, const, less, jump: load + const + jump),
+        ((Op.LoadLocal, Op.LoadLocal, Op.LessThan, Op.JumpIfFalse), Op.JumpIfNotLessLocalLocal,
+         lambda lhs, rhs, less, jump: lhs + rhs + jump),
+        ((Op.Equals, Op.JumpIfFalse), Op.JumpIfNotEqual,
+         lambda equals, jump: jump),
+        ((Op.LoadLocal, Op.Return), Op.ReturnLocal,
+         lambda load, ret: load),
+        ((Op.LoadConst, Op.Add), Op.AddConst,
+         lambda const, add: const),
+        ((Op.LoadLocal, Op.LoadConst), Op.LoadLocalConst,
+         lambda load, const: load + const),
+    ]
+
+    def optimize(self, function: CodeObject) -> CodeObject:
+        instructions = function.disassemble()
+        targets = {arguments[-1] for _, op, arguments in instructions if op.is_jump}
+
+        fused: List[Instruction] = []
+        index = 0
+        while index < len(instructions):
+            length, instruction = self.__fuse(instructions, index, targets)
+            fused.append(instruction)
+            index += length
+
+        # Lay out the new code and remap the jump targets
+        positions = {}
+        position = 0
+        for old_position, op, arguments in fused:
+            positions[old_position] = position
+            position += 1 + len(arguments)
+        positions[len(function.code)] = position
+
+        code = array('i')
+        for _, op, arguments in fused:
+            if op.is_jump:
+                arguments = arguments[:-1] + [positions[arguments[-1]]]
+            code.append(op)
+            code.extend(arguments)
+
+        return CodeObject(function.name, code, function.constants, function.slot_count,
+                          function.argument_slots, function.is_pure)
+
+    @staticmethod
+    def __fuse(instructions: Sequence[Instruction], index: int,
+               targets: Set[int]) -> Tuple[int, Instruction]:
+        for ops, fused_op, build in BytecodeOptimizer.__patterns:
+            window = instructions[index:index + len(ops)]
+            if tuple(op for _, op, _ in window) != ops:
+                continue
+            if any(position in targets for position, _, _ in window[1:]):
+                continue
+            arguments = build(*(arguments for _, _, arguments in window))
+            if arguments is not None:
+                return len(ops), (window[0][0], fused_op, arguments)
+        return 1, instructions[index]
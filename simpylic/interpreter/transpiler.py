@@ -0,0 +1,288 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import ast as pyast
+import hashlib
+import importlib.util
+import marshal
+import os
+from types import CodeType
+from typing import List, Optional, Sequence
+
+from .. import ast
+from ..purity import PurityAnalyzer
+from .common import InterpreterError, divide_int32, wrap_int32
+from .memo import Memoizer
+
+
+class PythonTranspiler:
+    """Lowers the preprocessed AST into a Python module.
+
+    Every Simpylic function becomes a Python function. Python integers do not
+    overflow and their division rounds towards negative infinity, so results
+    of the arithmetic operators are wrapped around to 32 bits inline, and the
+    division is done by divide_int32. Comparisons and logical operators yield
+    0 or 1, except in conditions where only their truth value matters. The
+    module also records the names of the pure functions, so that they can be
+    memoized without the AST.
+    """
+
+    function_prefix = 'f_'
+    variable_prefix = 'v_'
+    divide_helper = '_divide'
+    pure_functions = '_pure_functions'
+
+    __arithmetic_operators = {
+        ast.BinaryOperatorNode.Type.Addition: pyast.Add,
+        ast.BinaryOperatorNode.Type.Subtraction: pyast.Sub,
+        ast.BinaryOperatorNode.Type.Multiplication: pyast.Mult,
+    }
+    __comparison_operators = {
+        ast.LogicOperatorNode.Type.LessThan: pyast.Lt,
+        ast.LogicOperatorNode.Type.LessThanOrEqual: pyast.LtE,
+        ast.LogicOperatorNode.Type.Equals: pyast.Eq,
+        ast.LogicOperatorNode.Type.NotEquals: pyast.NotEq,
+        ast.LogicOperatorNode.Type.GreaterThanOrEqual: pyast.GtE,
+        ast.LogicOperatorNode.Type.GreaterThan: pyast.Gt,
+    }
+
+    def transpile(self, program_node: ast.ProgramNode) -> pyast.Module:
+        pure_functions = sorted(PurityAnalyzer().analyze(program_node))
+        body: List[pyast.stmt] = [pyast.Assign(
+            targets=[pyast.Name(id=PythonTranspiler.pure_functions, ctx=pyast.Store())],
+            value=pyast.Constant(value=tuple(pure_functions)))]
+        body += [self.__transpile_function(func) for func in program_node.functions]
+        module = pyast.Module(body=body, type_ignores=[])
+        return pyast.fix_missing_locations(module)
+
+    def __transpile_function(self, function_node: ast.FunDefNode) -> pyast.FunctionDef:
+        arguments = [PythonTranspiler.__variable(arg) for arg in function_node.arguments]
+        body: List[pyast.stmt] = []
+        # Variables read before they are assigned evaluate to 0, like in the
+        # other engines, instead of raising UnboundLocalError.
+        variables = sorted(set(PythonTranspiler.__variables(function_node.body))
+                           - set(arguments))
+        if variables:
+            body.append(pyast.Assign(targets=[pyast.Name(id=name, ctx=pyast.Store())
+                                              for name in variables],
+                                     value=pyast.Constant(value=0)))
+        body += self.__transpile_block(function_node.body)
+        body.append(pyast.Return(value=pyast.Constant(value=0)))
+
+        return pyast.FunctionDef(
+            name=PythonTranspiler.__function(function_node.name),
+            args=pyast.arguments(posonlyargs=[], args=[pyast.arg(arg=arg) for arg in arguments],
+                                 kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=body, decorator_list=[])
+
+    @staticmethod
+    def __function(name: str) -> str:
+        return PythonTranspiler.function_prefix + name
+
+    @staticmethod
+    def __variable(name: str) -> str:
+        return PythonTranspiler.variable_prefix + name
+
+    @staticmethod
+    def __variables(node: ast.Node):
+        if isinstance(node, (ast.VarNode, ast.VarDeclNode)):
+            yield PythonTranspiler.__variable(node.name)
+        for child in node.children:
+            yield from PythonTranspiler.__variables(child)
+
+    def __transpile_block(self, block_node: ast.BlockNode) -> List[pyast.stmt]:
+        statements = [self.__transpile_statement(stmt) for stmt in block_node.statements]
+        return statements or [pyast.Pass()]
+
+    def __transpile_statement(self, stmt_node: ast.StmtNode) -> pyast.stmt:
+        if isinstance(stmt_node, ast.ReturnStmtNode):
+            return pyast.Return(value=self.__transpile_expression(stmt_node.expr))
+        if isinstance(stmt_node, ast.ConditionNode):
+            orelse: List[pyast.stmt] = []
+            if stmt_node.else_statement:
+                orelse = self.__transpile_block(stmt_node.else_statement.false_block)
+            for node in reversed([stmt_node.if_statement] + stmt_node.elif_statements):
+                orelse = [pyast.If(test=self.__transpile_test(node.condition_expr),
+                                   body=self.__transpile_block(node.true_block), orelse=orelse)]
+            return orelse[0]
+        if isinstance(stmt_node, ast.WhileStmtNode):
+            return pyast.While(test=self.__transpile_test(stmt_node.condition_expr),
+                               body=self.__transpile_block(stmt_node.body), orelse=[])
+
+        store = PythonTranspiler.__store_target(stmt_node)
+        if store is not None:
+            return pyast.Assign(targets=[pyast.Name(id=PythonTranspiler.__variable(store[0]),
+                                                    ctx=pyast.Store())],
+                                value=self.__transpile_expression(store[1]))
+        return pyast.Expr(value=self.__transpile_expression(stmt_node))
+
+    @staticmethod
+    def __store_target(node: ast.Node):
+        """Returns the assigned variable and the value node, if the node is an assignment."""
+        if isinstance(node, ast.VarDeclNode):
+            return node.name, node.init_expr
+        if isinstance(node, ast.BinaryOperatorNode) \
+                and node.type == ast.BinaryOperatorNode.Type.Assignment:
+            return node.lhs_expr.name, node.rhs_expr
+        return None
+
+    def __transpile_test(self, expr_node: ast.Node) -> pyast.expr:
+        """Transpiles an expression whose value is only tested for truth."""
+        if isinstance(expr_node, ast.LogicOperatorNode):
+            if expr_node.type in PythonTranspiler.__comparison_operators:
+                return self.__transpile_comparison(expr_node)
+            operator = pyast.And if expr_node.type == ast.LogicOperatorNode.Type.And \
+                else pyast.Or
+            return pyast.BoolOp(op=operator(), values=[self.__transpile_test(expr_node.lhs_expr),
+                                                       self.__transpile_test(expr_node.rhs_expr)])
+        return self.__transpile_expression(expr_node)
+
+    def __transpile_comparison(self, expr_node: ast.LogicOperatorNode) -> pyast.expr:
+        operator = PythonTranspiler.__comparison_operators[expr_node.type]
+        return pyast.Compare(left=self.__transpile_expression(expr_node.lhs_expr),
+                             ops=[operator()],
+                             comparators=[self.__transpile_expression(expr_node.rhs_expr)])
+
+    @staticmethod
+    def __to_int(test: pyast.expr, true_value: int = 1) -> pyast.expr:
+        """1 if test else 0"""
+        return pyast.IfExp(test=test, body=pyast.Constant(value=true_value),
+                           orelse=pyast.Constant(value=1 - true_value))
+
+    @staticmethod
+    def __wrap_int32(value: pyast.expr) -> pyast.expr:
+        """((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000"""
+        shifted = pyast.BinOp(left=value, op=pyast.Add(), right=pyast.Constant(value=0x80000000))
+        masked = pyast.BinOp(left=shifted, op=pyast.BitAnd(),
+                             right=pyast.Constant(value=0xFFFFFFFF))
+        return pyast.BinOp(left=masked, op=pyast.Sub(), right=pyast.Constant(value=0x80000000))
+
+    def __transpile_expression(self, expr_node: ast.Node) -> pyast.expr:
+        if isinstance(expr_node, ast.ConstantNode):
+            return pyast.Constant(value=wrap_int32(expr_node.value))
+        if isinstance(expr_node, ast.VarNode):
+            return pyast.Name(id=PythonTranspiler.__variable(expr_node.name), ctx=pyast.Load())
+
+        store = PythonTranspiler.__store_target(expr_node)
+        if store is not None:
+            return pyast.NamedExpr(target=pyast.Name(id=PythonTranspiler.__variable(store[0]),
+                                                     ctx=pyast.Store()),
+                                   value=self.__transpile_expression(store[1]))
+
+        if isinstance(expr_node, ast.UnaryOperatorNode):
+            operand = self.__transpile_expression(expr_node.expr)
+            if expr_node.type == ast.UnaryOperatorNode.Type.Negation:
+                return PythonTranspiler.__wrap_int32(pyast.UnaryOp(op=pyast.USub(),
+                                                                   operand=operand))
+            if expr_node.type == ast.UnaryOperatorNode.Type.BitwiseComplement:
+                return pyast.UnaryOp(op=pyast.Invert(), operand=operand)
+            return PythonTranspiler.__to_int(operand, true_value=0)
+        if isinstance(expr_node, ast.BinaryOperatorNode):
+            lhs = self.__transpile_expression(expr_node.lhs_expr)
+            rhs = self.__transpile_expression(expr_node.rhs_expr)
+            if expr_node.type == ast.BinaryOperatorNode.Type.Division:
+                return pyast.Call(func=pyast.Name(id=PythonTranspiler.divide_helper,
+                                                  ctx=pyast.Load()),
+                                  args=[lhs, rhs], keywords=[])
+            operator = PythonTranspiler.__arithmetic_operators[expr_node.type]
+            return PythonTranspiler.__wrap_int32(pyast.BinOp(left=lhs, op=operator(), right=rhs))
+        if isinstance(expr_node, ast.LogicOperatorNode):
+            return PythonTranspiler.__to_int(self.__transpile_test(expr_node))
+        if isinstance(expr_node, ast.TernaryOperatorNode):
+            return pyast.IfExp(test=self.__transpile_test(expr_node.condition_expr),
+                               body=self.__transpile_expression(expr_node.true_expr),
+                               orelse=self.__transpile_expression(expr_node.false_expr))
+        if isinstance(expr_node, ast.FunCallNode):
+            return pyast.Call(func=pyast.Name(id=PythonTranspiler.__function(expr_node.name),
+                                              ctx=pyast.Load()),
+                              args=[self.__transpile_expression(arg)
+                                    for arg in expr_node.arguments],
+                              keywords=[])
+
+        raise InterpreterError(f"Invalid expression {expr_node}")
+
+
+class PythonProgram:
+    """Runs a program transpiled by the PythonTranspiler on the CPython VM."""
+
+    def __init__(self, code: CodeType, memoizer: Optional[Memoizer] = None):
+        self.__namespace = {PythonTranspiler.divide_helper: divide_int32}
+        exec(code, self.__namespace)  # pylint: disable=exec-used
+        if memoizer:
+            pure_functions = self.__namespace[PythonTranspiler.pure_functions]
+            memoizer.memoize(pure_functions)
+            # Calls look the functions up in the module namespace, so replacing
+            # them there memoizes the recursive calls as well
+            for name in pure_functions:
+                function_name = PythonTranspiler.function_prefix + name
+                self.__namespace[function_name] = memoizer.wrap(name,
+                                                                self.__namespace[function_name])
+
+    @staticmethod
+    def compile(program_node: ast.ProgramNode) -> CodeType:
+        module = PythonTranspiler().transpile(program_node)
+        return compile(module, '<simpylic>', 'exec')
+
+    def run(self, name: str = "main", arguments: Sequence[int] = ()) -> int:
+        function = self.__namespace.get(PythonTranspiler.function_prefix + name)
+        if function is None:
+            raise InterpreterError(f"Unknown function {name}")
+        return function(*arguments)
+
+
+class PythonCodeCache:
+    """On-disk cache of transpiled code objects, keyed by the program source.
+
+    The code objects are stored with marshal, whose format is specific to
+    the Python version, so the version's bytecode magic number is part of
+    the key. A cache hit skips tokenizing, parsing and transpiling.
+    """
+
+    # Bump whenever the transpiler output changes
+    version = 3
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+
+    @staticmethod
+    def default_directory() -> str:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        return os.path.join(cache_home, 'simpylic')
+
+    def __path(self, source: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(importlib.util.MAGIC_NUMBER)
+        digest.update(PythonCodeCache.version.to_bytes(4, 'little'))
+        digest.update(source.encode('utf-8'))
+        return os.path.join(self.__directory, digest.hexdigest() + '.marshal')
+
+    def load(self, source: str) -> Optional[CodeType]:
+        try:
+            with open(self.__path(source), 'rb') as infile:
+                code = marshal.load(infile)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, CodeType) else None
+
+    def store(self, source: str, code: CodeType):
+        path = self.__path(source)
+        os.makedirs(self.__directory, exist_ok=True)
+        # Write to a temporary file first, so concurrent runs never see partial data
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as outfile:
+            marshal.dump(code, outfile)
+        os.replace(temporary, path)
@@ -0,0 +1,161 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Dict, List, Optional
+
+from .. import ast
+from ..purity import PurityAnalyzer
+from .common import InterpreterError, StepLimitError, wrap_int32, divide_int32
+from .memo import Memoizer
+
+
+class _Return(Exception):
+    def __init__(self, value: int):
+        super().__init__()
+        self.value = value
+
+
+class TreeWalker:
+    """Straightforward interpreter evaluating the AST directly.
+
+    It serves as the reference implementation and baseline for the faster
+    execution engines. With a step limit, each run() executes at most that
+    many statements, and raises StepLimitError otherwise.
+    """
+
+    def __init__(self, program_node: ast.ProgramNode, memoizer: Optional[Memoizer] = None,
+                 max_steps: Optional[int] = None):
+        self.__functions: Dict[str, ast.FunDefNode] = {func.name: func
+                                                       for func in program_node.functions}
+        self.__memoizer = memoizer
+        if memoizer:
+            memoizer.memoize(PurityAnalyzer().analyze(program_node))
+        self.__max_steps = max_steps
+        self.__steps = 0
+
+    def run(self, name: str = "main", arguments: List[int] = None) -> int:
+        if name not in self.__functions:
+            raise InterpreterError(f"Unknown function {name}")
+        self.__steps = 0
+        return self.__invoke(name, arguments or [])
+
+    def __invoke(self, name: str, arguments: List[int]) -> int:
+        cache = self.__memoizer.cache(name) if self.__memoizer else None
+        if cache is None:
+            return self.__call(name, arguments)
+        key = tuple(arguments)
+        result = cache.get(key)
+        if result is None:
+            result = self.__call(name, arguments)
+            cache.put(key, result)
+        return result
+
+    def __call(self, name: str, arguments: List[int]) -> int:
+        function_node = self.__functions[name]
+        variables = dict(zip(function_node.arguments, arguments))
+        try:
+            self.__execute_block(function_node.body, variables)
+        except _Return as ret:
+            return ret.value
+        return 0
+
+    def __execute_block(self, block_node: ast.BlockNode, variables: Dict[str, int]):
+        for stmt in block_node.statements:
+            self.__execute_statement(stmt, variables)
+
+    def __execute_statement(self, stmt_node: ast.StmtNode, variables: Dict[str, int]):
+        if self.__max_steps is not None:
+            self.__steps += 1
+            if self.__steps > self.__max_steps:
+                raise StepLimitError(f"Exceeded the limit of {self.__max_steps} steps")
+        if isinstance(stmt_node, ast.ReturnStmtNode):
+            raise _Return(self.__evaluate(stmt_node.expr, variables))
+        elif isinstance(stmt_node, ast.ConditionNode):
+            for node in [stmt_node.if_statement] + stmt_node.elif_statements:
+                if self.__evaluate(node.condition_expr, variables):
+                    self.__execute_block(node.true_block, variables)
+                    return
+            if stmt_node.else_statement:
+                self.__execute_block(stmt_node.else_statement.false_block, variables)
+        elif isinstance(stmt_node, ast.WhileStmtNode):
+            while self.__evaluate(stmt_node.condition_expr, variables):
+                self.__execute_block(stmt_node.body, variables)
+        else:
+            self.__evaluate(stmt_node, variables)
+
+    def __evaluate(self, expr_node: ast.Node, variables: Dict[str, int]) -> int:
+        if isinstance(expr_node, ast.ConstantNode):
+            # Literals out of the range wrap around, as in the compiled code
+            return wrap_int32(expr_node.value)
+        if isinstance(expr_node, ast.VarNode):
+            return variables.get(expr_node.name, 0)
+        if isinstance(expr_node, ast.VarDeclNode):
+            value = self.__evaluate(expr_node.init_expr, variables)
+            variables[expr_node.name] = value
+            return value
+        if isinstance(expr_node, ast.UnaryOperatorNode):
+            value = self.__evaluate(expr_node.expr, variables)
+            if expr_node.type == ast.UnaryOperatorNode.Type.Negation:
+                return wrap_int32(-value)
+            if expr_node.type == ast.UnaryOperatorNode.Type.BitwiseComplement:
+                return ~value
+            return int(value == 0)
+        if isinstance(expr_node, ast.BinaryOperatorNode):
+            if expr_node.type == ast.BinaryOperatorNode.Type.Assignment:
+                value = self.__evaluate(expr_node.rhs_expr, variables)
+                variables[expr_node.lhs_expr.name] = value
+                return value
+            lhs = self.__evaluate(expr_node.lhs_expr, variables)
+            rhs = self.__evaluate(expr_node.rhs_expr, variables)
+            if expr_node.type == ast.BinaryOperatorNode.Type.Addition:
+                return wrap_int32(lhs + rhs)
+            if expr_node.type == ast.BinaryOperatorNode.Type.Subtraction:
+                return wrap_int32(lhs - rhs)
+            if expr_node.type == ast.BinaryOperatorNode.Type.Multiplication:
+                return wrap_int32(lhs * rhs)
+            return divide_int32(lhs, rhs)
+        if isinstance(expr_node, ast.LogicOperatorNode):
+            return self.__evaluate_logic(expr_node, variables)
+        if isinstance(expr_node, ast.TernaryOperatorNode):
+            if self.__evaluate(expr_node.condition_expr, variables):
+                return self.__evaluate(expr_node.true_expr, variables)
+            return self.__evaluate(expr_node.false_expr, variables)
+        if isinstance(expr_node, ast.FunCallNode):
+            arguments = [self.__evaluate(arg, variables) for arg in expr_node.arguments]
+            return self.__invoke(expr_node.name, arguments)
+
+        raise InterpreterError(f"Invalid expression {expr_node}")
+
+    def __evaluate_logic(self, expr_node: ast.LogicOperatorNode, variables: Dict[str, int]) -> int:
+        lhs = self.__evaluate(expr_node.lhs_expr, variables)
+        if expr_node.type == ast.LogicOperatorNode.Type.And:
+            return int(lhs != 0 and self.__evaluate(expr_node.rhs_expr, variables) != 0)
+        if expr_node.type == ast.LogicOperatorNode.Type.Or:
+            return int(lhs != 0 or self.__evaluate(expr_node.rhs_expr, variables) != 0)
+
+        rhs = self.__evaluate(expr_node.rhs_expr, variables)
+        if expr_node.type == ast.LogicOperatorNode.Type.LessThan:
+            return int(lhs < rhs)
+        if expr_node.type == ast.LogicOperatorNode.Type.LessThanOrEqual:
+            return int(lhs <= rhs)
+        if expr_node.type == ast.LogicOperatorNode.Type.Equals:
+            return int(lhs == rhs)
+        if expr_node.type == ast.LogicOperatorNode.Type.NotEquals:
+            return int(lhs != rhs)
+        if expr_node.type == ast.LogicOperatorNode.Type.GreaterThanOrEqual:
+            return int(lhs >= rhs)
+        return int(lhs > rhs)
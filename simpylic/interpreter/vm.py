@@ -0,0 +1,237 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import List, Optional, Sequence
+
+from .code import Op, CodeObject
+from .common import InterpreterError, StepLimitError, INT32_MIN, INT32_MAX, divide_int32
+from .memo import Memoizer
+
+
+class VirtualMachine:
+    """Stack based virtual machine executing the bytecode of BytecodeCompiler.
+
+    With max_steps, a run executing more jumps and calls than that raises
+    StepLimitError. Loops jump back and recursion calls, so that bounds the
+    running time of any program, while the other instructions are not
+    slowed down by counting them.
+    """
+
+    def __init__(self, functions: List[CodeObject], memoizer: Optional[Memoizer] = None,
+                 max_steps: Optional[int] = None):
+        self.__functions = functions
+        self.__max_steps = max_steps
+        self.__function_indexes = {func.name: index for index, func in enumerate(functions)}
+        if memoizer:
+            memoizer.memoize(func.name for func in functions if func.is_pure)
+        # Result caches of the pure functions, by function index
+        self.__caches = [memoizer.cache(func.name) if memoizer else None for func in functions]
+
+    def run(self, name: str = "main", arguments: Sequence[int] = ()) -> int:
+        return self.execute(self.__function_indexes[name], arguments)
+
+    def execute(self, function_index: int, arguments: Sequence[int] = ()) -> int:
+        # The opcodes and everything used by the dispatch loop are kept in local
+        # variables, which are much faster to access than globals or attributes.
+        load_const, load_local, store_local = int(Op.LoadConst), int(Op.LoadLocal), \
+            int(Op.StoreLocal)
+        pop_op, dup_op = int(Op.Pop), int(Op.Dup)
+        add_op, sub_op, mul_op, div_op = int(Op.Add), int(Op.Sub), int(Op.Mul), int(Op.Div)
+        neg_op, not_op, logical_not, to_bool = int(Op.Neg), int(Op.Not), int(Op.LogicalNot), \
+            int(Op.ToBool)
+        less, less_equal, equals, not_equals, greater_equal, greater = \
+            int(Op.LessThan), int(Op.LessThanOrEqual), int(Op.Equals), int(Op.NotEquals), \
+            int(Op.GreaterThanOrEqual), int(Op.GreaterThan)
+        jump, jump_if_false, jump_if_true = int(Op.Jump), int(Op.JumpIfFalse), \
+            int(Op.JumpIfTrue)
+        call, return_op = int(Op.Call), int(Op.Return)
+        load_local_const, add_const, increment_local = int(Op.LoadLocalConst), \
+            int(Op.AddConst), int(Op.IncrementLocal)
+        jump_if_not_equal, jump_if_not_less_local_const, jump_if_not_less_local_local = \
+            int(Op.JumpIfNotEqual), int(Op.JumpIfNotLessLocalConst), \
+            int(Op.JumpIfNotLessLocalLocal)
+        return_local = int(Op.ReturnLocal)
+        int_min, int_max = INT32_MIN, INT32_MAX
+        functions, caches = self.__functions, self.__caches
+        steps_left = self.__max_steps if self.__max_steps is not None else float('inf')
+
+        function = functions[function_index]
+        code, constants = function.code, function.constants
+        local = [0] * function.slot_count
+        for slot, value in zip(function.argument_slots, arguments):
+            local[slot] = value
+
+        stack: List[int] = []
+        push, pop = stack.append, stack.pop
+        frames = []
+        pc = 0
+        while True:
+            op = code[pc]
+            if op == jump_if_not_less_local_const:
+                if local[code[pc + 1]] < constants[code[pc + 2]]:
+                    pc += 4
+                else:
+                    pc = code[pc + 3]
+            elif op == increment_local:
+                slot = code[pc + 1]
+                value = local[slot] + constants[code[pc + 2]]
+                if not int_min <= value <= int_max:
+                    value = ((value - int_min) & 0xFFFFFFFF) + int_min
+                local[slot] = value
+                pc += 3
+            elif op == load_local_const:
+                push(local[code[pc + 1]])
+                push(constants[code[pc + 2]])
+                pc += 3
+            elif op == add_const:
+                value = pop() + constants[code[pc + 1]]
+                if not int_min <= value <= int_max:
+                    value = ((value - int_min) & 0xFFFFFFFF) + int_min
+                push(value)
+                pc += 2
+            elif op == jump_if_not_less_local_local:
+                if local[code[pc + 1]] < local[code[pc + 2]]:
+                    pc += 4
+                else:
+                    pc = code[pc + 3]
+            elif op == jump_if_not_equal:
+                rhs = pop()
+                pc = pc + 2 if pop() == rhs else code[pc + 1]
+            elif op == load_local:
+                push(local[code[pc + 1]])
+                pc += 2
+            elif op == load_const:
+                push(constants[code[pc + 1]])
+                pc += 2
+            elif op == store_local:
+                local[code[pc + 1]] = pop()
+                pc += 2
+            elif op == jump_if_false:
+                pc = code[pc + 1] if not pop() else pc + 2
+            elif op == jump:
+                pc = code[pc + 1]
+                steps_left -= 1
+                if steps_left < 0:
+                    raise StepLimitError(f"Exceeded the limit of {self.__max_steps} steps")
+            elif op == add_op:
+                rhs = pop()
+                value = pop() + rhs
+                if not int_min <= value <= int_max:
+                    value = ((value - int_min) & 0xFFFFFFFF) + int_min
+                push(value)
+                pc += 1
+            elif op == less:
+                rhs = pop()
+                push(1 if pop() < rhs else 0)
+                pc += 1
+            elif op == sub_op:
+                rhs = pop()
+                value = pop() - rhs
+                if not int_min <= value <= int_max:
+                    value = ((value - int_min) & 0xFFFFFFFF) + int_min
+                push(value)
+                pc += 1
+            elif op == mul_op:
+                rhs = pop()
+                value = pop() * rhs
+                if not int_min <= value <= int_max:
+                    value = ((value - int_min) & 0xFFFFFFFF) + int_min
+                push(value)
+                pc += 1
+            elif op == call:
+                steps_left -= 1
+                if steps_left < 0:
+                    raise StepLimitError(f"Exceeded the limit of {self.__max_steps} steps")
+                callee_index = code[pc + 1]
+                callee = functions[callee_index]
+                cache = caches[callee_index]
+                memo = None
+                if cache is not None:
+                    key = tuple(stack[len(stack) - len(callee.argument_slots):])
+                    value = cache.get(key)
+                    if value is not None:
+                        del stack[len(stack) - len(callee.argument_slots):]
+                        push(value)
+                        pc += 2
+                        continue
+                    memo = (cache, key)
+                callee_local = [0] * callee.slot_count
+                for slot in reversed(callee.argument_slots):
+                    callee_local[slot] = pop()
+                frames.append((code, constants, local, pc + 2, memo))
+                code, constants, local, pc = callee.code, callee.constants, callee_local, 0
+            elif op == return_op:
+                if not frames:
+                    return pop()
+                code, constants, local, pc, memo = frames.pop()
+                if memo is not None:
+                    memo[0].put(memo[1], stack[-1])
+            elif op == return_local:
+                value = local[code[pc + 1]]
+                if not frames:
+                    return value
+                push(value)
+                code, constants, local, pc, memo = frames.pop()
+                if memo is not None:
+                    memo[0].put(memo[1], value)
+            elif op == less_equal:
+                rhs = pop()
+                push(1 if pop() <= rhs else 0)
+                pc += 1
+            elif op == greater:
+                rhs = pop()
+                push(1 if pop() > rhs else 0)
+                pc += 1
+            elif op == greater_equal:
+                rhs = pop()
+                push(1 if pop() >= rhs else 0)
+                pc += 1
+            elif op == equals:
+                rhs = pop()
+                push(1 if pop() == rhs else 0)
+                pc += 1
+            elif op == not_equals:
+                rhs = pop()
+                push(1 if pop() != rhs else 0)
+                pc += 1
+            elif op == div_op:
+                rhs = pop()
+                push(divide_int32(pop(), rhs))
+                pc += 1
+            elif op == jump_if_true:
+                pc = code[pc + 1] if pop() else pc + 2
+            elif op == pop_op:
+                pop()
+                pc += 1
+            elif op == dup_op:
+                push(stack[-1])
+                pc += 1
+            elif op == neg_op:
+                value = -pop()
+                push(int_min if value > int_max else value)
+                pc += 1
+            elif op == not_op:
+                push(~pop())
+                pc += 1
+            elif op == logical_not:
+                push(0 if pop() else 1)
+                pc += 1
+            elif op == to_bool:
+                push(1 if pop() else 0)
+                pc += 1
+            else:
+                raise InterpreterError(f"Invalid opcode {op} in {code}")
@@ -0,0 +1,83 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import ctypes
+import mmap
+import platform
+from typing import Callable, Dict
+
+from . import ast
+from .compiler import AsmGenerator
+from .x86_encoder import X86Encoder
+
+
+class JitError(Exception):
+    pass
+
+
+class JitProgram:
+    """Program compiled into executable memory of the current process.
+
+    The functions are called directly through ctypes, so running a program
+    does not involve any assembler, linker or a new process. The code is
+    written into a read-write mapping, which is then made read-only and
+    executable, so that the memory is never writable and executable at once.
+    """
+
+    def __init__(self, program_node: ast.ProgramNode):
+        if not JitProgram.is_supported():
+            raise JitError(f"JIT compilation is not supported on {platform.machine()}")
+
+        generator = AsmGenerator(None)
+        generator.generate(program_node)
+        code, self.__labels = X86Encoder().encode(generator.emitter.instructions)
+
+        size = max(len(code), 1)
+        self.__memory = mmap.mmap(-1, size, flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS,
+                                  prot=mmap.PROT_READ | mmap.PROT_WRITE)
+        self.__memory.write(code)
+        self.__address = ctypes.addressof(ctypes.c_char.from_buffer(self.__memory))
+        JitProgram.__protect(self.__address, size)
+        self.__arguments: Dict[str, int] = {func.name: len(func.arguments)
+                                            for func in program_node.functions}
+        self.__functions: Dict[str, Callable[..., int]] = {}
+
+    @staticmethod
+    def is_supported() -> bool:
+        return platform.machine().lower() in ('x86_64', 'amd64') and hasattr(mmap, 'PROT_EXEC')
+
+    @staticmethod
+    def __protect(address: int, size: int):
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.mprotect.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+        if libc.mprotect(address, size, mmap.PROT_READ | mmap.PROT_EXEC) != 0:
+            raise JitError(f"Cannot make the code executable: errno {ctypes.get_errno()}")
+
+    def function(self, name: str) -> Callable[..., int]:
+        """Returns the function, which keeps the memory of the program alive."""
+        if name not in self.__functions:
+            if name not in self.__arguments:
+                raise JitError(f"Unknown function {name}")
+            prototype = ctypes.CFUNCTYPE(ctypes.c_int32,
+                                         *[ctypes.c_int32] * self.__arguments[name])
+            function = prototype(self.__address + self.__labels[name])
+            function.program = self
+            self.__functions[name] = function
+        return self.__functions[name]
+
+    def run(self) -> int:
+        return self.function("main")()
@@ -0,0 +1,85 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, TextIO
+
+from . import ast
+from .compiler import AsmGenerator
+from .function_cache import FunctionCache
+
+
+def serialize_function(function_node: ast.FunDefNode) -> bytes:
+    """Pickles the function's subtree alone, without the rest of the program."""
+    parent = function_node.parent
+    function_node._set_parent(None)  # pylint: disable=protected-access
+    try:
+        return pickle.dumps(function_node, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        function_node._set_parent(parent)  # pylint: disable=protected-access
+
+
+def generate_function(data: bytes) -> str:
+    """Generates assembly of a serialized function, in a worker process."""
+    generator = AsmGenerator(None)
+    generator.emit_function_asm(pickle.loads(data))
+    return generator.emitter.render()
+
+
+class ParallelAsmGenerator:
+    """Generates assembly of the program's functions on a pool of processes.
+
+    After the preprocessing, every function is independent for code
+    generation, and labels are unique per function, so the functions are
+    serialized and generated by the workers, and the results are written in
+    the order of the program. The output is identical to AsmGenerator's.
+    Functions found in the optional cache are not sent to the workers.
+    """
+
+    def __init__(self, output: TextIO, jobs: int, freestanding: bool = False,
+                 cache: Optional[FunctionCache] = None):
+        self.__output = output
+        self.__jobs = jobs
+        self.__freestanding = freestanding
+        self.__cache = cache
+
+    def generate(self, program_node: ast.ProgramNode):
+        header = AsmGenerator(None, self.__freestanding)
+        header.emit_header_asm()
+        self.__output.write(header.emitter.render())
+
+        functions = list(program_node.functions)
+        keys = [FunctionCache.key(func, ["asm"]) for func in functions] if self.__cache else []
+        codes: List[Optional[str]] = [self.__cache.load(key) for key in keys] if self.__cache \
+            else [None] * len(functions)
+
+        missing = [index for index, code in enumerate(codes) if code is None]
+        if missing:
+            jobs = [serialize_function(functions[index]) for index in missing]
+            chunk_size = max(1, len(jobs) // (self.__jobs * 4))
+            with ProcessPoolExecutor(max_workers=self.__jobs) as executor:
+                for index, code in zip(missing, executor.map(generate_function, jobs,
+                                                             chunksize=chunk_size)):
+                    codes[index] = code
+                    if self.__cache:
+                        self.__cache.store(keys[index], code)
+
+        for code in codes:
+            self.__output.write(code)
+        if self.__cache:
+            self.__cache.trim()
@@ -0,0 +1,90 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import mmap
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from .tokenizer import Tokenizer, TokenizerError, TokenBuffer
+
+
+def tokenize_chunk(chunk: Tuple[str, int, int, int]) -> TokenBuffer:
+    """Tokenizes the lines between the start and the end offset of the file, in a
+    worker process. The lines are numbered from the given first line."""
+    path, start, end, first_line = chunk
+    with open(path, 'rb') as infile, \
+            mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end]
+    try:
+        tokens = Tokenizer(text).tokenize_buffer()
+    except TokenizerError as error:
+        raise TokenizerError(error.what, error.line + first_line - 1, error.pos) from None
+    if first_line > 1:
+        tokens.lines = array('I', (line + first_line - 1 for line in tokens.lines))
+    return tokens
+
+
+class ParallelTokenizer:
+    """Tokenizes a large file on a pool of processes.
+
+    No token spans lines, and a line always starts at its first column, so
+    the file is split into chunks of whole lines, which are tokenized
+    independently. Only the line numbers of the tokens have to be shifted
+    by the lines of the preceding chunks. Files smaller than a chunk are
+    tokenized in this process.
+    """
+
+    def __init__(self, path: str, jobs: int, chunk_size: int = 4 * 1024 * 1024):
+        self.__path = path
+        self.__jobs = jobs
+        self.__chunk_size = chunk_size
+
+    def chunks(self) -> List[Tuple[str, int, int, int]]:
+        """Splits the file at line boundaries, returns the offsets and the first line of
+        each chunk."""
+        chunks = []
+        with open(self.__path, 'rb') as infile:
+            size = os.fstat(infile.fileno()).st_size
+            if size == 0:
+                return []
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = 0
+                line = 1
+                while start < size:
+                    end = data.find(b'\n', min(start + self.__chunk_size, size) - 1) + 1
+                    if end == 0:
+                        end = size
+                    chunks.append((self.__path, start, end, line))
+                    line += data[start:end].count(b'\n')
+                    start = end
+        return chunks
+
+    def tokenize(self) -> TokenBuffer:
+        chunks = self.chunks()
+        tokens = TokenBuffer()
+        if len(chunks) <= 1 or self.__jobs <= 1:
+            for chunk in chunks:
+                tokens.extend(tokenize_chunk(chunk))
+            return tokens
+
+        # The compact buffers are cheap to pass between the processes
+        with ProcessPoolExecutor(max_workers=self.__jobs) as executor:
+            for chunk_tokens in executor.map(tokenize_chunk, chunks):
+                tokens.extend(chunk_tokens)
+        return tokens
@@ -15,7 +15,8 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from typing import List, Optional, cast
+from collections import deque
+from typing import AbstractSet, Deque, Iterable, Iterator, List, Optional, Set, cast
 
 from . import ast
 from .tokenizer import TokenType, Token
@@ -25,25 +26,90 @@ class ParserError(Exception):
     pass
 
 
+class TokenStream:
+    """Tokens pulled from an iterable on demand.
+
+    Supports the operations the parser does on a list of tokens: looking at
+    the next tokens with [], popping the first one with pop(0) (in constant
+    time) and testing whether any tokens are left.
+    """
+
+    def __init__(self, tokens: Iterable[Token]):
+        self.__tokens = iter(tokens)
+        self.__lookahead: Deque[Token] = deque()
+
+    def __fill(self, count: int) -> bool:
+        while len(self.__lookahead) < count:
+            token = next(self.__tokens, None)
+            if token is None:
+                return False
+            self.__lookahead.append(token)
+        return True
+
+    def __bool__(self):
+        return self.__fill(1)
+
+    def __getitem__(self, index: int) -> Token:
+        if not self.__fill(index + 1):
+            raise IndexError("No more tokens")
+        return self.__lookahead[index]
+
+    def pop(self, index: int = 0) -> Token:
+        assert index == 0
+        if not self.__fill(1):
+            raise IndexError("No more tokens")
+        return self.__lookahead.popleft()
+
+
 class Parser:
-    def __init__(self):
-        self.__variables = []
-        self.__functions = []
+    def __init__(self, known_variables: AbstractSet[str] = frozenset(),
+                 known_functions: AbstractSet[str] = frozenset()):
+        """Names of the variables and functions defined before the tokens to parse can be
+        given, e.g. when parsing a part of a program."""
+        self.__known_variables = known_variables
+        self.__known_functions = known_functions
+        self.__variables: Set[str] = set()
+        self.__functions: Set[str] = set()
         self.__indentation_level = 0
         self.__line_indentation = 0
 
-    def parse(self, tokens: List[Token]) -> ast.ProgramNode:
+    @property
+    def variables(self) -> Set[str]:
+        """Names of the variables defined by the parsed tokens."""
+        return self.__variables
+
+    @property
+    def functions(self) -> Set[str]:
+        """Names of the functions defined by the parsed tokens."""
+        return self.__functions
+
+    def __is_variable(self, name: str) -> bool:
+        return name in self.__variables or name in self.__known_variables
+
+    def parse(self, tokens: Iterable[Token]) -> ast.ProgramNode:
         root = ast.ProgramNode()
         main = ast.FunDefNode("main", arguments=[])
         main.body = ast.ScopeNode()
         root.add_function(main)
 
+        for stmt_node in self.parse_statements(tokens):
+            main.body.add_statement(stmt_node)
+
+        return root
+
+    def parse_statements(self, tokens: Iterable[Token]) -> Iterator[ast.StmtNode]:
+        """Yields the top-level statements (including function definitions) one by one,
+        reading only as many tokens as each of them needs."""
+        tokens = TokenStream(tokens)
         while tokens:
+            if tokens[0].type == TokenType.Whitespace:
+                indentation = tokens.pop(0)
+                if tokens and tokens[0].type != TokenType.NewLine:
+                    raise ParserError(f'Unexpected indentation on line {indentation.line}.')
+                continue
             stmt_node = self.__parse_statement(tokens)
             if stmt_node:
-                main.body.add_statement(cast(ast.StmtNode, stmt_node))
-
-        return root
+                yield cast(ast.StmtNode, stmt_node)
 
     def __pop_newlines(self, tokens: List[Token]):
         while tokens and tokens[0].type == TokenType.NewLine:
@@ -98,16 +164,17 @@ class Parser:
 
         assert tokens[0].type == TokenType.Identifier
         name_token = tokens.pop(0)
-        self.__functions.append(name_token.text)
+        self.__functions.add(name_token.text)
 
         assert tokens[0].type == TokenType.LeftParenthesis
         tokens.pop(0)
 
         arguments = []
         while tokens and tokens[0].type != TokenType.RightParenthesis:
+            assert tokens[0].type == TokenType.Identifier
             arguments.append(tokens.pop(0).text)
-            assert tokens[0].type == TokenType.Comma
-            tokens.pop(0)  # pop the comma
+            if tokens and tokens[0].type == TokenType.Comma:
+                tokens.pop(0)  # pop the comma
 
         assert tokens and tokens[0].type == TokenType.RightParenthesis
         tokens.pop(0)  # pop the parenthesis
@@ -118,7 +185,11 @@ class Parser:
         tokens.pop(0)  # pop the colon
         self.__pop_newlines(tokens)
 
+        # The arguments, and the variables of the body, are known in the body only
+        variables = set(self.__variables)
+        self.__variables.update(arguments)
         node.body = self.__parse_block(tokens, creates_scope=True)
+        self.__variables = variables
 
         return node
 
@@ -187,6 +258,8 @@ class Parser:
         condition_node.if_statement = parse_if(self, tokens)
         while True:
             self.__pop_newlines(tokens)
+            if not tokens:
+                break
             if tokens[0].type == TokenType.KeywordElif and self.__line_indentation == indentation:
                 condition_node.add_elif_statement(parse_elif(self, tokens))
             elif tokens[0].type == TokenType.KeywordElse and self.__line_indentation == indentation:
@@ -198,18 +271,19 @@ class Parser:
         return condition_node
 
     def __parse_parenthesized_subexpression(self, tokens: List[Token],
-                                            expression_stack: List[ast.ExprNode]):
+                                            expression_stack: List[ast.ExprNode]) -> Token:
         assert tokens[0].type == TokenType.LeftParenthesis
         tokens.pop(0)  # pop the left parenthesis
         depth = 1
         subtokens = []
+        closing_token = None
         while tokens:
             if tokens[0].type == TokenType.LeftParenthesis:
                 depth += 1
             elif tokens[0].type == TokenType.RightParenthesis:
                 depth -= 1
                 if depth == 0:
-                    tokens.pop(0)  # pop the final closing parenthesis
+                    closing_token = tokens.pop(0)  # pop the final closing parenthesis
                     break
 
             subtokens.append(tokens.pop(0))
@@ -220,6 +294,8 @@ class Parser:
 
         self.__parse_expression(subtokens, expression_stack)
 
+        return closing_token
+
     @staticmethod
     def __parse_literal(tokens: List[Token], expression_stack: List[ast.ExprNode]) -> Token:
         token = tokens.pop(0)
@@ -257,12 +333,12 @@ class Parser:
 
         def parse_assignment(self, var_token: Token, tokens: List[Token],
                              expression_stack: List[ast.ExprNode]) -> ast.ExprNode:
-            if var_token.text not in self.__variables:
+            if not self.__is_variable(var_token.text):
                 node = ast.VarDeclNode(name=var_token.text)
                 tokens.pop(0)  # eat the '=' operator
                 self.__parse_expression(tokens, expression_stack)
                 node.init_expr = expression_stack.pop()
-                self.__variables.append(var_token.text)
+                self.__variables.add(var_token.text)
             else:
                 node = ast.VarNode(name=var_token.text)
 
@@ -270,7 +346,8 @@ class Parser:
 
         def parse_function_call(self, name_token: Token, tokens: List[Token],
                                 expression_stack: List[ast.ExprNode]) -> ast.FunCallNode:
-            if name_token.text not in self.__functions:
+            if name_token.text not in self.__functions \
+                    and name_token.text not in self.__known_functions:
                 raise ParserError(f"Call to an unknown function {name_token.text} on "
                                   "line {name_token.line}, char {name_token.pos}")
 
@@ -283,8 +360,8 @@ class Parser:
                 self.__parse_expression(tokens, expression_stack)
                 node.add_argument(expression_stack.pop())
 
-                assert tokens[0].type == TokenType.Comma
-                tokens.pop(0)  # pop the comma
+                if tokens and tokens[0].type == TokenType.Comma:
+                    tokens.pop(0)  # pop the comma
 
             assert tokens and tokens[0].type == TokenType.RightParenthesis
             tokens.pop(0)  # pop the right parenthesis
@@ -297,7 +374,7 @@ class Parser:
         elif tokens and tokens[0].type == TokenType.LeftParenthesis:
             node = parse_function_call(self, token, tokens, expression_stack)
         else:
-            if token.text not in self.__variables:
+            if not self.__is_variable(token.text):
                 raise ParserError(f"Undefined variable {token.text}")
 
             node = ast.VarNode(name=token.text)
@@ -373,15 +450,17 @@ class Parser:
 
     def __parse_expression(self, tokens: List[Token], expression_stack: List[ast.ExprNode],
                            operator: Token = None) -> None:
+        token = None
         # Must be a literal or an unary operator
         if tokens[0].type == TokenType.LeftParenthesis:
-            self.__parse_parenthesized_subexpression(tokens, expression_stack)
+            token = self.__parse_parenthesized_subexpression(tokens, expression_stack)
 
-        token = None
+        # A minus following an operand is a subtraction, not a negation
+        operands = (TokenType.Literal, TokenType.Identifier, TokenType.RightParenthesis)
         terminals = (TokenType.NewLine, TokenType.Colon, TokenType.Comma,
                      TokenType.RightParenthesis)
         while tokens and tokens[0].type not in terminals:
-            if (not token or token.type != TokenType.Literal) \
+            if (not token or token.type not in operands) \
                     and tokens[0].type.is_unary_operator():
                 token = self.__parse_bound_unary_operator(tokens, expression_stack)
             elif tokens[0].type == TokenType.Literal:
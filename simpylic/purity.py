@@ -0,0 +1,66 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from typing import Dict, Set
+
+from . import ast
+
+
+class PurityAnalyzer:
+    """Finds functions whose result depends on nothing but their arguments.
+
+    Simpylic functions compute over integers only, so a function is pure
+    unless it reads a variable that is neither its argument nor assigned
+    in it (i.e. a variable of another scope), or calls a function that is
+    impure or unknown. Calls are resolved optimistically, so recursive
+    functions are pure unless they are impure for another reason.
+    """
+
+    def analyze(self, program_node: ast.ProgramNode) -> Set[str]:
+        callees: Dict[str, Set[str]] = {}
+        pure: Set[str] = set()
+        for function_node in program_node.functions:
+            reads: Set[str] = set()
+            local: Set[str] = set(function_node.arguments)
+            calls: Set[str] = set()
+            PurityAnalyzer.__collect(function_node.body, reads, local, calls)
+            if reads <= local:
+                pure.add(function_node.name)
+                callees[function_node.name] = calls
+
+        changed = True
+        while changed:
+            changed = False
+            for name in list(pure):
+                if not callees[name] <= pure:
+                    pure.discard(name)
+                    changed = True
+        return pure
+
+    @staticmethod
+    def __collect(node: ast.Node, reads: Set[str], local: Set[str], calls: Set[str]):
+        if isinstance(node, ast.VarNode):
+            reads.add(node.name)
+        elif isinstance(node, ast.VarDeclNode):
+            local.add(node.name)
+        elif isinstance(node, ast.BinaryOperatorNode) \
+                and node.type == ast.BinaryOperatorNode.Type.Assignment:
+            local.add(node.lhs_expr.name)
+        elif isinstance(node, ast.FunCallNode):
+            calls.add(node.name)
+        for child in node.children:
+            PurityAnalyzer.__collect(child, reads, local, calls)
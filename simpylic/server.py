@@ -0,0 +1,219 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from typing import Dict, Optional, Tuple, Union
+
+from . import cli
+from .client import encode_message, decode_message
+from .function_cache import FunctionCache
+from .interpreter import LruCache
+from .simpylic import Engine
+
+
+class WarmFunctionCache:
+    """Keeps the generated code of functions in memory, in front of the FunctionCache.
+
+    Shared by all requests of the server, so functions compiled by any
+    client earlier are neither regenerated nor read from the disk again.
+    """
+
+    def __init__(self, disk_cache: FunctionCache, max_entries: int = 65536):
+        self.__disk_cache = disk_cache
+        self.__memory = LruCache(max_entries)
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def evictions(self) -> int:
+        return self.__disk_cache.evictions
+
+    def report(self) -> str:
+        return f"function cache: {self.hits} hits ({self.__memory.hits} in memory), " \
+               f"{self.misses} misses, {self.evictions} evictions"
+
+    def load(self, key: str) -> Optional[str]:
+        with self.__lock:
+            code = self.__memory.get(key)
+            if code is None:
+                code = self.__disk_cache.load(key)
+                if code is not None:
+                    self.__memory.put(key, code)
+            if code is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return code
+
+    def store(self, key: str, code: str):
+        with self.__lock:
+            self.__memory.put(key, code)
+            self.__disk_cache.store(key, code)
+
+    def trim(self):
+        with self.__lock:
+            self.__disk_cache.trim()
+
+
+class CompileServer:
+    """Serves compilation requests of the clients on a Unix domain socket.
+
+    A request carries the command line arguments of main.py and the working
+    directory of the client, the files are read and written by the server.
+    The response carries the exit status, the standard output encoded in
+    base64 and the text printed to the standard error.
+    The requests are processed on a pool of worker threads, the function
+    caches are kept warm in memory between them. Native code is never run
+    in the server, as a crash of it would take down all the requests: the
+    programs are interpreted by the bytecode virtual machine, not the jit.
+    The interpreted programs are stopped after max_steps, so that a program
+    which never ends does not hold a worker forever.
+    """
+
+    # Engines which can stop a program after a number of steps
+    engines = (Engine.Bytecode.value, Engine.TreeWalker.value)
+
+    def __init__(self, socket_path: str, workers: int = 4, max_steps: int = 10 ** 7):
+        self.__socket_path = socket_path
+        self.__max_steps = max_steps
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__server: Optional[asyncio.AbstractServer] = None
+        self.__caches: Dict[Tuple[str, int], WarmFunctionCache] = {}
+        self.__caches_lock = threading.Lock()
+        # Redirections of sys.stdout and sys.stderr are global
+        self.__stdio_lock = threading.Lock()
+
+    async def start(self):
+        directory = os.path.dirname(self.__socket_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.__socket_path)
+        self.__server = await asyncio.start_unix_server(self.__handle_client,
+                                                        path=self.__socket_path)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.__server:
+            self.__server.close()
+            await self.__server.wait_closed()
+            self.__server = None
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.__socket_path)
+        self.__executor.shutdown(wait=False)
+
+    async def __handle_client(self, reader: asyncio.StreamReader,
+                              writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await loop.run_in_executor(self.__executor, self.process,
+                                                      decode_message(line))
+                writer.write(encode_message(response))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def __function_cache(self, args: argparse.Namespace) -> Optional[WarmFunctionCache]:
+        if not args.cache_dir:
+            return None
+        with self.__caches_lock:
+            key = (args.cache_dir, args.cache_size)
+            if key not in self.__caches:
+                self.__caches[key] = WarmFunctionCache(cli.create_function_cache(args))
+            return self.__caches[key]
+
+    def __parse_arguments(self, argv, cwd: str, errfile: StringIO) -> argparse.Namespace:
+        # argparse prints the usage and the help into the standard streams
+        with self.__stdio_lock, contextlib.redirect_stdout(errfile), \
+                contextlib.redirect_stderr(errfile):
+            parser = cli.create_argument_parser('client.py')
+            args = cli.parse_arguments(parser, argv)
+            if args.watch:
+                parser.error('--watch cannot be used with the server')
+            if args.engine and args.engine not in CompileServer.engines:
+                parser.error(f'only the {" and ".join(CompileServer.engines)} engines can be '
+                             'used with the server')
+        if args.interpret and not args.engine:
+            args.engine = Engine.Bytecode.value
+        if args.interpret:
+            args.max_steps = min(args.max_steps or self.__max_steps, self.__max_steps)
+        args.file = os.path.join(cwd, args.file)
+        if args.output and args.output != '-':
+            args.output = os.path.join(cwd, args.output)
+        if args.cache_dir:
+            args.cache_dir = os.path.join(cwd, args.cache_dir)
+        return args
+
+    def __execute(self, args: argparse.Namespace, outfile: Union[StringIO, BytesIO],
+                  errfile: StringIO):
+        function_cache = self.__function_cache(args)
+        with open(args.file, 'r', encoding='utf-8') as srcfile:
+            if args.dump_ast or args.dump_tokens:
+                # The dumps print into sys.stdout
+                with self.__stdio_lock, contextlib.redirect_stdout(outfile):
+                    cli.execute(args, srcfile, outfile, errfile, function_cache)
+            else:
+                cli.execute(args, srcfile, outfile, errfile, function_cache)
+
+    def process(self, request: dict) -> dict:
+        """Runs main.py with the arguments of the request."""
+        errfile = StringIO()
+        stdout = b''
+        try:
+            args = self.__parse_arguments(request['argv'], request['cwd'], errfile)
+            if not args.output or args.output == '-':
+                outfile = BytesIO() if args.compile_executable else StringIO()
+                self.__execute(args, outfile, errfile)
+                stdout = outfile.getvalue()
+                if isinstance(stdout, str):
+                    stdout = stdout.encode('utf-8')
+            else:
+                outfile = open(args.output, 'wb') if args.compile_executable \
+                    else open(args.output, 'w', encoding='utf-8')
+                with outfile:
+                    self.__execute(args, outfile, errfile)
+                if args.compile_executable:
+                    os.chmod(args.output, 0o755)
+            status = 0
+        except SystemExit as error:
+            status = error.code if isinstance(error.code, int) else 1
+        except Exception:  # pylint: disable=broad-except
+            errfile.write(traceback.format_exc())
+            status = 1
+        return {'status': status, 'output': base64.b64encode(stdout).decode('ascii'),
+                'error': errfile.getvalue()}
@@ -15,32 +15,171 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import os
 from enum import Enum
-from typing import TextIO
+from io import StringIO
+from typing import TextIO, BinaryIO, Optional, Union
 
 from .tokenizer import Tokenizer
+from .parallel_tokenizer import ParallelTokenizer
 from .parser import Parser
 from .compiler import AsmGenerator
+from .function_cache import FunctionCache, CachingAsmGenerator
+from .parallel_generator import ParallelAsmGenerator
+from .c_generator import CGenerator
+from .elf_writer import ElfGenerator
+from .jit import JitProgram, JitError
+from .interpreter import TreeWalker, BytecodeCompiler, VirtualMachine, ClosureProgram, \
+    PythonProgram, PythonCodeCache, BatchEvaluator, Memoizer, InterpreterError
+from .ast import ProgramNode, FunDefNode
 from .ast.ast import AstDumper
-from .ast_preprocessor import AstPreprocessor
+from .ast_preprocessor import AstPreprocessor, StreamingPreprocessor
+from .call_folder import CallFolder
 
 class Operation(Enum):
     Compile = 1
     Interpret = 2
     DumpAst = 3
     DumpTokens = 4
+    CompileExecutable = 5
+    CompileC = 6
 
-def run(srcfile: TextIO, outfile: TextIO, operation: Operation):
-    if operation == Operation.Interpret:
-        raise RuntimeError("Interpreter mode not yet implemeneted.")
+class Engine(Enum):
+    Jit = 'jit'
+    Bytecode = 'vm'
+    Closures = 'closure'
+    Python = 'python'
+    TreeWalker = 'ast'
 
-    tokens = Tokenizer(srcfile).tokenize()
+def interpret(program: ProgramNode, engine: Optional[Engine] = None,
+              superinstructions: bool = True, memoizer: Optional[Memoizer] = None,
+              max_steps: Optional[int] = None) -> int:
+    """Runs the preprocessed program and returns the return value of its main function.
+
+    By default the program is executed by the bytecode virtual machine. The
+    JIT is faster, but a division by zero in its native code kills the whole
+    process, where the other engines raise an InterpreterError, so it has to
+    be asked for. Fusing of superinstructions in the bytecode can be disabled
+    to measure their effect. With a memoizer, results of the pure functions
+    are cached; the native code of the JIT is never memoized. Only the vm and
+    the tree walker can stop a program after max_steps.
+    """
+    if engine is None:
+        engine = Engine.Bytecode
+
+    if max_steps is not None and engine not in (Engine.Bytecode, Engine.TreeWalker):
+        raise InterpreterError(f"The {engine.value} engine does not support a step limit")
+    if engine == Engine.Jit:
+        if memoizer is not None:
+            raise JitError("The jit engine does not support memoization")
+        return JitProgram(program).run()
+    if engine == Engine.Bytecode:
+        return VirtualMachine(BytecodeCompiler(superinstructions).compile(program),
+                              memoizer, max_steps).run()
+    if engine == Engine.Closures:
+        return ClosureProgram(program, memoizer).run()
+    if engine == Engine.Python:
+        return PythonProgram(PythonProgram.compile(program), memoizer).run()
+    return TreeWalker(program, memoizer, max_steps).run()
+
+def batch_eval(program: ProgramNode, func_name: str, args):
+    """Evaluates the function for every row of the args array using NumPy.
+
+    The program must be preprocessed. Returns an int32 array with the result
+    of each call. One vectorized pass over the AST replaces a call of the
+    function per row.
+    """
+    return BatchEvaluator(program).evaluate(func_name, args)
+
+def interpret_python(source: str, cache_dir: Optional[str] = None,
+                     memoizer: Optional[Memoizer] = None) -> int:
+    """Transpiles the program source into Python code and runs it.
+
+    With a cache directory, the compiled code object is stored there and later
+    runs of the same source skip the whole front end.
+    """
+    cache = PythonCodeCache(cache_dir) if cache_dir else None
+    code = cache.load(source) if cache else None
+    if code is None:
+        program = Parser().parse(Tokenizer(StringIO(source)).tokenize())
+        AstPreprocessor().process(program)
+        code = PythonProgram.compile(program)
+        if cache:
+            cache.store(source, code)
+    return PythonProgram(code, memoizer).run()
+
+def compile_streaming(srcfile: TextIO, outfile: TextIO, freestanding: bool = False,
+                      function_cache: Optional[FunctionCache] = None):
+    """Compiles the program into assembly while reading it.
+
+    The code of each function is written as soon as its definition is
+    parsed, the main function, made of the top-level statements, comes last.
+    Neither all the tokens nor the AST of the whole program are held at once.
+    Calls are not folded, as that needs the whole program.
+    """
+    generator = AsmGenerator(outfile, freestanding)
+    generator.emit_header_asm()
+    generator.emitter.flush()
+    caching_generator = CachingAsmGenerator(outfile, function_cache) if function_cache else None
+
+    def emit(function_node: FunDefNode):
+        if caching_generator:
+            caching_generator.generate_function(function_node)
+        else:
+            generator.emit_function_asm(function_node)
+            generator.emitter.flush()
+
+    preprocessor = StreamingPreprocessor()
+    for statement in Parser().parse_statements(Tokenizer(srcfile).tokens()):
+        for function_node in preprocessor.process(statement):
+            emit(function_node)
+    emit(preprocessor.main)
+    if function_cache:
+        function_cache.trim()
+
+def run(srcfile: TextIO, outfile: Union[TextIO, BinaryIO], operation: Operation,
+        engine: Optional[Engine] = None, superinstructions: bool = True,
+        cache_dir: Optional[str] = None, freestanding: bool = False,
+        memoizer: Optional[Memoizer] = None, fold_calls: bool = True,
+        function_cache: Optional[FunctionCache] = None, jobs: int = 1,
+        streaming: bool = False, max_steps: Optional[int] = None):
+    if streaming:
+        if operation != Operation.Compile:
+            raise ValueError("Only the compilation into assembly can be streamed")
+        compile_streaming(srcfile, outfile, freestanding, function_cache)
+        return
+    # With a step limit, interpret() rejects the engine
+    if operation == Operation.Interpret and engine == Engine.Python and max_steps is None:
+        print(interpret_python(srcfile.read(), cache_dir, memoizer), file=outfile)
+        return
+
+    # Files are scanned through a memory map rather than read as text
+    path = getattr(srcfile, 'name', None)
+    is_file = isinstance(path, str) and os.path.isfile(path)
+    if jobs > 1 and is_file:
+        tokens = ParallelTokenizer(path, jobs).tokenize()
+    else:
+        tokens = Tokenizer(path if is_file else srcfile).tokenize_buffer()
     if operation == Operation.DumpTokens:
         print(tokens)
     else:
         ast = Parser().parse(tokens)
         AstPreprocessor().process(ast)
+        if fold_calls and operation in (Operation.Compile, Operation.CompileC,
+                                        Operation.CompileExecutable):
+            CallFolder().fold(ast)
         if operation == Operation.DumpAst:
             AstDumper().dump(ast)
         elif operation == Operation.Compile:
-            AsmGenerator(outfile).generate(ast)
+            if jobs > 1:
+                ParallelAsmGenerator(outfile, jobs, freestanding, function_cache).generate(ast)
+            elif function_cache:
+                CachingAsmGenerator(outfile, function_cache, freestanding).generate(ast)
+            else:
+                AsmGenerator(outfile, freestanding).generate(ast)
+        elif operation == Operation.CompileC:
+            CGenerator(outfile).generate(ast)
+        elif operation == Operation.CompileExecutable:
+            ElfGenerator(outfile).generate(ast)
+        elif operation == Operation.Interpret:
+            print(interpret(ast, engine, superinstructions, memoizer, max_steps), file=outfile)
@@ -16,7 +16,12 @@
 """
 
 import itertools
-from typing import TextIO, List, Iterator
+import mmap
+import os
+import re
+from array import array
+from io import StringIO
+from typing import Dict, TextIO, List, Iterator, Tuple, Union
 from enum import Enum, auto
 
 
@@ -76,6 +81,13 @@ class TokenType(Enum):
         return self.value in TokenType.__ternary_operators.value
 
     def priority(self):
+        # The parser asks for the priority of every operator, compute it once per type
+        priority = _priorities.get(self)
+        if priority is None:
+            priority = _priorities[self] = self._compute_priority()
+        return priority
+
+    def _compute_priority(self):
         if self.is_unary_operator():
             return 100
         if self.is_logic_operator():
@@ -88,7 +100,15 @@ class TokenType(Enum):
         return 1
 
 
+_priorities: Dict[TokenType, int] = {}
+# The operator lists are members of TokenType too, leave them out
+_token_types = {token_type.value: token_type for token_type in TokenType
+                if isinstance(token_type.value, int)}
+
+
 class Token:
+    __slots__ = ('type', 'line', 'pos', 'text')
+
     def __init__(self, text: str, token_type: TokenType, line: int, pos: int):
         self.type = token_type
         self.line = line
@@ -106,6 +126,62 @@ class Token:
             and self.text == other.text
 
 
+class TokenBuffer:
+    """Tokens of a source stored as parallel arrays.
+
+    A token takes 13 bytes: its type, the id of its text, its line and its
+    position. The texts are interned in a table of the buffer, so tokens
+    with the same text share the id (and the str). Indexing and iterating
+    the buffer creates Token objects on demand.
+    """
+
+    __slots__ = ('types', 'text_ids', 'lines', 'positions', 'texts', '__ids')
+
+    def __init__(self):
+        self.types = array('B')
+        self.text_ids = array('I')
+        self.lines = array('I')
+        self.positions = array('I')
+        self.texts: List[str] = []
+        self.__ids: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Token:
+        return Token(self.texts[self.text_ids[index]], _token_types[self.types[index]],
+                     self.lines[index], self.positions[index])
+
+    def __iter__(self) -> Iterator[Token]:
+        texts = self.texts
+        for type_value, text_id, line, pos in zip(self.types, self.text_ids, self.lines,
+                                                  self.positions):
+            yield Token(texts[text_id], _token_types[type_value], line, pos)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def intern(self, text: str) -> int:
+        text_id = self.__ids.get(text)
+        if text_id is None:
+            text_id = self.__ids[text] = len(self.texts)
+            self.texts.append(text)
+        return text_id
+
+    def append(self, token: Token):
+        self.types.append(token.type.value)
+        self.text_ids.append(self.intern(token.text))
+        self.lines.append(token.line)
+        self.positions.append(token.pos)
+
+    def extend(self, other: 'TokenBuffer'):
+        text_ids = [self.intern(text) for text in other.texts]
+        self.types.extend(other.types)
+        self.text_ids.extend(text_ids[text_id] for text_id in other.text_ids)
+        self.lines.extend(other.lines)
+        self.positions.extend(other.positions)
+
+
 class TokenizerError(Exception):
     def __init__(self, what, line, pos):
         super().__init__(self, what)
@@ -116,6 +192,10 @@ class TokenizerError(Exception):
     def __str__(self):
         return f"{self.what} on line {self.line}:{self.pos}"
 
+    def __reduce__(self):
+        # The arguments contain the error itself, which cannot be pickled
+        return TokenizerError, (self.what, self.line, self.pos)
+
 
 class Tokenizer:
 
@@ -147,12 +227,24 @@ class Tokenizer:
                   'while': TokenType.KeywordWhile,
                   'def': TokenType.KeywordDef}
 
-    def __init__(self, source: TextIO):
+    # The bytes-level lexical grammar, with the same quirks as the scanning of
+    # characters: whitespace is a token only at the start of a line, and any
+    # run of operator characters following <, > or = is a single operator.
+    __pattern = re.compile(rb"(?P<whitespace>[ \t]+)|(?P<newline>\n)"
+                           rb"|(?P<word>[A-Za-z][A-Za-z0-9_]*)|(?P<literal>[0-9]+)"
+                           rb"|(?P<single>[-+*/~!()?])|(?P<long>[<>=][-+*/~!<>()=?]*)"
+                           rb"|(?P<colon>:)|(?P<comma>,)|(?P<invalid>.)", re.DOTALL)
+    __non_ascii = re.compile(rb"[\x80-\xff]")
+
+    def __init__(self, source: Union[TextIO, str, os.PathLike, bytes, bytearray, memoryview,
+                                     mmap.mmap]):
+        """The source is either a text stream, which is read as it is tokenized, or a
+        path of a file, which is memory-mapped, or a buffer of UTF-8 encoded source."""
         self.source = source
         self.__line = 1
         self.__pos = 1
         self.__token_text = ''
-        self.__tokens: List[str] = []
+        self.__tokens: List[Token] = []
 
     def __token_pos(self):
         return {'line': self.__line,
@@ -241,8 +333,106 @@ class Tokenizer:
 
         return char
 
-    def tokenize(self):
-        char_iter = itertools.chain.from_iterable(self.source)
+    def tokenize(self) -> List[Token]:
+        return list(self.tokens())
+
+    def tokens(self) -> Iterator[Token]:
+        """Yields the tokens. A text stream is read as the tokens are yielded, without
+        holding all of them."""
+        if isinstance(self.source, (str, os.PathLike, bytes, bytearray, memoryview, mmap.mmap)):
+            yield from self.tokenize_buffer()
+        else:
+            yield from self.__scan_stream(self.source)
+
+    def tokenize_buffer(self) -> TokenBuffer:
+        """Returns all the tokens, stored compactly in a TokenBuffer."""
+        buffer = TokenBuffer()
+        if isinstance(self.source, (str, os.PathLike)):
+            with open(self.source, 'rb') as infile:
+                if os.fstat(infile.fileno()).st_size > 0:
+                    with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        self.__scan_buffer(data, buffer)
+        elif isinstance(self.source, (bytes, bytearray, memoryview, mmap.mmap)):
+            self.__scan_buffer(self.source, buffer)
+        else:
+            for token in self.__scan_stream(self.source):
+                buffer.append(token)
+        return buffer
+
+    def __scan_buffer(self, data, buffer: TokenBuffer):
+        if Tokenizer.__non_ascii.search(data):
+            # Only ASCII is scanned as bytes, so that positions count characters
+            for token in self.__scan_stream(StringIO(bytes(data).decode('utf-8'))):
+                buffer.append(token)
+            return
+
+        # Ids of the texts and values of the types, by the bytes of the text
+        def constants(texts: Dict[str, TokenType]) -> Dict[bytes, Tuple[int, int]]:
+            return {text.encode('ascii'): (buffer.intern(text), token_type.value)
+                    for text, token_type in texts.items()}
+        single_operators = constants(Tokenizer.__single_operators)
+        long_operators = constants(Tokenizer.__long_operators)
+        keywords = constants(Tokenizer.__keywords)
+        newline, colon, comma = constants({'\n': TokenType.NewLine, ':': TokenType.Colon,
+                                           ',': TokenType.Comma}).values()
+        text_ids: Dict[bytes, int] = {}
+
+        append_type = buffer.types.append
+        append_text_id = buffer.text_ids.append
+        append_line = buffer.lines.append
+        append_pos = buffer.positions.append
+
+        def add(text_id: int, type_value: int, line: int, pos: int):
+            append_type(type_value)
+            append_text_id(text_id)
+            append_line(line)
+            append_pos(pos)
+
+        def text_id(text: bytes) -> int:
+            if text not in text_ids:
+                text_ids[text] = buffer.intern(text.decode('ascii'))
+            return text_ids[text]
+
+        line = 1
+        line_start = 0
+        for match in Tokenizer.__pattern.finditer(data):
+            kind = match.lastgroup
+            start = match.start()
+            pos = start - line_start + 1
+            if kind == 'word':
+                text = match.group()
+                keyword = keywords.get(text)
+                if keyword:
+                    add(keyword[0], keyword[1], line, pos)
+                else:
+                    add(text_id(text), TokenType.Identifier.value, line, pos)
+            elif kind == 'whitespace':
+                if pos == 1:
+                    add(text_id(match.group()), TokenType.Whitespace.value, line, pos)
+            elif kind == 'literal':
+                add(text_id(match.group()), TokenType.Literal.value, line, pos)
+            elif kind == 'single':
+                add(*single_operators[match.group()], line, pos)
+            elif kind == 'newline':
+                add(newline[0], newline[1], line, pos)
+                line += 1
+                line_start = start + 1
+            elif kind == 'long':
+                operator = long_operators.get(match.group())
+                if not operator:
+                    raise TokenizerError(f"Unknown operator '{match.group().decode('ascii')}'",
+                                         line, pos)
+                add(operator[0], operator[1], line, pos)
+            elif kind == 'colon':
+                add(colon[0], colon[1], line, pos)
+            elif kind == 'comma':
+                add(comma[0], comma[1], line, pos)
+            else:
+                raise TokenizerError(f"Invalid token '{match.group().decode('ascii')}'",
+                                     line, pos)
+
+    def __scan_stream(self, source: TextIO) -> Iterator[Token]:
+        char_iter = itertools.chain.from_iterable(source)
         char = next(char_iter, None)
         while char:
             if char in (' ', '\t'):
@@ -262,4 +452,5 @@ class Tokenizer:
             else:
                 raise TokenizerError(f"Invalid token '{char}'", **self.__token_pos())
 
-        return self.__tokens
+            yield from self.__tokens
+            self.__tokens.clear()
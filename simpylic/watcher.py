@@ -0,0 +1,251 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+from io import StringIO
+from typing import Dict, Optional, Set, TextIO, Tuple
+
+from .function_cache import FunctionCache
+from .incremental import IncrementalCompiler
+
+
+class Inotify:
+    """Wakes the watcher up on changes in directories, through the inotify API of libc.
+
+    Only the changes of files with the given extension, and of directories,
+    wake the watcher up, so that writing the outputs does not.
+    """
+
+    # IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    mask = 0x002 | 0x040 | 0x080 | 0x100 | 0x200
+    # IN_Q_OVERFLOW: events were lost
+    overflow = 0x4000
+    # IN_ISDIR: the event is about a directory
+    is_directory = 0x40000000
+    # struct inotify_event: wd, mask, cookie and len, followed by len bytes of name
+    event = struct.Struct('iIII')
+
+    def __init__(self, extension: str):
+        self.__extension = os.fsencode(extension)
+        self.__libc = ctypes.CDLL(None, use_errno=True)
+        self.__fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.__directories: Set[str] = set()
+
+    @staticmethod
+    def create(extension: str) -> Optional['Inotify']:
+        """Returns None where inotify is not available, the watcher polls then."""
+        try:
+            return Inotify(extension)
+        except (OSError, AttributeError):
+            return None
+
+    def add_directory(self, path: str):
+        if path not in self.__directories and \
+                self.__libc.inotify_add_watch(self.__fd, os.fsencode(path), Inotify.mask) >= 0:
+            self.__directories.add(path)
+
+    def wait(self, timeout: float) -> bool:
+        """Waits for changes up to the timeout, returns whether there were any."""
+        deadline = time.monotonic() + timeout
+        while True:
+            readable, _, _ = select.select([self.__fd], [], [],
+                                           max(deadline - time.monotonic(), 0))
+            if not readable:
+                return False
+            if self.__read_events():
+                return True
+
+    def close(self):
+        os.close(self.__fd)
+
+    def __read_events(self) -> bool:
+        """Reads the pending events, returns whether any of them is a change to watch.
+
+        The events only wake the watcher up, the changed files are found by scanning.
+        """
+        changed = False
+        try:
+            while True:
+                data = os.read(self.__fd, 65536)
+                if not data:
+                    break
+                offset = 0
+                while offset + Inotify.event.size <= len(data):
+                    _, mask, _, length = Inotify.event.unpack_from(data, offset)
+                    offset += Inotify.event.size
+                    name = data[offset:offset + length].rstrip(b'\0')
+                    offset += length
+                    if mask & (Inotify.overflow | Inotify.is_directory) or \
+                            name.endswith(self.__extension):
+                        changed = True
+        except BlockingIOError:
+            pass
+        return changed
+
+
+class Watcher:
+    """Watches a directory and compiles each source file into assembly whenever it changes.
+
+    The files are found by scanning the directory for the modification times
+    and sizes of the sources, either every poll interval, or when inotify
+    reports a change in the directory. Changes are collected until none
+    came for the debounce time (but at most for max_delay), and the changed
+    files are compiled in a batch. Every file has its IncrementalCompiler,
+    so only the functions affected by the changes are compiled again.
+    The assembly is written next to the source, or into the output directory.
+    """
+
+    extension = '.spy'
+
+    def __init__(self, directory: str, output_dir: Optional[str] = None,
+                 freestanding: bool = False, function_cache: Optional[FunctionCache] = None,
+                 debounce: float = 0.1, max_delay: float = 1.0, poll_interval: float = 0.5,
+                 use_inotify: bool = True, log: Optional[TextIO] = None):
+        self.__directory = directory
+        self.__output_dir = output_dir
+        self.__freestanding = freestanding
+        self.__function_cache = function_cache
+        self.__debounce = debounce
+        self.__max_delay = max_delay
+        self.__poll_interval = poll_interval
+        self.__inotify = Inotify.create(Watcher.extension) if use_inotify else None
+        self.__log = log
+        self.__stop = threading.Event()
+        self.__files: Dict[str, Tuple[int, int]] = {}
+        self.__compilers: Dict[str, IncrementalCompiler] = {}
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self.__inotify is not None
+
+    def output_path(self, source: str) -> str:
+        name = os.path.splitext(source)[0] + '.s'
+        if not self.__output_dir:
+            return name
+        return os.path.join(self.__output_dir, os.path.relpath(name, self.__directory))
+
+    def scan(self) -> Set[str]:
+        """Returns the sources added or changed since the last scan, the outputs of the
+        deleted sources are removed."""
+        files: Dict[str, Tuple[int, int]] = {}
+        for directory, _, names in os.walk(self.__directory):
+            if self.__inotify:
+                self.__inotify.add_directory(directory)
+            for name in names:
+                if not name.endswith(Watcher.extension):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+
+        changed = {path for path, state in files.items() if self.__files.get(path) != state}
+        for path in self.__files.keys() - files.keys():
+            self.__compilers.pop(path, None)
+            try:
+                os.remove(self.output_path(path))
+                self.__print(f"{path}: deleted, its output is removed")
+            except FileNotFoundError:
+                pass
+        self.__files = files
+        return changed
+
+    def build(self, sources: Set[str]):
+        for source in sorted(sources):
+            self.compile(source)
+
+    def compile(self, source: str) -> bool:
+        """Compiles the source into its output, the output is kept if the source has errors."""
+        start = time.perf_counter()
+        try:
+            with open(source, encoding='utf-8') as srcfile:
+                text = srcfile.read()
+        except (OSError, UnicodeDecodeError) as error:
+            self.__print(f"{source}: {error}")
+            return False
+
+        compiler = self.__compilers.get(source)
+        if compiler is None:
+            compiler = IncrementalCompiler(self.__freestanding, self.__function_cache)
+            self.__compilers[source] = compiler
+        assembly = StringIO()
+        if not compiler.compile(text, assembly):
+            for error in compiler.errors:
+                self.__print(f"{source}: {error}")
+            return False
+
+        output = self.output_path(source)
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        # Write to a temporary file first, so that the output is never seen partially written
+        temporary = f'{output}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as outfile:
+            outfile.write(assembly.getvalue())
+        os.replace(temporary, output)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.__print(f"{source}: {compiler.generated} of {compiler.functions} functions "
+                     f"compiled in {elapsed:.0f} ms")
+        return True
+
+    def watch(self):
+        """Compiles all the sources, then the changed ones, until stopped."""
+        self.__print(f"Watching {self.__directory} "
+                     f"({'inotify' if self.__inotify else 'polling'})")
+        self.build(self.scan())
+        while not self.__stop.is_set():
+            self.__wait(self.__poll_interval)
+            changed = self.scan()
+            if not changed:
+                continue
+            deadline = time.monotonic() + self.__max_delay
+            while not self.__stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.__wait(min(self.__debounce, remaining))
+                more = self.scan()
+                if not more:
+                    break
+                changed |= more
+            self.build(changed)
+
+    def stop(self):
+        self.__stop.set()
+
+    def close(self):
+        if self.__inotify:
+            self.__inotify.close()
+            self.__inotify = None
+
+    def __wait(self, timeout: float):
+        if self.__inotify:
+            self.__inotify.wait(timeout)
+        else:
+            self.__stop.wait(timeout)
+
+    def __print(self, message: str):
+        if self.__log:
+            print(message, file=self.__log, flush=True)
@@ -0,0 +1,233 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+import struct
+from typing import Dict, List, Tuple, Union
+
+from .instruction import Instruction, Opcode
+
+
+class X86EncoderError(Exception):
+    pass
+
+
+class Register:
+    __slots__ = ('number', 'size')
+
+    def __init__(self, number: int, size: int):
+        self.number = number
+        self.size = size
+
+
+class Memory:
+    __slots__ = ('base', 'displacement')
+
+    def __init__(self, base: int, displacement: int):
+        self.base = base
+        self.displacement = displacement
+
+
+Operand = Union[Register, Memory, int, str]
+
+# 64-bit, 32-bit and 8-bit names of the general purpose registers, by their number
+REGISTER_NAMES = [('rax', 'eax', 'al'), ('rcx', 'ecx', 'cl'), ('rdx', 'edx', 'dl'),
+                  ('rbx', 'ebx', 'bl'), ('rsp', 'esp', 'spl'), ('rbp', 'ebp', 'bpl'),
+                  ('rsi', 'esi', 'sil'), ('rdi', 'edi', 'dil')] \
+    + [(f'r{number}', f'r{number}d', f'r{number}b') for number in range(8, 16)]
+
+
+class X86Encoder:
+    """Encodes the instructions emitted by AsmGenerator into x86-64 machine code.
+
+    Only the instruction forms the code generator actually produces are
+    supported. All jumps and calls use 32-bit relative displacements, which
+    are fixed up once the addresses of all labels are known.
+    """
+
+    __registers = {name: Register(number, size)
+                   for number, names in enumerate(REGISTER_NAMES)
+                   for name, size in zip(names, (64, 32, 8))}
+
+    __memory_operand = re.compile(r'^(-?\d*)\(%(\w+)\)$')
+
+    # (opcode for "op r, r/m", opcode for "op r/m, r", /digit for "op imm, r/m")
+    __arithmetic = {Opcode.Add: (0x01, 0x03, 0),
+                    Opcode.Sub: (0x29, 0x2B, 5),
+                    Opcode.Cmp: (0x39, 0x3B, 7)}
+    __unary = {Opcode.Neg: 3, Opcode.Not: 2, Opcode.Idiv: 7}
+    __set_conditions = {Opcode.Sete: 0x94, Opcode.Setne: 0x95, Opcode.Setl: 0x9C,
+                        Opcode.Setge: 0x9D, Opcode.Setle: 0x9E, Opcode.Setg: 0x9F}
+    __jumps = {Opcode.Jmp: b'\xE9', Opcode.Call: b'\xE8',
+               Opcode.Je: b'\x0F\x84', Opcode.Jne: b'\x0F\x85'}
+
+    def __init__(self):
+        self.__code = bytearray()
+        self.__labels: Dict[str, int] = {}
+        self.__fixups: List[Tuple[int, str]] = []
+
+    def encode(self, instructions: List[Instruction]) -> Tuple[bytes, Dict[str, int]]:
+        """Returns the machine code and offsets of all labels within it."""
+        self.__code = bytearray()
+        self.__labels = {}
+        self.__fixups = []
+
+        for instruction in instructions:
+            self.__encode_instruction(instruction)
+
+        for position, label in self.__fixups:
+            if label not in self.__labels:
+                raise X86EncoderError(f"Undefined label {label}")
+            relative = self.__labels[label] - (position + 4)
+            self.__code[position:position + 4] = struct.pack('<i', relative)
+
+        return bytes(self.__code), self.__labels
+
+    def __parse_operand(self, operand: str) -> Operand:
+        if operand.startswith('%'):
+            try:
+                return X86Encoder.__registers[operand[1:]]
+            except KeyError:
+                raise X86EncoderError(f"Unknown register {operand}") from None
+        if operand.startswith('$'):
+            # Immediates are truncated to 32 bits, as gas does
+            return ((int(operand[1:]) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        match = X86Encoder.__memory_operand.match(operand)
+        if match:
+            base = X86Encoder.__registers[match.group(2)]
+            return Memory(base.number, int(match.group(1) or 0))
+        return operand  # label
+
+    def __encode_instruction(self, instruction: Instruction):
+        opcode = instruction.opcode
+        operands = [self.__parse_operand(operand) for operand in instruction.operands]
+
+        if opcode == Opcode.Label:
+            if instruction.operands[0] in self.__labels:
+                raise X86EncoderError(f"Label {instruction.operands[0]} is already defined")
+            self.__labels[instruction.operands[0]] = len(self.__code)
+        elif opcode == Opcode.Global:
+            pass
+        elif opcode in (Opcode.Push, Opcode.Pop):
+            register = self.__register(instruction, operands[0])
+            if register.number >= 8:
+                self.__code.append(0x41)
+            self.__code.append((0x50 if opcode == Opcode.Push else 0x58) + (register.number & 7))
+        elif opcode == Opcode.Mov:
+            self.__encode_mov(instruction, operands[0], operands[1])
+        elif opcode in X86Encoder.__arithmetic:
+            self.__encode_arithmetic(instruction, operands[0], operands[1])
+        elif opcode == Opcode.Imul:
+            destination = self.__register(instruction, operands[1])
+            if isinstance(operands[0], int):
+                if -128 <= operands[0] <= 127:
+                    self.__emit_modrm(b'\x6B', destination.number, destination, destination.size)
+                    self.__code += struct.pack('<b', operands[0])
+                else:
+                    self.__emit_modrm(b'\x69', destination.number, destination, destination.size)
+                    self.__code += struct.pack('<i', operands[0])
+            else:
+                self.__emit_modrm(b'\x0F\xAF', destination.number, operands[0], destination.size)
+        elif opcode in X86Encoder.__unary:
+            register = self.__register(instruction, operands[0])
+            self.__emit_modrm(b'\xF7', X86Encoder.__unary[opcode], register, register.size)
+        elif opcode in X86Encoder.__set_conditions:
+            register = self.__register(instruction, operands[0])
+            self.__emit_modrm(bytes([0x0F, X86Encoder.__set_conditions[opcode]]), 0, register, 8)
+        elif opcode == Opcode.Movzb:
+            destination = self.__register(instruction, operands[1])
+            self.__emit_modrm(b'\x0F\xB6', destination.number, operands[0], destination.size)
+        elif opcode in X86Encoder.__jumps:
+            self.__code += X86Encoder.__jumps[opcode]
+            self.__fixups.append((len(self.__code), instruction.operands[0]))
+            self.__code += b'\x00\x00\x00\x00'
+        elif opcode == Opcode.Cdq:
+            self.__code.append(0x99)
+        elif opcode == Opcode.Ret:
+            self.__code.append(0xC3)
+        elif opcode == Opcode.Syscall:
+            self.__code += b'\x0F\x05'
+        else:
+            raise X86EncoderError(f"Unsupported instruction {instruction}")
+
+    @staticmethod
+    def __register(instruction: Instruction, operand: Operand) -> Register:
+        if not isinstance(operand, Register):
+            raise X86EncoderError(f"Unsupported operands of {instruction}")
+        return operand
+
+    def __encode_mov(self, instruction: Instruction, source: Operand, destination: Operand):
+        if isinstance(source, int):
+            register = self.__register(instruction, destination)
+            if register.size != 32:
+                raise X86EncoderError(f"Unsupported operands of {instruction}")
+            if register.number >= 8:
+                self.__code.append(0x41)
+            self.__code.append(0xB8 + (register.number & 7))
+            self.__code += struct.pack('<i', source)
+        elif isinstance(source, Register):
+            self.__emit_modrm(b'\x89', source.number, destination, source.size)
+        else:
+            register = self.__register(instruction, destination)
+            self.__emit_modrm(b'\x8B', register.number, source, register.size)
+
+    def __encode_arithmetic(self, instruction: Instruction, source: Operand, destination: Operand):
+        to_rm, from_rm, digit = X86Encoder.__arithmetic[instruction.opcode]
+        if isinstance(source, int):
+            size = destination.size if isinstance(destination, Register) else 32
+            if -128 <= source <= 127:
+                self.__emit_modrm(b'\x83', digit, destination, size)
+                self.__code += struct.pack('<b', source)
+            else:
+                self.__emit_modrm(b'\x81', digit, destination, size)
+                self.__code += struct.pack('<i', source)
+        elif isinstance(source, Register):
+            self.__emit_modrm(bytes([to_rm]), source.number, destination, source.size)
+        else:
+            register = self.__register(instruction, destination)
+            self.__emit_modrm(bytes([from_rm]), register.number, source, register.size)
+
+    def __emit_modrm(self, opcode: bytes, reg: int, rm: Operand, size: int):
+        """Emits the REX prefix, the opcode and the ModR/M (and SIB and displacement) bytes."""
+        rex = 0x48 if size == 64 else 0x40
+        if reg >= 8:
+            rex |= 0x04
+        if isinstance(rm, Register):
+            rm_number = rm.number
+        elif isinstance(rm, Memory):
+            rm_number = rm.base
+        else:
+            raise X86EncoderError(f"Unsupported operand {rm}")
+        if rm_number >= 8:
+            rex |= 0x01
+        if rex != 0x40 or (size == 8 and 4 <= rm_number < 8):
+            self.__code.append(rex)
+        self.__code += opcode
+
+        if isinstance(rm, Register):
+            self.__code.append(0xC0 | ((reg & 7) << 3) | (rm_number & 7))
+            return
+
+        # %rbp and %r13 can not be encoded without a displacement, so always use one
+        mod = 0x40 if -128 <= rm.displacement <= 127 else 0x80
+        self.__code.append(mod | ((reg & 7) << 3) | (rm_number & 7))
+        if rm_number & 7 == 4:
+            self.__code.append(0x24)  # SIB byte: base %rsp, no index
+        if mod == 0x40:
+            self.__code += struct.pack('<b', rm.displacement)
+        else:
+            self.__code += struct.pack('<i', rm.displacement)
@@ -1,7 +1,8 @@
+import argparse
 import json
 import subprocess
 import os
-from io import StringIO
+from io import StringIO, BytesIO
 
 import simpylic.simpylic as Simpylic
 
@@ -10,7 +11,65 @@ def log(msg):
     print(msg, end='', flush=True)
 
 
+def build_with_gcc(testfile, binary, freestanding=False):
+    buffer = StringIO()
+    with open(testfile, encoding='utf-8') as src:
+        Simpylic.run(src, buffer, Simpylic.Operation.Compile, freestanding=freestanding)
+    buffer.seek(0)
+    flags = ['-nostdlib', '-static'] if freestanding else []
+    compiler = subprocess.Popen(['gcc', *flags, '-x', 'assembler', '-', '-o', binary],
+                                stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = compiler.communicate(input=buffer.getvalue().encode('utf-8'))
+    compiler.stdin.close()
+    result = compiler.wait()
+    if result != 0:
+        raise RuntimeError(f'gcc error {result}: {err}')
+
+
+def build_c_with_gcc(testfile, binary):
+    buffer = StringIO()
+    with open(testfile, encoding='utf-8') as src:
+        Simpylic.run(src, buffer, Simpylic.Operation.CompileC)
+    compiler = subprocess.Popen(['gcc', '-std=c99', '-O2', '-x', 'c', '-', '-o', binary],
+                                stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = compiler.communicate(input=buffer.getvalue().encode('utf-8'))
+    result = compiler.wait()
+    if result != 0:
+        raise RuntimeError(f'gcc error {result}: {err}')
+
+
+def build_executable(testfile, binary):
+    buffer = BytesIO()
+    with open(testfile, encoding='utf-8') as src:
+        Simpylic.run(src, buffer, Simpylic.Operation.CompileExecutable)
+    with open(binary, 'wb') as outfile:
+        outfile.write(buffer.getvalue())
+    os.chmod(binary, 0o755)
+
+
+def interpret(testfile, engine):
+    buffer = StringIO()
+    with open(testfile, encoding='utf-8') as src:
+        Simpylic.run(src, buffer, Simpylic.Operation.Interpret, engine)
+    return int(buffer.getvalue()) % 256
+
+
 def main():
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--elf', dest='elf', action='store_true',
+                       help='Build the tests directly into ELF executables instead of using gcc.')
+    group.add_argument('--freestanding', dest='freestanding', action='store_true',
+                       help='Build the tests without libc, using gcc -nostdlib -static.')
+    group.add_argument('--c', dest='c', action='store_true',
+                       help='Build the tests through the C back end and gcc -O2.')
+    group.add_argument('--interpret', dest='interpret', action='store_true',
+                       help='Run the tests in the interpreter mode.')
+    parser.add_argument('--engine', dest='engine', choices=[e.value for e in Simpylic.Engine],
+                        help='Execution engine for the interpreter mode.')
+    args = parser.parse_args()
+    engine = Simpylic.Engine(args.engine) if args.engine else None
+
     with open('testdata/tests.json', encoding='utf-8') as infile:
         tests = json.load(infile)
 
@@ -18,30 +77,29 @@ def main():
         testfile = f'testdata/{test["test"]}.spy'
         log(f'Testing {testfile}...')
 
-        log('compiling...')
-        buffer = StringIO()
-        with open(testfile, encoding='utf-8') as src:
-            Simpylic.run(src, buffer, Simpylic.Operation.Compile)
-        buffer.seek(0)
-        compiler = subprocess.Popen(['gcc', '-x', 'assembler', '-', '-o', '/tmp/simpylic-test-out'],
-                                    stdin=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = compiler.communicate(input=buffer.getvalue().encode('utf-8'))
-        compiler.stdin.close()
-        result = compiler.wait()
-        if result != 0:
-            raise RuntimeError(f'gcc error {result}: {err}')
-
-        log('running...')
-        program = subprocess.Popen('/tmp/simpylic-test-out')
-        result = program.wait()
+        if args.interpret:
+            log('interpreting...')
+            result = interpret(testfile, engine)
+        else:
+            log('compiling...')
+            if args.elf:
+                build_executable(testfile, '/tmp/simpylic-test-out')
+            elif args.c:
+                build_c_with_gcc(testfile, '/tmp/simpylic-test-out')
+            else:
+                build_with_gcc(testfile, '/tmp/simpylic-test-out', args.freestanding)
+
+            log('running...')
+            program = subprocess.Popen('/tmp/simpylic-test-out')
+            result = program.wait()
+            os.remove('/tmp/simpylic-test-out')
+
         if result != int(test['return-code']) % 256:
             raise RuntimeError(f'The utility finished with return code {result} does not match '
                                f'the expected result {test["return-code"]}')
 
         log('OK.\n')
 
-        os.remove('/tmp/simpylic-test-out')
-
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,99 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+from simpylic.batch_compiler import BatchCompiler, BatchOptions, read_manifest
+from simpylic.simpylic import run, Operation
+
+
+PROGRAMS = {
+    'first': "return 1 + 2\n",
+    'second': "def twice(a):\n    return a * 2\n\nreturn twice(21)\n",
+}
+
+
+class TestBatchCompiler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sources = []
+        for name, code in PROGRAMS.items():
+            path = os.path.join(self.directory.name, f'{name}.spy')
+            with open(path, 'w', encoding='utf-8') as srcfile:
+                srcfile.write(code)
+            self.sources.append(path)
+        self.output_dir = os.path.join(self.directory.name, 'out')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_outputs(self, outputs, operation):
+        for source, output in zip(self.sources, outputs):
+            expected = StringIO()
+            with open(source, encoding='utf-8') as srcfile:
+                run(srcfile, expected, operation)
+            with open(output, encoding='utf-8') as outfile:
+                self.assertEqual(expected.getvalue(), outfile.read())
+
+    def test_compile(self):
+        outputs, errors = BatchCompiler(self.output_dir).compile(self.sources)
+        self.assertEqual({}, errors)
+        self.assertEqual([os.path.join(self.output_dir, 'first.s'),
+                          os.path.join(self.output_dir, 'second.s')], outputs)
+        self.assert_outputs(outputs, Operation.Compile)
+
+    def test_compile_parallel(self):
+        compiler = BatchCompiler(self.output_dir, 2, BatchOptions(Operation.CompileC))
+        outputs, errors = compiler.compile(self.sources)
+        self.assertEqual({}, errors)
+        self.assert_outputs(outputs, Operation.CompileC)
+
+    def test_errors(self):
+        missing = os.path.join(self.directory.name, 'missing.spy')
+        outputs, errors = BatchCompiler(self.output_dir).compile([missing, *self.sources])
+        self.assertEqual(2, len(outputs))
+        self.assertEqual([missing], list(errors))
+        with self.assertRaises(ValueError):
+            BatchCompiler(self.output_dir).compile([self.sources[0], self.sources[0]])
+
+    def test_failed_compilation(self):
+        broken = os.path.join(self.directory.name, 'broken.spy')
+        with open(broken, 'w', encoding='utf-8') as srcfile:
+            srcfile.write("return (1\n")
+        outputs, errors = BatchCompiler(self.output_dir).compile([broken])
+        self.assertEqual([], outputs)
+        self.assertEqual([broken], list(errors))
+        self.assertEqual([], os.listdir(self.output_dir))
+
+    def test_manifest(self):
+        manifest = os.path.join(self.directory.name, 'manifest')
+        with open(manifest, 'w', encoding='utf-8') as outfile:
+            outfile.write("# programs\nfirst.spy\n\nsecond.spy\n")
+        self.assertEqual(self.sources, read_manifest(manifest))
+
+    @unittest.skipIf(shutil.which('gcc') is None, "gcc is not available")
+    def test_assemble(self):
+        compiler = BatchCompiler(self.output_dir)
+        objects = compiler.assemble(compiler.compile(self.sources)[0])
+        self.assertEqual([os.path.join(self.output_dir, 'first.o'),
+                          os.path.join(self.output_dir, 'second.o')], objects)
+        self.assertTrue(all(os.path.exists(path) for path in objects))
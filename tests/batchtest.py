@@ -0,0 +1,93 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from simpylic import simpylic
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.interpreter import ClosureProgram, InterpreterError
+
+
+PROGRAM = """def collatz(x):
+    steps = 0
+    while x > 1:
+        steps = steps + 1
+        x = (((x / 2) * 2) == x) ? (x / 2) : ((x * 3) + 1)
+    return steps
+
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+def mix(a, b):
+    r = ~a + (0 - (b / 7))
+    if a > b:
+        r = (a * 65536) - (b / (0 - 3))
+    if a == b:
+        r = (a and b) or !a
+    return (a < 0) ? (r + (a / (b or 1))) : r
+
+def big(a):
+    return (a + 4294967297) / 1000000000
+
+return 0
+"""
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBatchEval(unittest.TestCase):
+
+    def setUp(self):
+        self.program = Parser().parse(Tokenizer(StringIO(PROGRAM)).tokenize())
+        AstPreprocessor().process(self.program)
+        self.reference = ClosureProgram(self.program)
+
+    def assert_matches_reference(self, name, rows):
+        expected = [self.reference.run(f"_main_{name}",
+                                       [int(value) for value in np.atleast_1d(row)])
+                    for row in rows]
+        result = simpylic.batch_eval(self.program, name, rows)
+        self.assertEqual(np.int32, result.dtype)
+        self.assertEqual(expected, result.tolist())
+
+    def test_loops(self):
+        self.assert_matches_reference("collatz", np.arange(1, 500))
+
+    def test_recursion(self):
+        self.assert_matches_reference("fib", np.arange(0, 15).reshape(-1, 1))
+
+    def test_wraparound_and_masks(self):
+        rows = np.random.default_rng(1).integers(-2**31, 2**31, size=(1000, 2))
+        rows[::3, 1] = rows[::3, 0]
+        rows[::7, 0] = 0
+        self.assert_matches_reference("mix", rows)
+
+    def test_literals_wrap_around(self):
+        self.assert_matches_reference("big", np.arange(-5, 5).reshape(-1, 1))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(InterpreterError):
+            simpylic.batch_eval(self.program, "mix", np.zeros((10, 3)))
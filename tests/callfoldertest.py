@@ -0,0 +1,89 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import subprocess
+import tempfile
+import unittest
+from io import StringIO
+
+from simpylic import ast
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.call_folder import CallFolder
+from simpylic.interpreter import TreeWalker
+from simpylic.elf_writer import ElfGenerator
+from simpylic.jit import JitProgram
+
+
+def parse_code(code):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    return program
+
+
+def run_executable(program):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program')
+        with open(path, 'wb') as outfile:
+            ElfGenerator(outfile).generate(program)
+        os.chmod(path, 0o755)
+        return subprocess.run([path], check=False).returncode
+
+
+def main_function(program):
+    return next(func for func in program.functions if func.name == "main")
+
+
+class TestCallFolder(unittest.TestCase):
+
+    def test_fold_recursive_call(self):
+        program = parse_code("def fib(n):\n    if n < 2:\n        return n\n"
+                             "    return fib(n - 1) + fib(n - 2)\nreturn fib(30)\n")
+        self.assertEqual(1, CallFolder().fold(program))
+        expr = main_function(program).body.statements[0].expr
+        self.assertIsInstance(expr, ast.ConstantNode)
+        self.assertEqual(832040, expr.value)
+
+    def test_fold_keeps_operand_order(self):
+        program = parse_code("def sub(a, b):\n    return a - b\n"
+                             "def two():\n    return 2\n"
+                             "x = 10\nreturn sub(x, two()) - two()\n")
+        self.assertEqual(2, CallFolder().fold(program))
+        expr = main_function(program).body.statements[1].expr
+        self.assertIsInstance(expr.lhs_expr, ast.FunCallNode)
+        self.assertIsInstance(expr.lhs_expr.arguments[0], ast.VarNode)
+        self.assertEqual(2, expr.lhs_expr.arguments[1].value)
+        self.assertEqual(2, expr.rhs_expr.value)
+        self.assertEqual(6, TreeWalker(program).run())
+
+    def test_unfoldable_calls(self):
+        program = parse_code("def forever(a):\n    while 1:\n        a = a + 1\n    return a\n"
+                             "def divide(a):\n    return 1 / a\n"
+                             "return forever(1) + divide(0)\n")
+        self.assertEqual(0, CallFolder(max_steps=1000).fold(program))
+
+    @unittest.skipUnless(JitProgram.is_supported(), "the executables are x86-64 Linux ones")
+    def test_folded_executable_matches_unfolded(self):
+        # f falls off its end, which returns 0 in both
+        code = "def f(a):\n    a = a + 1\nreturn f(1) + 3\n"
+        unfolded = run_executable(parse_code(code))
+        program = parse_code(code)
+        self.assertEqual(1, CallFolder().fold(program))
+        self.assertEqual(unfolded, run_executable(program))
+        self.assertEqual(3, unfolded)
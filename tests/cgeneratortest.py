@@ -0,0 +1,63 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from io import StringIO
+from ddt import ddt, data
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.c_generator import CGenerator
+from simpylic.interpreter import TreeWalker
+
+
+def parse_code(code):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    return program
+
+
+@ddt
+class TestCGenerator(unittest.TestCase):
+
+    def test_function_declarations(self):
+        output = StringIO()
+        CGenerator(output).generate(parse_code("def f(a, b):\n    return a / b\nreturn f(7, 2)\n"))
+        self.assertIn("static int32_t _main_f(int32_t v_a, int32_t v_b);", output.getvalue())
+        self.assertIn("return (v_a / v_b);", output.getvalue())
+        self.assertIn("return _main_f(7, 2);", output.getvalue())
+
+    @unittest.skipIf(shutil.which("gcc") is None, "gcc is not available")
+    @data("return 2147483647 * 3\n",
+          "return (0 - 7) / 2\n",
+          "x = 0\nwhile x < 1000:\n    x = (x * 2) + 1\nreturn x\n",
+          "def f(n):\n    return (n < 2) ? n : (f(n - 1) + f(n - 2))\nreturn f(12)\n")
+    def test_matches_interpreter(self, code):
+        program = parse_code(code)
+        output = StringIO()
+        CGenerator(output).generate(program)
+        with tempfile.TemporaryDirectory() as directory:
+            binary = os.path.join(directory, "test")
+            subprocess.run(["gcc", "-std=c99", "-O2", "-x", "c", "-", "-o", binary],
+                           input=output.getvalue().encode("utf-8"), check=True)
+            result = subprocess.run([binary], check=False).returncode
+        self.assertEqual(TreeWalker(program).run() % 256, result)
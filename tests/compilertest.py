@@ -0,0 +1,99 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+from ddt import ddt, data, unpack
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.compiler import AsmGenerator
+from simpylic.jit import JitProgram
+
+
+def compile_code(code, freestanding=False):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    output = StringIO()
+    AsmGenerator(output, freestanding).generate(program)
+    return [line.split() for line in output.getvalue().splitlines()]
+
+
+# The labels of f_post and those of f, followed by "_post_conditional", used to collide
+LABELS_PROGRAM = """def f(a):
+    return a ? 5 : 6
+
+def f_post(b):
+    c = b and 1
+    return c ? 1 : 2
+
+return f(1) + f_post(0)
+"""
+
+
+def peak_stack_depth(instructions):
+    depth = peak = 0
+    for instruction in instructions:
+        if instruction[0] == 'push':
+            depth += 1
+            peak = max(depth, peak)
+        elif instruction[0] == 'pop':
+            depth -= 1
+    return peak
+
+
+@ddt
+class TestAsmGenerator(unittest.TestCase):
+
+    @data(("return 1 + (2 + (3 + (4 + 5)))\n", 0),
+          ("return (((1 + 2) + 3) + 4) + 5\n", 0),
+          ("return 5 - (4 - (3 - (2 - 1)))\n", 0),
+          ("return ((1 + 2) * (3 + 4)) - (((1 + 2) * (3 + 4)) + 5)\n", 2))
+    @unpack
+    def test_sethi_ullman_stack_usage(self, code, depth):
+        # main is a leaf function here, so there is no %rbp push in the prologue
+        self.assertEqual(depth, peak_stack_depth(compile_code(code)))
+
+    def test_leaf_function_frame_omission(self):
+        instructions = compile_code("def ten():\n    return 10\n\nreturn ten()\n")
+        function = instructions.index(['_main_ten:'])
+        self.assertListEqual([['_main_ten:'], ['mov', '$10,', '%eax']],
+                             instructions[function:function + 2])
+
+    def test_freestanding_entry_point(self):
+        self.assertNotIn(['_start:'], compile_code("return 1\n"))
+        instructions = compile_code("return 1\n", freestanding=True)
+        start = instructions.index(['_start:'])
+        self.assertListEqual([['call', 'main'], ['mov', '%eax,', '%edi'],
+                              ['mov', '$231,', '%eax'], ['syscall']],
+                             instructions[start + 1:start + 5])
+
+    def test_labels_are_unique(self):
+        labels = [instruction[0] for instruction in compile_code(LABELS_PROGRAM)
+                  if instruction[0].endswith(':')]
+        self.assertEqual(len(labels), len(set(labels)))
+
+    @unittest.skipUnless(JitProgram.is_supported(), "the jit needs x86-64")
+    def test_labels_of_functions_are_apart(self):
+        program = Parser().parse(Tokenizer(StringIO(LABELS_PROGRAM)).tokenize())
+        AstPreprocessor().process(program)
+        self.assertEqual(7, JitProgram(program).run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+from ddt import ddt, data, unpack
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.frame_layout import FrameAllocator
+
+
+def allocate_main(code):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    return FrameAllocator().allocate(next(iter(program.functions)))
+
+
+@ddt
+class TestFrameLayout(unittest.TestCase):
+
+    @data(("return 10\n", 0, 0),
+          ("a = 1\nb = 2\nreturn a + b\n", 2, 16),
+          ("a = 1\nb = a + 1\nc = b + 1\nreturn c\n", 1, 16),
+          ("a = 1\nb = 2\nc = 3\nd = 4\nreturn a + b + c + d\n", 4, 16),
+          ("a = 1\nb = 2\nc = 3\nd = 4\ne = 5\nreturn a + b + c + d + e\n", 5, 32))
+    @unpack
+    def test_frame_size(self, code, slot_count, size):
+        layout = allocate_main(code)
+        self.assertEqual(slot_count, layout.slot_count)
+        self.assertEqual(size, layout.size)
+
+    def test_slot_reuse(self):
+        layout = allocate_main("a = 1\nb = a + 1\nreturn b\n")
+        self.assertEqual(layout.slot('a'), layout.slot('b'))
+        self.assertEqual(-4, layout.offset('b'))
+
+    def test_loop_keeps_variables_alive(self):
+        layout = allocate_main("i = 0\nt = 0\nwhile i < 10:\n    t = i + 1\n    i = i + 1\n\n"
+                               "r = t\nreturn r\n")
+        self.assertNotEqual(layout.slot('i'), layout.slot('t'))
+        self.assertEqual(layout.slot('i'), layout.slot('r'))
+
+
+if __name__ == '__main__':
+    unittest.main()
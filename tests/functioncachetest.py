@@ -0,0 +1,109 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import unittest
+from io import StringIO
+from unittest import mock
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.compiler import AsmGenerator
+from simpylic.function_cache import FunctionCache, CachingAsmGenerator
+
+
+PROGRAM = """def square(a):
+    return a * a
+
+def cube(a):
+    return square(a) * a
+
+return cube({value})
+"""
+
+
+def parse_code(code):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    return program
+
+
+def store_entries(directory, worker):
+    cache = FunctionCache(directory)
+    for index in range(20):
+        cache.store(f"{worker:02x}{index:062x}", "x" * (index + 1))
+        cache.trim()
+
+
+def generate(program, cache):
+    output = StringIO()
+    CachingAsmGenerator(output, cache).generate(program)
+    return output.getvalue()
+
+
+class TestFunctionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_output_matches_uncached(self):
+        program = parse_code(PROGRAM.format(value=3))
+        expected = StringIO()
+        AsmGenerator(expected).generate(program)
+
+        cache = FunctionCache(self.directory.name)
+        self.assertEqual(expected.getvalue(), generate(program, cache))
+        self.assertEqual(expected.getvalue(), generate(program, cache))
+        self.assertEqual((3, 3), (cache.misses, cache.hits))
+
+    def test_only_changed_function_is_regenerated(self):
+        cache = FunctionCache(self.directory.name)
+        generate(parse_code(PROGRAM.format(value=3)), cache)
+        generate(parse_code(PROGRAM.format(value=4)), cache)
+        self.assertEqual((4, 2), (cache.misses, cache.hits))
+
+    def test_eviction(self):
+        cache = FunctionCache(self.directory.name, max_size=200)
+        generate(parse_code(PROGRAM.format(value=3)), cache)
+        self.assertGreater(cache.evictions, 0)
+        # The file recording the size is next to the subdirectories of the entries
+        size = sum(os.path.getsize(os.path.join(directory, name))
+                   for directory, _, files in os.walk(self.directory.name) for name in files
+                   if directory != self.directory.name)
+        self.assertLessEqual(size, 200)
+
+    def test_trim_walks_only_over_limit(self):
+        cache = FunctionCache(self.directory.name)
+        with mock.patch('simpylic.function_cache.os.walk', wraps=os.walk) as walk:
+            # The size is unknown at first
+            generate(parse_code(PROGRAM.format(value=3)), cache)
+            self.assertEqual(1, walk.call_count)
+            generate(parse_code(PROGRAM.format(value=4)), cache)
+            generate(parse_code(PROGRAM.format(value=4)), cache)
+            self.assertEqual(1, walk.call_count)
+
+    def test_size_of_shared_cache(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(store_entries, [self.directory.name] * 4, range(4)))
+        with open(os.path.join(self.directory.name, 'size'), encoding='utf-8') as size_file:
+            self.assertEqual(4 * sum(range(1, 21)), int(size_file.read()))
@@ -0,0 +1,114 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser, ParserError
+from simpylic.incremental import IncrementalFrontEnd
+
+
+PROGRAM = """def square(a):
+    return a * a
+
+x = square(3)
+if x > 5:
+    x = x - 1
+else:
+    x = x + 1
+
+def twice(a):
+    return a * 2
+
+return twice(x)
+"""
+
+
+def dump(node):
+    return (type(node).__name__, repr(node), [dump(child) for child in node.children])
+
+
+def parse(source):
+    return dump(Parser().parse(Tokenizer(StringIO(source)).tokenize()))
+
+
+class TestIncremental(unittest.TestCase):
+
+    def test_build_matches_parser(self):
+        front_end = IncrementalFrontEnd(PROGRAM)
+        self.assertEqual([], front_end.errors)
+        self.assertEqual(parse(PROGRAM), dump(front_end.program))
+        self.assertEqual([(token.text, token.line, token.pos) for token in
+                          Tokenizer(StringIO(PROGRAM)).tokenize()],
+                         [(token.text, token.line, token.pos) for token in front_end.tokens()])
+
+    def test_edits_match_parser(self):
+        front_end = IncrementalFrontEnd(PROGRAM)
+        edits = [
+            (1, 2, "    return a * a * a\n"),        # function body
+            (4, 8, "x = x + 2\n"),                    # whole if statement
+            (5, 5, "y = 2\nx = x + y\n"),             # new variable
+            (0, 0, "def zero():\n    return 0\n\n"),  # new function
+            (13, 13, "    y = 1\n"),                  # continues the previous function
+        ]
+        for start, end, text in edits:
+            lines = front_end.source().splitlines(keepends=True)
+            lines[start:end] = [text]
+            front_end.edit(start, end, text)
+            self.assertEqual(''.join(lines), front_end.source())
+            self.assertEqual(parse(front_end.source()), dump(front_end.program))
+
+    def test_update_changes_declarations(self):
+        front_end = IncrementalFrontEnd("return 0\n")
+        front_end.update("x = 1\nreturn 0\n")
+        front_end.update("x = 1\nx = 2\nreturn x\n")
+        self.assertEqual(parse(front_end.source()), dump(front_end.program))
+        # The assignment becomes the declaration of x
+        front_end.update("x = 2\nreturn x\n")
+        self.assertEqual(parse(front_end.source()), dump(front_end.program))
+
+    def test_errors_are_reported_per_chunk(self):
+        front_end = IncrementalFrontEnd(PROGRAM)
+        front_end.edit(9, 10, "def twice(a):\n    return b\n")
+        # The call to twice after it fails too
+        self.assertEqual(2, len(front_end.errors))
+        main = next(iter(front_end.program.functions))
+        self.assertNotIn("twice", [getattr(statement, 'name', None)
+                                   for statement in main.body.statements])
+        front_end.edit(10, 11, "    return a\n")
+        self.assertEqual([], front_end.errors)
+        self.assertEqual(parse(front_end.source()), dump(front_end.program))
+
+    def test_unexpected_indentation(self):
+        source = "a = 5\n    c = 6\nif a < 5:\n    return 1\nelse:\n    return 2\n"
+        with self.assertRaises(ParserError) as context:
+            parse(source)
+        front_end = IncrementalFrontEnd(source)
+        self.assertEqual(str(context.exception), str(front_end.errors[0]))
+        front_end.edit(1, 2, "c = 6\n")
+        self.assertEqual([], front_end.errors)
+        self.assertEqual(parse(front_end.source()), dump(front_end.program))
+
+    def test_partial_lines_are_rejected(self):
+        front_end = IncrementalFrontEnd(PROGRAM)
+        with self.assertRaises(ValueError):
+            front_end.edit(0, 1, "def square(a):")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+
+from simpylic.compiler import AsmEmitter
+from simpylic.instruction import Instruction, Opcode
+
+
+class TestInstruction(unittest.TestCase):
+
+    def test_equality(self):
+        self.assertEqual(Instruction(Opcode.Mov, "$1", "%eax"),
+                         Instruction(Opcode.Mov, "$1", "%eax"))
+        self.assertNotEqual(Instruction(Opcode.Mov, "$1", "%eax"),
+                            Instruction(Opcode.Mov, "$2", "%eax"))
+        self.assertNotEqual(Instruction(Opcode.Push, "%rax"), Instruction(Opcode.Pop, "%rax"))
+        self.assertNotEqual(Instruction(Opcode.Ret), "ret")
+        self.assertNotEqual(Instruction(Opcode.Ret), None)
+
+    def test_hash(self):
+        instructions = {Instruction(Opcode.Mov, "$1", "%eax"),
+                        Instruction(Opcode.Mov, "$1", "%eax"),
+                        Instruction(Opcode.Ret)}
+        self.assertEqual(2, len(instructions))
+        self.assertIn(Instruction(Opcode.Ret), instructions)
+
+    def test_render(self):
+        emitter = AsmEmitter(None)
+        emitter.label("main")
+        emitter.instruction(Opcode.Mov, "$42", "-4(%rbp)")
+        emitter.push_stack("%rbp")
+        emitter.instruction(Opcode.Ret)
+        emitter.instruction(Opcode.Global, "main")
+        self.assertEqual("main:\n"
+                         "    mov $42, -4(%rbp)\n"
+                         "    push %rbp\n"
+                         "    ret\n"
+                         "    .global main\n", emitter.render())
+
+
+class TestAsmEmitter(unittest.TestCase):
+
+    def test_flush_writes_pending_instructions(self):
+        output = StringIO()
+        emitter = AsmEmitter(output)
+        emitter.instruction(Opcode.Cdq)
+        self.assertEqual([Instruction(Opcode.Cdq)], emitter.instructions)
+        self.assertEqual("", output.getvalue())
+        emitter.flush()
+        self.assertEqual("    cdq\n", output.getvalue())
+        self.assertEqual([], emitter.instructions)
+        emitter.pop_stack("%rbx")
+        emitter.flush()
+        self.assertEqual("    cdq\n    pop %rbx\n", output.getvalue())
+
+    def test_flush_without_output_keeps_instructions(self):
+        emitter = AsmEmitter(None)
+        emitter.instruction(Opcode.Neg, "%eax")
+        emitter.flush()
+        self.assertEqual([Instruction(Opcode.Neg, "%eax")], emitter.instructions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import tempfile
+import unittest
+from io import StringIO
+from ddt import ddt, data, unpack
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.purity import PurityAnalyzer
+from simpylic.interpreter import TreeWalker, BytecodeCompiler, VirtualMachine, ClosureProgram, \
+    PythonProgram, PythonCodeCache, Memoizer, Op, StepLimitError
+
+
+def parse_code(code):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    return program
+
+
+@ddt
+class TestInterpreters(unittest.TestCase):
+
+    @data(("return 7 / (0 - 2)\n", -3),
+          ("return (0 - 7) / 2\n", -3),
+          ("return 2147483647 + 1\n", -2147483648),
+          ("return 65536 * 65536\n", 0),
+          ("return 4294967297\n", 1),
+          ("a = 3000000000\nreturn a / 1000000000\n", -1),
+          ("return 0 - ((0 - 2147483647) - 1)\n", -2147483648),
+          ("return (3 < 4) + (4 <= 4) + (5 > 6)\n", 2),
+          ("return 0 and 5\n", 0),
+          ("return 3 or 5\n", 1),
+          ("def f(a):\n    a = a + 1\nreturn f(1)\n", 0),
+          ("x = 0\ni = 0\nwhile i < 10:\n    i = i + 1\n    x = x + i\nreturn x\n", 55))
+    @unpack
+    def test_engines_agree(self, code, result):
+        program = parse_code(code)
+        self.assertEqual(result, TreeWalker(program).run())
+        self.assertEqual(result, VirtualMachine(BytecodeCompiler().compile(program)).run())
+        self.assertEqual(result, VirtualMachine(BytecodeCompiler(False).compile(program)).run())
+        self.assertEqual(result, ClosureProgram(program).run())
+        self.assertEqual(result, PythonProgram(PythonProgram.compile(program)).run())
+
+    def test_superinstructions(self):
+        program = parse_code("i = 0\nwhile i < 10:\n    i = i + 1\nreturn i\n")
+        main = BytecodeCompiler().compile(program)[0]
+        self.assertEqual([Op.LoadConst, Op.StoreLocal, Op.JumpIfNotLessLocalConst,
+                          Op.IncrementLocal, Op.Jump, Op.ReturnLocal, Op.LoadConst, Op.Return],
+                         [op for _, op, _ in main.disassemble()])
+        self.assertEqual(10, VirtualMachine([main]).run())
+
+    def test_vm_step_limit(self):
+        loop = BytecodeCompiler().compile(parse_code("i = 0\nwhile i < 10:\n    i = i + 1\n"
+                                                     "return i\n"))
+        # A step is a jump or a call
+        self.assertEqual(10, VirtualMachine(loop, max_steps=10).run())
+        with self.assertRaises(StepLimitError):
+            VirtualMachine(loop, max_steps=9).run()
+        recursion = BytecodeCompiler().compile(parse_code("def f(a):\n    return f(a)\n"
+                                                          "return f(1)\n"))
+        with self.assertRaises(StepLimitError):
+            VirtualMachine(recursion, max_steps=1000).run()
+
+    def test_python_code_cache(self):
+        source = "def f(a):\n    return a * 2\nreturn f(21)\n"
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PythonCodeCache(directory)
+            self.assertIsNone(cache.load(source))
+            cache.store(source, PythonProgram.compile(parse_code(source)))
+            self.assertEqual(42, PythonProgram(cache.load(source)).run())
+            self.assertIsNone(cache.load(source + "\n"))
+
+    def test_purity(self):
+        program = parse_code("x = 5\ndef f(a):\n    return a + x\n"
+                             "def g(a):\n    return f(a)\n"
+                             "def h(a):\n    b = a * 2\n    return h(b - 1)\nreturn 0\n")
+        self.assertEqual({"main", "_main_h"}, PurityAnalyzer().analyze(program))
+
+    @data(lambda program, memoizer: TreeWalker(program, memoizer),
+          lambda program, memoizer: VirtualMachine(BytecodeCompiler().compile(program), memoizer),
+          lambda program, memoizer: ClosureProgram(program, memoizer),
+          lambda program, memoizer: PythonProgram(PythonProgram.compile(program), memoizer))
+    def test_memoization(self, engine):
+        program = parse_code("def fib(n):\n    if n < 2:\n        return n\n"
+                             "    return fib(n - 1) + fib(n - 2)\nreturn fib(25)\n")
+        memoizer = Memoizer(8)
+        self.assertEqual(75025, engine(program, memoizer).run())
+        cache = memoizer.cache("_main_fib")
+        self.assertEqual((26, 23, 18), (cache.misses, cache.hits, cache.evictions))
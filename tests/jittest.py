@@ -0,0 +1,64 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import ctypes
+import gc
+import unittest
+from io import StringIO
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.jit import JitProgram
+
+
+def parse_code(code):
+    program = Parser().parse(Tokenizer(StringIO(code)).tokenize())
+    AstPreprocessor().process(program)
+    return program
+
+
+def mapping_permissions(address):
+    with open('/proc/self/maps', encoding='ascii') as maps:
+        for line in maps:
+            start, end = (int(bound, 16) for bound in line.split()[0].split('-'))
+            if start <= address < end:
+                return line.split()[1]
+    return None
+
+
+@unittest.skipUnless(JitProgram.is_supported(), "the jit needs x86-64")
+class TestJit(unittest.TestCase):
+
+    def test_function_outlives_program(self):
+        function = JitProgram(parse_code("def square(a):\n    return a * a\n"
+                                         "return square(3)\n")).function("_main_square")
+        gc.collect()
+        self.assertEqual(49, function(7))
+
+    def test_code_is_not_writable(self):
+        function = JitProgram(parse_code("return 1\n")).function("main")
+        address = ctypes.cast(function, ctypes.c_void_p).value
+        self.assertEqual('r-xp', mapping_permissions(address))
+
+    def test_falling_off_the_end_returns_zero(self):
+        program = parse_code("def f(a):\n    a = a + 1\nreturn f(1)\n")
+        self.assertEqual(0, JitProgram(program).run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.compiler import AsmGenerator
+from simpylic.parallel_generator import ParallelAsmGenerator
+
+
+class TestParallelAsmGenerator(unittest.TestCase):
+
+    def test_output_matches_sequential(self):
+        code = "".join(f"def f{i}(a):\n    while a < {i}:\n        a = a + 1\n"
+                       f"    return (a > 3) ? f{max(i - 1, 0)}(a - 1) : a\n\n" for i in range(20))
+        program = Parser().parse(Tokenizer(StringIO(code + "return f19(0)\n")).tokenize())
+        AstPreprocessor().process(program)
+
+        expected = StringIO()
+        AsmGenerator(expected, freestanding=True).generate(program)
+        output = StringIO()
+        ParallelAsmGenerator(output, 3, freestanding=True).generate(program)
+        self.assertEqual(expected.getvalue(), output.getvalue())
@@ -0,0 +1,75 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import tempfile
+import unittest
+
+from simpylic.tokenizer import Tokenizer, TokenizerError
+from simpylic.parallel_tokenizer import ParallelTokenizer
+
+
+PROGRAM = """def square(a):
+    return a * a
+
+x = 1
+while x < 100:
+    x = square(x + 1)
+
+return x
+"""
+
+
+class TestParallelTokenizer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, code):
+        path = os.path.join(self.directory.name, 'program.spy')
+        with open(path, 'w', encoding='utf-8') as outfile:
+            outfile.write(code)
+        return path
+
+    def test_chunks_end_at_lines(self):
+        chunks = ParallelTokenizer(self.write(PROGRAM), 2, chunk_size=20).chunks()
+        self.assertGreater(len(chunks), 2)
+        lines = PROGRAM.splitlines(keepends=True)
+        offset = 0
+        for _, start, end, first_line in chunks:
+            self.assertEqual(offset, start)
+            self.assertEqual(sum(len(line) for line in lines[:first_line - 1]), start)
+            self.assertEqual('\n', PROGRAM[end - 1])
+            offset = end
+        self.assertEqual(len(PROGRAM), offset)
+
+    def test_tokens_match_sequential(self):
+        path = self.write(PROGRAM)
+        with open(path, encoding='utf-8') as srcfile:
+            expected = Tokenizer(srcfile).tokenize()
+        for jobs in (1, 2):
+            self.assertListEqual(expected,
+                                 list(ParallelTokenizer(path, jobs, chunk_size=20).tokenize()))
+
+    def test_error_line(self):
+        path = self.write(PROGRAM + "x = 1 $ 2\n")
+        with self.assertRaises(TokenizerError) as context:
+            ParallelTokenizer(path, 2, chunk_size=20).tokenize()
+        self.assertEqual((9, 7), (context.exception.line, context.exception.pos))
@@ -0,0 +1,71 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+
+from simpylic import ast
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser, ParserError
+
+
+def parse_code(code):
+    return Parser().parse(Tokenizer(StringIO(code)).tokenize())
+
+
+def main_statements(program):
+    return next(iter(program.functions)).body.statements
+
+
+class TestParser(unittest.TestCase):
+
+    def test_trailing_commas(self):
+        statements = main_statements(parse_code("def add(a, b,):\n    return a + b\n"
+                                                "return add(1, 2,)\n"))
+        self.assertEqual(["a", "b"], statements[0].arguments)
+        self.assertEqual(2, len(statements[1].expr.arguments))
+
+    def test_binary_minus(self):
+        statements = main_statements(parse_code("n = 5\nreturn n - 1\n"))
+        expr = statements[1].expr
+        self.assertIsInstance(expr, ast.BinaryOperatorNode)
+        self.assertEqual(ast.BinaryOperatorNode.Type.Subtraction, expr.type)
+        self.assertIsInstance(expr.lhs_expr, ast.VarNode)
+        self.assertEqual(1, expr.rhs_expr.value)
+
+    def test_arguments_are_known_in_the_body_only(self):
+        statements = main_statements(parse_code("def f(a):\n    b = a\n    return b\n"
+                                                "a = 1\nreturn a\n"))
+        # The first assignment of a at the top level declares it
+        self.assertIsInstance(statements[1], ast.VarDeclNode)
+        with self.assertRaises(ParserError):
+            parse_code("def f(a):\n    return a\nreturn a\n")
+        with self.assertRaises(ParserError):
+            parse_code("def f(a):\n    b = a\n    return b\nreturn b\n")
+
+
+    def test_unexpected_indentation(self):
+        with self.assertRaises(ParserError):
+            parse_code("a = 5\n    c = 6\nreturn a\n")
+        with self.assertRaises(ParserError):
+            parse_code("if 1:\n    a = 1\n  b = 2\n")
+        # Blank lines may hold whitespace
+        self.assertEqual(2, len(main_statements(parse_code("a = 5\n    \nreturn a\n"))))
+
+
+if __name__ == '__main__':
+    unittest.main()
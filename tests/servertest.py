@@ -0,0 +1,115 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+
+from simpylic.client import request
+from simpylic.server import CompileServer
+from simpylic.simpylic import run, Operation
+
+
+PROGRAM = """def square(a):
+    return a * a
+
+return square(7)
+"""
+
+
+class TestCompileServer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, 'server.sock')
+        self.source_path = os.path.join(self.directory.name, 'program.spy')
+        with open(self.source_path, 'w', encoding='utf-8') as srcfile:
+            srcfile.write(PROGRAM)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def serve(self, *requests):
+        """Runs the server and sends the requests concurrently, returns the responses."""
+        async def session():
+            server = CompileServer(self.socket_path, workers=2, max_steps=1000)
+            await server.start()
+            loop = asyncio.get_running_loop()
+            try:
+                return await asyncio.gather(*(
+                    loop.run_in_executor(None, request, self.socket_path, argv,
+                                         self.directory.name)
+                    for argv in requests))
+            finally:
+                await server.close()
+        return asyncio.run(session())
+
+    def test_requests(self):
+        expected = StringIO()
+        with open(self.source_path, encoding='utf-8') as srcfile:
+            run(srcfile, expected, Operation.Compile)
+
+        cache_dir = os.path.join(self.directory.name, 'cache')
+        interpreted, compiled, dumped = self.serve(
+            ['-i', 'program.spy'],
+            ['-c', 'program.spy', '--cache-dir', cache_dir],
+            ['-t', 'program.spy'])
+        self.assertEqual((0, b'49\n', ''), interpreted)
+        self.assertEqual((0, expected.getvalue().encode('utf-8'), ''), compiled)
+        self.assertIn(b'KeywordDef', dumped[1])
+
+    def test_output_file(self):
+        status, output, _ = self.serve(['-c', 'program.spy', '-o', 'program.s', '--no-cache'])[0]
+        self.assertEqual((0, b''), (status, output))
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, 'program.s')))
+
+    def test_errors(self):
+        usage, missing = self.serve(['program.spy'], ['-i', 'missing.spy'])
+        self.assertEqual(2, usage[0])
+        self.assertIn('usage:', usage[2])
+        self.assertEqual(1, missing[0])
+        self.assertIn('FileNotFoundError', missing[2])
+
+    def test_no_native_code(self):
+        with open(self.source_path, 'w', encoding='utf-8') as srcfile:
+            srcfile.write("return 1 / 0\n")
+        # A division by zero in native code would kill the server with SIGFPE
+        failed, jit, compiled = self.serve(['-i', 'program.spy'],
+                                           ['-i', 'program.spy', '--engine', 'jit'],
+                                           ['-c', 'program.spy', '--no-cache'])
+        self.assertEqual(1, failed[0])
+        self.assertEqual(2, jit[0])
+        self.assertIn('engines', jit[2])
+        self.assertEqual(0, compiled[0])
+
+    def test_server_of_another_user(self):
+        with mock.patch('simpylic.client.os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                self.serve(['-i', 'program.spy'])
+
+    def test_step_limit(self):
+        with open(self.source_path, 'w', encoding='utf-8') as srcfile:
+            srcfile.write("while 1:\n    a = 1\nreturn 0\n")
+        vm, tree_walker = self.serve(['-i', 'program.spy'],
+                                     ['-i', 'program.spy', '--engine', 'ast',
+                                      '--max-steps', '100000'])
+        self.assertEqual(1, vm[0])
+        self.assertIn('StepLimitError', vm[2])
+        self.assertIn('limit of 1000 steps', tree_walker[2])
@@ -0,0 +1,92 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from io import StringIO
+
+from simpylic.tokenizer import Tokenizer
+from simpylic.parser import Parser
+from simpylic.ast_preprocessor import AstPreprocessor
+from simpylic.compiler import AsmGenerator
+from simpylic.simpylic import compile_streaming
+
+
+PROGRAM = """def square(a):
+    return a * a
+
+def distance(a, b):
+    def absolute(x):
+        return (x < 0) ? -x : x
+    return absolute(square(a) - square(b))
+
+x = distance(3, 4)
+def twice(a):
+    return distance(a, 0) * 2
+
+return twice(x) + square(2)
+"""
+
+
+def split_functions(assembly):
+    """Returns the code of each function, keyed by the function's name."""
+    functions = {}
+    name = None
+    for line in assembly.splitlines():
+        if line.endswith(':') and not line.startswith('.'):
+            name = line[:-1]
+            functions[name] = []
+        if name:
+            functions[name].append(line)
+    return functions
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_tokens_are_read_lazily(self):
+        def lines():
+            yield "return 1\n"
+            raise AssertionError("Read beyond the first token")
+        tokens = Tokenizer(lines()).tokens()
+        self.assertEqual("return", next(tokens).text)
+
+    def test_statements_are_parsed_lazily(self):
+        def lines():
+            yield "def one():\n"
+            yield "    return 1\n"
+            yield "\n"
+            # The end of the block is known from the indentation of the next line
+            yield "return one()\n"
+            raise AssertionError("Read beyond the first statement")
+        statements = Parser().parse_statements(Tokenizer(lines()).tokens())
+        self.assertEqual("one", next(statements).name)
+
+    def test_output_matches_staged_pipeline(self):
+        program = Parser().parse(Tokenizer(StringIO(PROGRAM)).tokenize())
+        AstPreprocessor().process(program)
+        expected = StringIO()
+        AsmGenerator(expected).generate(program)
+
+        output = StringIO()
+        compile_streaming(StringIO(PROGRAM), output)
+        self.assertDictEqual(split_functions(expected.getvalue()),
+                             split_functions(output.getvalue()))
+        # main is complete only at the end
+        self.assertEqual('main', list(split_functions(output.getvalue()))[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
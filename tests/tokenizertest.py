@@ -15,11 +15,20 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import os
+import tempfile
 import unittest
 from io import StringIO
 from ddt import ddt, data, unpack
 
-from simpylic.tokenizer import Tokenizer, Token, TokenType
+from simpylic.tokenizer import Tokenizer, Token, TokenType, TokenizerError, TokenBuffer
+
+
+def tokenize_or_error(source):
+    try:
+        return Tokenizer(source).tokenize()
+    except TokenizerError as error:
+        return str(error)
 
 
 @ddt
@@ -49,6 +58,33 @@ class TestTokenizer(unittest.TestCase):
         output_tokens = Tokenizer(buffer).tokenize()
         self.assertListEqual(tokens, output_tokens)
 
+    @data("def f(a, b):\n    return (a >= b) ? 1 : 2\n\nreturn f(1, 2)\n",
+          "\tx = 12abc\n  \n", "x=-1\n", "a != b\n", "_x = 1\n", "x\r\n", "y = \u00e9\n", "")
+    def test_buffer_matches_stream(self, code):
+        expected = tokenize_or_error(StringIO(code))
+        self.assertEqual(expected, tokenize_or_error(code.encode('utf-8')))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.spy')
+            with open(path, 'w', encoding='utf-8') as outfile:
+                outfile.write(code)
+            self.assertEqual(expected, tokenize_or_error(path))
+
+    def test_token_buffer(self):
+        code = "x = 1\nx = x + 1\n"
+        tokens = Tokenizer(code.encode('ascii')).tokenize_buffer()
+        self.assertListEqual(Tokenizer(StringIO(code)).tokenize(), list(tokens))
+        self.assertEqual(Token("+", TokenType.Plus, line=2, pos=7), tokens[7])
+        # All occurrences of x share the text
+        self.assertEqual(tokens.text_ids[0], tokens.text_ids[4])
+        self.assertEqual(tokens.text_ids[0], tokens.text_ids[6])
+
+        merged = TokenBuffer()
+        merged.extend(Tokenizer(b"y = 2\n").tokenize_buffer())
+        merged.extend(tokens)
+        self.assertListEqual(list(Tokenizer(b"y = 2\n").tokenize_buffer()) + list(tokens),
+                             list(merged))
+        self.assertEqual(merged.text_ids[1], merged.text_ids[4 + 1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,179 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from io import StringIO
+
+from simpylic.incremental import IncrementalCompiler
+from simpylic.simpylic import compile_streaming
+from simpylic.watcher import Inotify, Watcher
+
+
+PROGRAM = """def square(a):
+    return a * a
+
+def distance(a, b):
+    def absolute(x):
+        return (x < 0) ? -x : x
+    return absolute(square(a) - square(b))
+
+x = distance(3, 4)
+return square(x)
+"""
+
+
+def compile_program(source):
+    output = StringIO()
+    compile_streaming(StringIO(source), output)
+    return output.getvalue()
+
+
+class TestIncrementalCompiler(unittest.TestCase):
+
+    def compile(self, compiler, source):
+        output = StringIO()
+        self.assertTrue(compiler.compile(source, output))
+        self.assertEqual(compile_program(source), output.getvalue())
+
+    def test_only_changed_functions_are_generated(self):
+        compiler = IncrementalCompiler()
+        self.compile(compiler, PROGRAM)
+        self.assertEqual(4, compiler.generated)
+        self.assertEqual(4, compiler.functions)
+
+        source = PROGRAM.replace("(x < 0) ? -x : x", "(x > 0) ? x : -x")
+        self.compile(compiler, source)
+        self.assertEqual(1, compiler.generated)
+        source = source.replace("return square(x)", "return square(x) + 1")
+        self.compile(compiler, source)
+        self.assertEqual(1, compiler.generated)
+        self.compile(compiler, source + "\n")
+        self.assertEqual(0, compiler.generated)
+
+    def test_added_functions(self):
+        compiler = IncrementalCompiler()
+        self.compile(compiler, PROGRAM)
+        source = PROGRAM.replace("x = distance", "def cube(a):\n    return a * square(a)\n\n"
+                                                 "x = cube(2) + distance")
+        self.compile(compiler, source)
+        self.assertEqual(2, compiler.generated)
+
+    def test_errors_keep_the_compiled_functions(self):
+        compiler = IncrementalCompiler()
+        self.compile(compiler, PROGRAM)
+        output = StringIO()
+        self.assertFalse(compiler.compile(PROGRAM.replace("a * a", "a * b"), output))
+        self.assertEqual('', output.getvalue())
+        self.assertTrue(compiler.errors)
+        self.compile(compiler, PROGRAM)
+        self.assertEqual(0, compiler.generated)
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, 'program.spy')
+        self.write(PROGRAM)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, source):
+        with open(self.source, 'w', encoding='utf-8') as srcfile:
+            srcfile.write(source)
+        # The modification time must change even on filesystems with coarse timestamps
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def read_output(self, path):
+        with open(path, encoding='utf-8') as outfile:
+            return outfile.read()
+
+    def test_scan_finds_changed_sources(self):
+        watcher = Watcher(self.directory.name, use_inotify=False)
+        self.assertEqual({self.source}, watcher.scan())
+        self.assertEqual(set(), watcher.scan())
+        self.write(PROGRAM + "\n")
+        self.assertEqual({self.source}, watcher.scan())
+
+    def test_compile_writes_output(self):
+        output_dir = os.path.join(self.directory.name, 'out')
+        watcher = Watcher(self.directory.name, output_dir, use_inotify=False)
+        output = os.path.join(output_dir, 'program.s')
+        self.assertEqual(output, watcher.output_path(self.source))
+        self.assertTrue(watcher.compile(self.source))
+        self.assertEqual(compile_program(PROGRAM), self.read_output(output))
+
+        # The output of the last version without errors is kept
+        self.write("return y\n")
+        self.assertFalse(watcher.compile(self.source))
+        self.assertEqual(compile_program(PROGRAM), self.read_output(output))
+
+    def test_deleted_sources_lose_their_output(self):
+        watcher = Watcher(self.directory.name, use_inotify=False)
+        watcher.build(watcher.scan())
+        output = watcher.output_path(self.source)
+        self.assertTrue(os.path.exists(output))
+        os.remove(self.source)
+        self.assertEqual(set(), watcher.scan())
+        self.assertFalse(os.path.exists(output))
+
+    def test_inotify_ignores_outputs(self):
+        inotify = Inotify.create(Watcher.extension)
+        if inotify is None:
+            self.skipTest("inotify is not available")
+        try:
+            inotify.add_directory(self.directory.name)
+            with open(os.path.join(self.directory.name, 'program.s'), 'w',
+                      encoding='utf-8') as outfile:
+                outfile.write("ret\n")
+            self.assertFalse(inotify.wait(0.05))
+            self.write(PROGRAM + "\n")
+            self.assertTrue(inotify.wait(1))
+        finally:
+            inotify.close()
+
+    def test_watch(self):
+        log = StringIO()
+        watcher = Watcher(self.directory.name, debounce=0.01, poll_interval=0.01, log=log)
+        thread = threading.Thread(target=watcher.watch)
+        thread.start()
+        try:
+            output = watcher.output_path(self.source)
+            source = PROGRAM.replace("square(x)", "square(x + 1)")
+            deadline = time.monotonic() + 10
+            while not os.path.exists(output) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.write(source)
+            while self.read_output(output) != compile_program(source) and \
+                    time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+            thread.join()
+            watcher.close()
+        self.assertEqual(compile_program(source), self.read_output(output))
+        self.assertIn("1 of 4 functions", log.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+ Copyright (C) 2019  Daniel Vrátil <me@dvratil.cz>
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import unittest
+from ddt import ddt, data, unpack
+
+from simpylic.instruction import Instruction, Opcode
+from simpylic.x86_encoder import X86Encoder, X86EncoderError
+
+
+@ddt
+class TestX86Encoder(unittest.TestCase):
+
+    @data((Instruction(Opcode.Push, "%rbp"), "55"),
+          (Instruction(Opcode.Pop, "%r8"), "4158"),
+          (Instruction(Opcode.Mov, "%rsp", "%rbp"), "4889e5"),
+          (Instruction(Opcode.Mov, "$10", "%eax"), "b80a000000"),
+          (Instruction(Opcode.Mov, "%edi", "-4(%rbp)"), "897dfc"),
+          (Instruction(Opcode.Mov, "%r9d", "-300(%rbp)"), "44898dd4feffff"),
+          (Instruction(Opcode.Mov, "12(%rsp)", "%eax"), "8b44240c"),
+          (Instruction(Opcode.Sub, "$16", "%rsp"), "4883ec10"),
+          (Instruction(Opcode.Add, "%ecx", "%eax"), "01c8"),
+          (Instruction(Opcode.Cmp, "-8(%rbp)", "%eax"), "3b45f8"),
+          (Instruction(Opcode.Imul, "$1000", "%eax"), "69c0e8030000"),
+          (Instruction(Opcode.Idiv, "%ecx"), "f7f9"),
+          (Instruction(Opcode.Setle, "%al"), "0f9ec0"),
+          (Instruction(Opcode.Movzb, "%al", "%eax"), "0fb6c0"))
+    @unpack
+    def test_encoding(self, instruction, encoding):
+        code, _ = X86Encoder().encode([instruction])
+        self.assertEqual(encoding, code.hex())
+
+    def test_label_fixups(self):
+        code, labels = X86Encoder().encode([Instruction(Opcode.Jmp, "end"),
+                                            Instruction(Opcode.Label, "start"),
+                                            Instruction(Opcode.Ret),
+                                            Instruction(Opcode.Label, "end"),
+                                            Instruction(Opcode.Je, "start")])
+        self.assertEqual({"start": 5, "end": 6}, labels)
+        self.assertEqual("e901000000" "c3" "0f84f9ffffff", code.hex())
+
+    def test_immediates_are_truncated(self):
+        code, _ = X86Encoder().encode([Instruction(Opcode.Mov, "$4294967297", "%eax"),
+                                       Instruction(Opcode.Add, "$-2147483649", "%eax")])
+        self.assertEqual("b801000000" "81c0ffffff7f", code.hex())
+
+    def test_duplicate_label(self):
+        with self.assertRaises(X86EncoderError):
+            X86Encoder().encode([Instruction(Opcode.Label, "start"),
+                                 Instruction(Opcode.Ret),
+                                 Instruction(Opcode.Label, "start")])
+
+
+if __name__ == '__main__':
+    unittest.main()